@@ -13,6 +13,11 @@ from pathlib import Path
 
 router = APIRouter()
 
+def _bundle_path(result):
+    """训练结果中记录的模型包路径 (旧任务没有模型包时为 None)"""
+    path = ((result.metrics or {}).get('bundle') or {}).get('path') if result else None
+    return path if path and os.path.exists(path) else None
+
 class PredictionRequest(BaseModel):
     features: Dict[str, float]
 
@@ -42,7 +47,12 @@ def get_model_features(
     
     # 获取训练结果以获取特征列表
     result = db.query(TrainingResult).filter(TrainingResult.task_id == task_id).first()
-    if not result or not result.feature_importance:
+    bundle_path = _bundle_path(result)
+    if bundle_path:
+        from app.services.serving import get_bundle
+        features = get_bundle(bundle_path).feature_names
+        return {"features": features, "count": len(features)}
+    if not result or not getattr(result, 'feature_importance', None):
         raise HTTPException(status_code=404, detail="未找到特征信息")
     
     # 从feature_importance中提取特征名称
@@ -70,85 +80,85 @@ def predict(
     if not task:
         raise HTTPException(status_code=404, detail="未找到已完成的训练任务")
     
-    # 检查模型文件是否存在
-    model_path = Path("model") / f"{task_id}.pth"
+    result = db.query(TrainingResult).filter(TrainingResult.task_id == task_id).first()
+    bundle_path = _bundle_path(result)
+    
+    # 检查模型文件是否存在 (新任务为模型包，旧任务为单个 .pth)
+    model_path = Path(bundle_path) if bundle_path else Path("model") / f"{task_id}.pth"
     if not model_path.exists():
         raise HTTPException(status_code=404, detail="模型文件不存在")
     
-    # 获取训练结果以获取特征列表和scaler信息
-    result = db.query(TrainingResult).filter(TrainingResult.task_id == task_id).first()
-    if not result or not result.feature_importance:
-        raise HTTPException(status_code=404, detail="未找到模型配置信息")
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    if bundle_path:
+        from app.services.serving import get_bundle
+        bundle = get_bundle(bundle_path, device=device)
+        expected_features = bundle.feature_names
+    else:
+        # 获取训练结果以获取特征列表
+        if not result or not getattr(result, 'feature_importance', None):
+            raise HTTPException(status_code=404, detail="未找到模型配置信息")
+        bundle = None
+        expected_features = list(result.feature_importance.keys())
+    
+    # 验证输入特征
+    if set(request.features.keys()) != set(expected_features):
+        missing = set(expected_features) - set(request.features.keys())
+        extra = set(request.features.keys()) - set(expected_features)
+        error_msg = ""
+        if missing:
+            error_msg += f"缺少特征: {', '.join(list(missing)[:5])}"
+        if extra:
+            error_msg += f" 多余特征: {', '.join(list(extra)[:5])}"
+        raise HTTPException(status_code=400, detail=error_msg or "特征不匹配")
     
     try:
-        # 加载模型
-        from app.services.model_arch import Mamformer
-        
-        # 准备输入特征
-        expected_features = list(result.feature_importance.keys())
+        from app.services.serving import MeanEnsemble, load_serving_model
         
-        # 验证输入特征
-        if set(request.features.keys()) != set(expected_features):
-            missing = set(expected_features) - set(request.features.keys())
-            extra = set(request.features.keys()) - set(expected_features)
-            error_msg = ""
-            if missing:
-                error_msg += f"缺少特征: {', '.join(list(missing)[:5])}"
-            if extra:
-                error_msg += f" 多余特征: {', '.join(list(extra)[:5])}"
-            raise HTTPException(status_code=400, detail=error_msg or "特征不匹配")
+        if bundle is not None:
+            # 按训练时的列顺序与 scaler 缩放输入；请求只提供一个时间点，窗口内各步使用相同的特征值
+            row = [0.0 if col == bundle.target_col else request.features[col] for col in bundle.columns]
+            X = bundle.transform_inputs(np.tile(row, (bundle.seq_len, 1)))[None]
+            input_dim = len(bundle.columns)
+        else:
+            # 按照正确的顺序排列特征
+            X = np.array([[request.features[f] for f in expected_features]])
+            input_dim = len(expected_features)
+        X_tensor = torch.as_tensor(X, dtype=torch.float32, device=device)
         
-        # 按照正确的顺序排列特征
-        feature_values = [request.features[f] for f in expected_features]
-        
-        # 转换为numpy数组
-        X = np.array([feature_values], dtype=np.float32)
-        
-        # 加载模型（注意：这里简化处理，实际可能需要加载scaler等）
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        
-        # 获取模型配置
+        # 加载模型：优先使用导出报告中最快的推理产物 (TorchScript / int8)，其次为模型包中的全部成员
         config = task.config or {}
-        d_model = config.get('d_model', 64)
-        n_heads = config.get('n_heads', 4)
-        d_ff = config.get('d_ff', 128)
-        n_layers = config.get('n_layers', 2)
-        dropout = config.get('dropout', 0.1)
-        
-        # 初始化模型
-        model = Mamformer(
-            input_dim=len(expected_features),
-            d_model=d_model,
-            n_heads=n_heads,
-            d_ff=d_ff,
-            n_layers=n_layers,
-            dropout=dropout,
-            output_dim=1
-        ).to(device)
-        
-        # 加载模型权重
-        checkpoint = torch.load(model_path, map_location=device)
-        model.load_state_dict(checkpoint['model_state_dict'])
-        model.eval()
-        
-        # 转换为张量
-        X_tensor = torch.FloatTensor(X).to(device)
+        export_report = (result.metrics or {}).get('export') if result else None
+        model = load_serving_model(
+            config,
+            str(model_path),
+            input_dim=input_dim,
+            export_report=export_report,
+            device=device
+        )
         
         # 进行预测
         with torch.no_grad():
-            prediction = model(X_tensor)
-            pred_value = prediction.cpu().numpy()[0, 0]
+            if isinstance(model, MeanEnsemble):
+                member_preds = torch.stack([member(X_tensor).reshape(-1)[0] for member in model.members])
+            else:
+                member_preds = model(X_tensor).reshape(-1)[:1]
+        member_values = member_preds.cpu().numpy()
+        if bundle is not None:
+            member_values = bundle.inverse_target(member_values)
+        pred_value = float(np.mean(member_values))
         
-        # 计算置信区间（简化版本，使用标准差估计）
-        # 在实际应用中，可以使用更复杂的方法
-        std_estimate = abs(pred_value) * 0.1  # 假设10%的标准差
+        # 置信区间: 能取得各成员预测时由成员间标准差估计，否则 (TorchScript 产物或单模型) 假设 10% 的标准差
+        if len(member_values) > 1:
+            std_estimate = float(np.std(member_values))
+        else:
+            std_estimate = abs(pred_value) * 0.1
         confidence_interval = [
             float(pred_value - 1.96 * std_estimate),
             float(pred_value + 1.96 * std_estimate)
         ]
         
         return PredictionResponse(
-            prediction=float(pred_value),
+            prediction=pred_value,
             confidence_interval=confidence_interval,
             input_features=request.features
         )
@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.api import deps
+from app.models.models import DataFile, HyperparameterStudy
+from app.schemas.search import HyperparameterSearchCreate, HyperparameterStudy as HyperparameterStudySchema
+from app.services.tuner import DEFAULT_SEARCH_SPACE
+from app.worker import dispatch_search, get_queue_status
+from uuid import UUID
+
+router = APIRouter()
+
+@router.post("/create", response_model=HyperparameterStudySchema)
+def create_search(
+    search_in: HyperparameterSearchCreate,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_user)
+):
+    """创建超参数搜索: 逐级减半训练多组配置，剪枝较差的试验"""
+    data_file = db.query(DataFile).filter(DataFile.id == search_in.data_id, DataFile.user_id == current_user.id).first()
+    if not data_file:
+        raise HTTPException(status_code=404, detail="未找到数据文件")
+    if search_in.n_trials < 1 or search_in.eta < 2 or search_in.min_epochs < 1:
+        raise HTTPException(status_code=400, detail="n_trials 至少为 1，eta 至少为 2，min_epochs 至少为 1")
+    
+    config_dict = search_in.config.dict()
+    config_dict['model_type'] = search_in.model_type
+    study = HyperparameterStudy(
+        user_id=current_user.id,
+        data_id=search_in.data_id,
+        config=config_dict,
+        search_space=search_in.search_space or DEFAULT_SEARCH_SPACE,
+        settings={
+            'n_trials': search_in.n_trials,
+            'min_epochs': search_in.min_epochs,
+            'max_epochs': search_in.max_epochs or config_dict['epochs'],
+            'eta': search_in.eta,
+            'seed': search_in.seed
+        },
+        status="pending"
+    )
+    db.add(study)
+    db.commit()
+    db.refresh(study)
+    
+    dispatch_search(str(study.id), data_file.file_path, search_in.config.target_col, priority=search_in.priority)
+    return study
+
+@router.get("/", response_model=list[HyperparameterStudySchema])
+def get_searches(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_user)
+):
+    return db.query(HyperparameterStudy).filter(HyperparameterStudy.user_id == current_user.id).order_by(
+        HyperparameterStudy.created_at.desc()
+    ).offset(skip).limit(limit).all()
+
+@router.get("/{study_id}", response_model=HyperparameterStudySchema)
+def get_search(
+    study_id: UUID,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_user)
+):
+    study = db.query(HyperparameterStudy).filter(HyperparameterStudy.id == study_id, HyperparameterStudy.user_id == current_user.id).first()
+    if not study:
+        raise HTTPException(status_code=404, detail="未找到超参数搜索")
+    return study
+
+@router.get("/{study_id}/queue")
+def get_search_queue_status(
+    study_id: UUID,
+    db: Session = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_user)
+):
+    study = db.query(HyperparameterStudy).filter(HyperparameterStudy.id == study_id, HyperparameterStudy.user_id == current_user.id).first()
+    if not study:
+        raise HTTPException(status_code=404, detail="未找到超参数搜索")
+    return {"status": study.status, "queue": get_queue_status(str(study_id))}
@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.api import deps
 from app.models.models import TrainingTask, DataFile, TrainingResult, TrainingLog
 from app.schemas.training import TrainingTaskCreate, TrainingTask as TrainingTaskSchema, TrainingResult as TrainingResultSchema
-from app.worker import train_mamformer_task, run_training_logic
-from app.core.config import settings
+from app.worker import dispatch_training, get_queue_status
+from app.services.checkpoint import clear_task_checkpoints
 from uuid import UUID
 from pydantic import BaseModel
 from typing import Dict
@@ -15,11 +15,11 @@ class DirectTrainingCreate(BaseModel):
     file_path: str
     filename: str
     config: Dict
+    priority: int = 0  # 调度优先级，数值越大越先执行
 
 @router.post("/create", response_model=TrainingTaskSchema)
 def create_training_task(
     task_in: TrainingTaskCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db),
     current_user = Depends(deps.get_current_user)
 ):
@@ -38,6 +38,7 @@ def create_training_task(
     # 将模型类型加入配置中
     config_dict = task_in.config.dict()
     config_dict['model_type'] = task_in.model_type
+    config_dict['priority'] = task_in.priority
     print(f"  config_dict (with model_type): {config_dict}")
     
     task = TrainingTask(
@@ -51,23 +52,12 @@ def create_training_task(
     db.refresh(task)
     
     # Start task
-    if settings.CELERY_TASK_ALWAYS_EAGER:
-        # If eager (no Redis/Broker), use FastAPI BackgroundTasks to avoid blocking the response
-        background_tasks.add_task(
-            run_training_logic,
-            str(task.id),
-            data_file.file_path,
-            task_in.config.target_col,
-            config_dict
-        )
-    else:
-        # Use Celery
-        train_mamformer_task.delay(
-            str(task.id),
-            data_file.file_path,
-            task_in.config.target_col,
-            config_dict
-        )
+    dispatch_training(
+        str(task.id),
+        data_file.file_path,
+        task_in.config.target_col,
+        config_dict
+    )
     
     return task
 
@@ -81,6 +71,7 @@ def delete_training_task(
     Delete a training task and all its associated data (logs, results, model files)
     """
     import os
+    import glob
     
     # Verify task ownership
     task = db.query(TrainingTask).filter(TrainingTask.id == task_id, TrainingTask.user_id == current_user.id).first()
@@ -95,13 +86,13 @@ def delete_training_task(
     if result:
         db.delete(result)
     
-    # Delete model file if exists
-    model_path = f"model/{task_id}.pth"
-    if os.path.exists(model_path):
+    # Delete model file and exported serving artifacts if exist
+    for model_path in glob.glob(f"model/{task_id}.*"):
         try:
             os.remove(model_path)
         except Exception as e:
             print(f"Failed to delete model file: {e}")
+    clear_task_checkpoints(task_id)
     
     # Delete the task
     db.delete(task)
@@ -162,7 +153,9 @@ def get_training_progress(
         "status": task.status,
         "latest_log": latest_log,
         "started_at": task.started_at,
-        "completed_at": task.completed_at
+        "completed_at": task.completed_at,
+        # eager 模式下的排队位置 ({'state': 'queued', 'position', 'queue_length'}) 或运行槽信息
+        "queue": get_queue_status(str(task_id))
     }
 
 @router.get("/{task_id}/result", response_model=TrainingResultSchema)
@@ -197,7 +190,6 @@ def get_training_logs(
 @router.post("/create-direct", response_model=TrainingTaskSchema)
 def create_training_task_direct(
     task_in: DirectTrainingCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db),
     current_user = Depends(deps.get_current_user)
 ):
@@ -243,10 +235,11 @@ def create_training_task_direct(
         db.refresh(data_file)
     
     # Create training task
+    config_dict = {**task_in.config, 'priority': task_in.priority}
     task = TrainingTask(
         user_id=current_user.id,
         data_id=data_file.id,
-        config=task_in.config,
+        config=config_dict,
         status="pending"
     )
     db.add(task)
@@ -254,20 +247,11 @@ def create_training_task_direct(
     db.refresh(task)
     
     # Start task
-    if settings.CELERY_TASK_ALWAYS_EAGER:
-        background_tasks.add_task(
-            run_training_logic,
-            str(task.id),
-            task_in.file_path,
-            task_in.config['target_col'],
-            task_in.config
-        )
-    else:
-        train_mamformer_task.delay(
-            str(task.id),
-            task_in.file_path,
-            task_in.config['target_col'],
-            task_in.config
-        )
+    dispatch_training(
+        str(task.id),
+        task_in.file_path,
+        task_in.config['target_col'],
+        config_dict
+    )
     
     return task
@@ -21,6 +21,20 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
     CELERY_TASK_ALWAYS_EAGER: bool = True  # Run tasks synchronously by default (no Redis needed)
+    
+    # In-process training scheduler (eager mode)
+    TRAINING_MAX_CONCURRENT_JOBS: int = 2
+    TRAINING_THREADS_PER_JOB: Optional[int] = None  # 默认将可用 CPU 核平分给各执行槽
+    
+    # Training caches
+    CACHE_DIR: str = "cache"
+    FEATURE_CACHE_MAX_ENTRIES: int = 256
+    PREPROCESS_CACHE_MAX_ENTRIES: int = 32
+    
+    # Training checkpoints
+    CHECKPOINT_DIR: str = "checkpoint"
+    STALE_TASK_TIMEOUT_MINUTES: int = 30  # running 任务超过该时间无心跳视为中断，可被重新认领
+    TASK_HEARTBEAT_INTERVAL_SECONDS: int = 15  # 训练心跳写入数据库的最小间隔
 
     class Config:
         env_file = (".env", "../.env")
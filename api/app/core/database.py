@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -16,3 +16,30 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def add_missing_columns(bind, metadata=None):
+    """
+    create_all 不会修改已存在的表: 为旧数据库中已存在的表补齐模型中新增的可空列
+    (ALTER TABLE ... ADD COLUMN)，已存在的列跳过，可重复执行。返回新增的 "表.列" 列表。
+    """
+    metadata = metadata or Base.metadata
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable or column.primary_key:
+                    print(f"无法自动添加非空列 {table.name}.{column.name}，请手动迁移")
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f"{table.name}.{column.name}")
+    if added:
+        print(f"已为旧数据库添加列: {', '.join(added)}")
+    return added
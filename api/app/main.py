@@ -1,13 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api import auth, data, training, prediction
-from app.core.database import engine, Base, SessionLocal
+from app.api import auth, data, training, prediction, search
+from app.core.database import engine, Base, SessionLocal, add_missing_columns
 from app.models.models import User
 from app.core.security import get_password_hash
+from app.worker import start_stale_task_monitor
+from app.services.scheduler import shutdown_scheduler
 
-# Create tables
+# Create tables (并为旧数据库中已存在的表补齐新增列)
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -38,6 +41,14 @@ def create_default_user():
     finally:
         db.close()
 
+@app.on_event("startup")
+def resume_interrupted_training():
+    start_stale_task_monitor()
+
+@app.on_event("shutdown")
+def stop_training_scheduler():
+    shutdown_scheduler()
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -52,6 +63,7 @@ app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["aut
 app.include_router(data.router, prefix=f"{settings.API_V1_STR}/data", tags=["data"])
 app.include_router(training.router, prefix=f"{settings.API_V1_STR}/training", tags=["training"])
 app.include_router(prediction.router, prefix=f"{settings.API_V1_STR}/prediction", tags=["prediction"])
+app.include_router(search.router, prefix=f"{settings.API_V1_STR}/search", tags=["search"])
 
 @app.get("/")
 def root():
@@ -45,6 +45,8 @@ class TrainingTask(Base):
     started_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     error_message = Column(Text, nullable=True)
+    worker_id = Column(String, nullable=True)  # 当前认领任务的执行者
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # 执行者最近一次心跳
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     owner = relationship("User", back_populates="training_tasks")
@@ -83,3 +85,43 @@ class TrainingLog(Base):
 
 # Update TrainingTask to include logs relationship
 TrainingTask.logs = relationship("TrainingLog", back_populates="task", cascade="all, delete-orphan")
+
+class HyperparameterStudy(Base):
+    __tablename__ = "hyperparameter_studies"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    data_id = Column(UUID(as_uuid=True), ForeignKey("data_files.id"), nullable=False)
+    status = Column(String, default="pending")  # pending, running, completed, failed
+    config = Column(JSON, nullable=False)  # 基础训练配置
+    search_space = Column(JSON, nullable=False)
+    settings = Column(JSON, nullable=False)  # n_trials, min_epochs, max_epochs, eta, seed
+    best_params = Column(JSON, nullable=True)
+    best_val_r2 = Column(Float, nullable=True)
+    epochs_used = Column(Integer, nullable=True)
+    epochs_full = Column(Integer, nullable=True)
+    worker_id = Column(String, nullable=True)  # 当前认领搜索的执行者
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # 执行者最近一次心跳
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    trials = relationship("HyperparameterTrial", back_populates="study", cascade="all, delete-orphan",
+                          order_by="HyperparameterTrial.trial_index")
+
+class HyperparameterTrial(Base):
+    __tablename__ = "hyperparameter_trials"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    study_id = Column(UUID(as_uuid=True), ForeignKey("hyperparameter_studies.id"), nullable=False)
+    trial_index = Column(Integer, nullable=False)
+    params = Column(JSON, nullable=False)
+    status = Column(String, default="pending")  # pending, running, pruned, completed, failed
+    rung = Column(Integer, nullable=True)
+    epochs = Column(Integer, nullable=True)
+    val_r2 = Column(Float, nullable=True)
+    history = Column(JSON, nullable=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+    study = relationship("HyperparameterStudy", back_populates="trials")
@@ -0,0 +1,49 @@
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel
+from uuid import UUID
+from datetime import datetime
+from app.schemas.training import TrainingConfig
+
+class HyperparameterSearchCreate(BaseModel):
+    data_id: UUID
+    config: TrainingConfig  # 基础配置，搜索空间中的参数会被覆盖
+    model_type: str = "mamformer"
+    search_space: Optional[Dict[str, Dict[str, Any]]] = None  # 为空时搜索 d_model, n_layers, lr, seq_len, dropout
+    n_trials: int = 27
+    min_epochs: int = 10  # 第一级的训练 epoch 数
+    max_epochs: Optional[int] = None  # 最后一级的训练 epoch 数，默认为 config.epochs
+    eta: int = 3  # 每级保留前 1/eta 的试验
+    seed: int = 42
+    priority: int = 0  # 调度优先级，数值越大越先执行
+
+class HyperparameterTrial(BaseModel):
+    trial_index: int
+    params: Dict[str, Any]
+    status: str
+    rung: Optional[int]
+    epochs: Optional[int]
+    val_r2: Optional[float]
+    history: Optional[List[Dict[str, Any]]]
+
+    class Config:
+        from_attributes = True
+
+class HyperparameterStudy(BaseModel):
+    id: UUID
+    user_id: UUID
+    data_id: UUID
+    status: str
+    config: Dict[str, Any]
+    search_space: Dict[str, Any]
+    settings: Dict[str, Any]
+    best_params: Optional[Dict[str, Any]]
+    best_val_r2: Optional[float]
+    epochs_used: Optional[int]
+    epochs_full: Optional[int]
+    started_at: Optional[datetime]
+    completed_at: Optional[datetime]
+    error_message: Optional[str]
+    trials: List[HyperparameterTrial] = []
+
+    class Config:
+        from_attributes = True
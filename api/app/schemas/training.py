@@ -6,6 +6,7 @@ from datetime import datetime
 class TrainingConfig(BaseModel):
     target_col: str
     seq_len: int = 12
+    pred_len: int = 1  # 预测步数，一次前向输出整个预测区间
     d_model: int = 64
     n_layers: int = 2
     dropout: float = 0.3
@@ -14,11 +15,35 @@ class TrainingConfig(BaseModel):
     epochs: int = 400
     top_k: int = 12
     n_models: int = 5
+    patience: int = 0  # 早停耐心值 (验证 R2 连续未提升的 epoch 数)，0 表示不启用
+    min_delta: float = 0.0  # 视为提升所需的最小 R2 增量
+    lr_scheduler: str = "none"  # 学习率调度：none, plateau, cosine
+    lr_patience: int = 10  # plateau 调度的耐心值
+    lr_factor: float = 0.5  # plateau 调度的衰减系数
+    validate_every: int = 1  # 每隔多少个 epoch 验证一次 (最后一个 epoch 总会验证)
+    ema_decay: Optional[float] = None  # 权重指数滑动平均系数 (如 0.999)，启用后在 EMA 权重上验证并保存最佳模型
+    attn_backend: str = "sdpa"  # Mamformer 注意力实现：sdpa, math
+    head_mode: str = "flatten"  # Mamformer 预测头：flatten, pool, attn
+    mixer: str = "attention"  # 序列混合层：attention, ssm (选择性状态空间，线性复杂度)
+    d_state: int = 16  # SelectiveSSM 状态维度
+    ensemble_mode: str = "sequential"  # 集成训练方式：sequential, vectorized, process (多进程并发)
+    max_workers: Optional[int] = None  # process 模式的进程数，默认不超过 CPU 核数
+    augment_mode: str = "batch"  # 数据增强方式：batch (批量张量运算，可使用内存张量批迭代器), sample (逐样本), none
+    fast_loader_max_mb: int = 512  # 无逐样本增强且数据小于该值时使用内存张量批迭代器
+    compile_model: bool = False  # 训练/验证前向使用 torch.compile，编译失败时回退 eager
+    precision: str = "fp32"  # 训练/验证前向精度：fp32, bf16 (CPU bf16 autocast)
+    checkpoint_every: int = 10  # 每隔多少个 epoch 保存断点，任务中断后从断点继续；0 表示不保存
+    eval_mode: str = "holdout"  # 评估方式：holdout (固定 70/15/15 划分), walk_forward (另做滚动原点交叉验证)
+    cv_folds: int = 5  # walk_forward 的折数
+    cv_max_workers: Optional[int] = None  # walk_forward 并发训练的进程数，默认不超过可用 CPU 核数
+    export_artifacts: bool = False  # 训练后导出 TorchScript / int8 推理产物
+    export_max_r2_drop: float = 0.01  # 推理产物相对 float32 允许的最大 R2 下降
 
 class TrainingTaskCreate(BaseModel):
     data_id: UUID
     config: TrainingConfig
     model_type: str = "mamformer"  # 模型类型：mamformer, auto-mamformer
+    priority: int = 0  # 调度优先级，数值越大越先执行
 
 class TrainingTaskBase(BaseModel):
     id: UUID
@@ -0,0 +1,182 @@
+"""
+自包含模型包 (model/{task_id}.bundle)
+
+文件布局 (与 safetensors 类似):
+  [8 字节 little-endian uint64: 头部长度 N][N 字节 UTF-8 JSON 头部][连续的权重数据区]
+头部:
+  {"format": "mamformer-bundle", "version": 1,
+   "metadata": {model_type, seq_len, input_dim, architecture, n_members,
+                columns, target_col, target_idx, scaler: {center, scale}},
+   "tensors": {"members.{m}.{参数名}": {"dtype", "shape", "offsets": [begin, end]}}}
+头部用空格补齐、每个张量的起点按 ALIGNMENT 字节对齐，offsets 相对数据区起点。
+
+加载时整个文件以 copy-on-write 方式 mmap，张量通过 torch.frombuffer 直接指向映射内存；
+模型在 meta 设备上构建后 load_state_dict(assign=True)，不经过 pickle，也不拷贝权重；
+随后原地应用 optimize_for_inference，模型包中的成员只用于推理。
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+import torch
+
+BUNDLE_FORMAT = 'mamformer-bundle'
+BUNDLE_VERSION = 1
+ALIGNMENT = 64
+# build_model 读取的结构参数
+ARCH_KEYS = ('d_model', 'n_layers', 'pred_len', 'dropout', 'attn_backend', 'head_mode', 'mixer', 'd_state')
+
+_DTYPE_NAMES = {
+    torch.float32: 'F32',
+    torch.float64: 'F64',
+    torch.float16: 'F16',
+    torch.bfloat16: 'BF16',
+    torch.int64: 'I64',
+    torch.int32: 'I32',
+    torch.uint8: 'U8',
+    torch.bool: 'BOOL',
+}
+_DTYPES = {name: dtype for dtype, name in _DTYPE_NAMES.items()}
+
+
+def _padding(size):
+    return (-size) % ALIGNMENT
+
+
+def save_bundle(path, models, model_type, config, input_dim, seq_len, scaler, columns, target_idx):
+    """将所有集成成员的权重与预处理参数、结构参数写入一个 bundle 文件，返回文件信息"""
+    tensors, blobs = {}, []
+    offset = 0
+    for m, model in enumerate(models):
+        for name, tensor in model.state_dict().items():
+            tensor = tensor.detach().cpu().contiguous()
+            data = tensor.reshape(-1).view(torch.uint8).numpy()
+            tensors[f"members.{m}.{name}"] = {
+                'dtype': _DTYPE_NAMES[tensor.dtype],
+                'shape': list(tensor.shape),
+                'offsets': [offset, offset + data.nbytes]
+            }
+            blobs.append(data)
+            offset += data.nbytes + _padding(data.nbytes)
+
+    header = {
+        'format': BUNDLE_FORMAT,
+        'version': BUNDLE_VERSION,
+        'metadata': {
+            'model_type': model_type,
+            'seq_len': seq_len,
+            'input_dim': input_dim,
+            'architecture': {k: config[k] for k in ARCH_KEYS if k in config},
+            'n_members': len(models),
+            'columns': list(columns),
+            'target_col': columns[target_idx],
+            'target_idx': target_idx,
+            'scaler': {'center': scaler.center_.tolist(), 'scale': scaler.scale_.tolist()}
+        },
+        'tensors': tensors
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_bytes += b' ' * _padding(8 + len(header_bytes))
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for data in blobs:
+                f.write(data.tobytes())
+                f.write(b'\0' * _padding(data.nbytes))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {'path': path, 'version': BUNDLE_VERSION, 'size_bytes': os.path.getsize(path)}
+
+
+def read_bundle_header(path):
+    with open(path, 'rb') as f:
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len))
+    if header.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"不是模型包文件: {path}")
+    if header.get('version', 0) > BUNDLE_VERSION:
+        raise ValueError(f"模型包版本 {header['version']} 高于当前支持的版本 {BUNDLE_VERSION}")
+    return header, 8 + header_len
+
+
+class ModelBundle:
+    """已加载的模型包: 全部集成成员 + scaler + 特征顺序"""
+    def __init__(self, header, models, buffer):
+        from app.services.trainer import scaler_from_params
+
+        self.metadata = header['metadata']
+        self.version = header['version']
+        self.models = models
+        self.columns = self.metadata['columns']
+        self.target_col = self.metadata['target_col']
+        self.target_idx = self.metadata['target_idx']
+        self.seq_len = self.metadata['seq_len']
+        self.scaler = scaler_from_params(self.metadata['scaler']['center'], self.metadata['scaler']['scale'])
+        # 张量指向该映射，需与 bundle 同生命周期
+        self._buffer = buffer
+
+    @property
+    def feature_names(self):
+        """预测时需要提供的特征 (不含目标列)，按训练时的顺序"""
+        return [c for c in self.columns if c != self.target_col]
+
+    def transform_inputs(self, raw):
+        """原始尺度的 [..., input_dim] 输入 -> 缩放后且目标列置零 (与训练时的 AugmentedDataset 一致)"""
+        raw = np.asarray(raw, dtype=np.float64)
+        scaled = self.scaler.transform(raw.reshape(-1, raw.shape[-1])).reshape(raw.shape)
+        scaled[..., self.target_idx] = 0
+        return scaled
+
+    def inverse_target(self, values):
+        from app.services.trainer import inverse_transform_target
+        return inverse_transform_target(self.scaler, values, self.target_idx)
+
+    @torch.no_grad()
+    def predict_members(self, x):
+        """x: 缩放后的 [B, seq_len, input_dim]，返回各成员预测 [M, B, pred_len] (缩放空间)"""
+        return torch.stack([model(x).reshape(x.shape[0], -1) for model in self.models])
+
+
+def load_bundle(path, device=None):
+    from app.services.model_arch import optimize_for_inference
+    from app.services.trainer import build_model
+
+    header, data_start = read_bundle_header(path)
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    meta = header['metadata']
+    member_states = [{} for _ in range(meta['n_members'])]
+    for key, info in header['tensors'].items():
+        _, m, name = key.split('.', 2)
+        dtype = _DTYPES[info['dtype']]
+        shape = info['shape']
+        numel = math.prod(shape)
+        if numel == 0:
+            tensor = torch.empty(shape, dtype=dtype)
+        else:
+            tensor = torch.frombuffer(
+                buffer, dtype=dtype, count=numel, offset=data_start + info['offsets'][0]
+            ).reshape(shape)
+        member_states[int(m)][name] = tensor
+
+    models = []
+    for state in member_states:
+        with torch.device('meta'):
+            model = build_model(meta['model_type'], meta['input_dim'], meta['seq_len'], meta['architecture'])
+        model.load_state_dict(state, assign=True)
+        if device is not None and torch.device(device).type != 'cpu':
+            model = model.to(device)
+        models.append(optimize_for_inference(model, inplace=True))
+    return ModelBundle(header, models, buffer)
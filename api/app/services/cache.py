@@ -0,0 +1,149 @@
+"""
+训练任务的磁盘缓存
+
+- file_sha256: 数据文件内容哈希，作为各类缓存键的基础
+- FeatureRankingCache: select_top_features 的结果缓存。键由数据集内容哈希、
+  目标列、异常值截断参数与 top_k 组成，值为选出的特征列表 (JSON 文件)。
+  命中时更新文件 mtime，写入后按 mtime 做 LRU 淘汰，超过 max_entries 的最旧条目被删除。
+- PreprocessCache: 预处理结果缓存。每个条目是一个目录，保存若干 .npy 数组
+  (截断/特征选择/缩放后的 train/val/test 与 scaler 参数) 和 meta.json；
+  读取时以 mmap_mode='r' 映射，多个任务/进程共享同一份页缓存而不重复解析 CSV。
+  同样按目录 mtime 做 LRU 淘汰。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def config_key(*parts):
+    """将若干可 JSON 序列化的部分组合为稳定的哈希键"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class FeatureRankingCache:
+    def __init__(self, cache_dir, max_entries=256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(dataset_hash, target_col, clip_quantiles, top_k, fit_end=None):
+        return config_key('feature_ranking', dataset_hash, target_col, list(clip_quantiles), top_k, fit_end)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                features = json.load(f)['features']
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            print(f"特征选择缓存未命中 (hits={self.hits}, misses={self.misses})")
+            return None
+        self.hits += 1
+        print(f"特征选择缓存命中 (hits={self.hits}, misses={self.misses})")
+        return features
+
+    def put(self, key, features):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'features': list(features)}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir) if name.endswith('.json')
+        ]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda path: os.path.getmtime(path))
+        for path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class PreprocessCache:
+    META_FILE = 'meta.json'
+
+    def __init__(self, cache_dir, max_entries=32):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def entry_path(self, key):
+        """条目所在目录 (不存在时为 None)，子进程可直接用 np.load(..., mmap_mode='r') 打开其中的数组"""
+        path = self._path(key)
+        return path if os.path.isdir(path) else None
+
+    def get(self, key):
+        """命中时返回 (arrays, meta)，arrays 为只读内存映射的 np.ndarray 字典"""
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, self.META_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+                for name in meta['arrays']
+            }
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            print(f"预处理缓存未命中 (hits={self.hits}, misses={self.misses})")
+            return None
+        self.hits += 1
+        print(f"预处理缓存命中 (hits={self.hits}, misses={self.misses})")
+        return arrays, meta
+
+    def put(self, key, arrays, meta):
+        """先写入临时目录再整体重命名，并发写入同一键时只保留先完成的一份"""
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(tmp_dir, self.META_FILE), 'w', encoding='utf-8') as f:
+                json.dump({**meta, 'arrays': list(arrays)}, f, ensure_ascii=False)
+            os.rename(tmp_dir, self._path(key))
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(self._path(key)):
+                raise
+        self._evict()
+
+    def _evict(self):
+        entries = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir) if not name.startswith('.tmp-')
+        ]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda path: os.path.getmtime(path))
+        # 已被其他任务映射的文件在删除后仍可继续读取
+        for path in entries[:len(entries) - self.max_entries]:
+            shutil.rmtree(path, ignore_errors=True)
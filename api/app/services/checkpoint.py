@@ -0,0 +1,88 @@
+"""
+训练断点 (crash-safe checkpoint / resume)
+
+每个任务的断点保存在 CHECKPOINT_DIR/{task_id}/ 下，每个训练单元一个文件
+(顺序/进程模式下每个集成成员一个 member_{i}.pt，向量化模式下整个集成一个 ensemble.pt):
+- 训练中: done=False，包含下一个 epoch、模型/优化器/学习率调度器状态、
+  BestStateTracker 的最佳权重与 EMA、早停计数、循环变量以及全部随机数状态
+- 已完成: done=True，包含最终 (最佳) 权重、训练摘要和完成时的随机数状态
+
+文件先写入临时文件再 os.replace，进程在任意时刻被杀死都不会留下损坏的断点。
+同一 task_id 重新运行 train_model_task 时自动从这些文件继续，任务成功后删除整个目录。
+"""
+import os
+import random
+import shutil
+import tempfile
+
+import numpy as np
+import torch
+
+from app.core.config import settings
+
+
+def task_checkpoint_dir(task_id):
+    return os.path.join(settings.CHECKPOINT_DIR, str(task_id))
+
+
+def clear_task_checkpoints(task_id):
+    shutil.rmtree(task_checkpoint_dir(task_id), ignore_errors=True)
+
+
+def capture_rng_state(augmenter=None):
+    state = {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state()
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    if augmenter is not None:
+        state['augmenter'] = augmenter.state_dict()
+    return state
+
+
+def restore_rng_state(state, augmenter=None):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+    if augmenter is not None and 'augmenter' in state:
+        augmenter.load_state_dict(state['augmenter'])
+
+
+class TrainingCheckpoint:
+    """单个训练单元的断点文件；every 为保存间隔 (epoch)"""
+    def __init__(self, directory, name, every=10):
+        self.path = os.path.join(directory, f"{name}.pt")
+        self.every = every
+
+    @classmethod
+    def for_task(cls, task_id, name, every=10):
+        return cls(task_checkpoint_dir(task_id), name, every)
+
+    def due(self, epoch):
+        return self.every > 0 and epoch % self.every == 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            return torch.load(self.path, map_location='cpu')
+        except Exception as e:
+            print(f"读取断点失败，重新训练: {e}")
+            return None
+
+    def save(self, payload):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                torch.save(payload, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -18,11 +18,90 @@
    - 输出: 多层次特征聚合 + 残差预测 + 智能融合
 """
 
+import copy
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
 from einops import rearrange
+from torch.func import functional_call, stack_module_state, vmap
+
+
+# ============== 共享组件: 选择性状态空间 ==============
+# 两种模型都可以用它替换注意力分支 (mixer='ssm')，复杂度随 seq_len 线性增长
+
+MIXERS = ('attention', 'ssm')
+
+
+def associative_scan(a, b):
+    """
+    沿 dim=1 并行求解线性递推 h_t = a_t * h_{t-1} + b_t (h_{-1} = 0)
+    
+    奇偶归约的 Blelloch 式扫描: 相邻两步合并为 (a1*a0, a1*b0 + b1)，
+    对长度减半的序列递归求解奇数位置，再由奇数位置一步得到偶数位置。
+    总工作量 O(L)，深度 O(log L)；只涉及 a 的连乘 (0 < a <= 1)，数值稳定。
+    """
+    length = a.shape[1]
+    if length == 1:
+        return b
+    if length % 2:
+        # 补一个恒等元 (a=1, b=0)
+        a = torch.cat([a, torch.ones_like(a[:, :1])], dim=1)
+        b = torch.cat([b, torch.zeros_like(b[:, :1])], dim=1)
+    a_even, a_odd = a[:, 0::2], a[:, 1::2]
+    b_even, b_odd = b[:, 0::2], b[:, 1::2]
+    
+    h_odd = associative_scan(a_odd * a_even, a_odd * b_even + b_odd)
+    h_prev = torch.cat([torch.zeros_like(h_odd[:, :1]), h_odd[:, :-1]], dim=1)
+    h_even = a_even * h_prev + b_even
+    
+    h = torch.stack([h_even, h_odd], dim=2)
+    return h.reshape(h.shape[0], -1, *h.shape[3:])[:, :length]
+
+
+class SelectiveSSM(nn.Module):
+    """
+    选择性状态空间块 (S6 / Mamba 风格)
+    
+    h_t = exp(Δ_t A) h_{t-1} + Δ_t B_t x_t,   y_t = C_t h_t + D x_t
+    Δ、B、C 由输入决定 (选择性)，状态维度为 d_state；
+    递推通过 associative_scan 并行计算，输出经 SiLU 门控后投影回 d_model。
+    结构为 pre-norm 残差块，可直接替换 MiniAttention / AutoformerAttention。
+    """
+    def __init__(self, d_model, d_state=16, dropout=0.1):
+        super().__init__()
+        self.d_model = d_model
+        self.d_state = d_state
+        
+        self.norm = nn.LayerNorm(d_model)
+        self.in_proj = nn.Linear(d_model, d_model * 2)
+        self.conv1d = nn.Conv1d(d_model, d_model, kernel_size=3, padding=1, groups=d_model)
+        self.x_proj = nn.Linear(d_model, d_state * 2)
+        self.dt_proj = nn.Linear(d_model, d_model)
+        # S4D-real 初始化: A = -[1, 2, ..., d_state]
+        self.A_log = nn.Parameter(torch.log(torch.arange(1, d_state + 1).float()).repeat(d_model, 1))
+        self.D = nn.Parameter(torch.ones(d_model))
+        self.out_proj = nn.Linear(d_model, d_model)
+        self.dropout = nn.Dropout(dropout)
+        
+    def forward(self, x):
+        residual = x
+        x_in, z = self.in_proj(self.norm(x)).chunk(2, dim=-1)
+        x_in = F.silu(self.conv1d(x_in.transpose(1, 2)).transpose(1, 2))
+        
+        delta = F.softplus(self.dt_proj(x_in))                       # B, L, D
+        B_t, C_t = self.x_proj(x_in).chunk(2, dim=-1)               # B, L, N
+        A = -torch.exp(self.A_log)                                  # D, N
+        
+        decay = torch.exp(delta.unsqueeze(-1) * A)                  # B, L, D, N
+        drive = (delta * x_in).unsqueeze(-1) * B_t.unsqueeze(2)     # B, L, D, N
+        h = associative_scan(decay, drive)
+        y = (h * C_t.unsqueeze(2)).sum(dim=-1) + x_in * self.D
+        
+        out = self.out_proj(y * F.silu(z))
+        out = self.dropout(out)
+        return out + residual
 
 
 # ============== Mamformer 模型组件 ==============
@@ -73,15 +152,27 @@ class MiniMamba(nn.Module):
         x = self.dropout(x)
         return x + residual
 
+ATTN_BACKENDS = ('sdpa', 'math')
+
+
 class MiniAttention(nn.Module):
     """
     增强型多头注意力机制 - Mamformer核心组件
     标准的缩放点积注意力
+    
+    attn_backend:
+    - 'sdpa': 使用 F.scaled_dot_product_attention 融合内核，不显式构造 L×L 分数矩阵
+    - 'math': 原始的 matmul + softmax 实现
+    当前 PyTorch 不提供 scaled_dot_product_attention 时自动回退到 'math'。
+    两种后端参数完全相同，可直接加载已有的 .pth 权重。
     """
-    def __init__(self, d_model, n_heads=4, dropout=0.2):
+    def __init__(self, d_model, n_heads=4, dropout=0.2, attn_backend='sdpa'):
         super().__init__()
+        if attn_backend not in ATTN_BACKENDS:
+            raise ValueError(f"Unknown attn_backend: {attn_backend}")
         self.n_heads = n_heads
         self.d_k = d_model // n_heads
+        self.attn_backend = attn_backend
         
         self.qkv = nn.Linear(d_model, d_model * 3)
         self.fc = nn.Linear(d_model, d_model)
@@ -91,8 +182,27 @@ class MiniAttention(nn.Module):
     def forward(self, x):
         residual = x
         x = self.norm(x)
-        B, L, D = x.shape
         
+        if self.attn_backend == 'sdpa' and hasattr(F, 'scaled_dot_product_attention'):
+            out = self._sdpa(x)
+        else:
+            out = self._math(x)
+        out = self.fc(out)
+        out = self.dropout(out)
+        
+        return out + residual
+    
+    def _sdpa(self, x):
+        B, L, D = x.shape
+        qkv = self.qkv(x).view(B, L, 3, self.n_heads, self.d_k).permute(2, 0, 3, 1, 4)
+        q, k, v = qkv.unbind(0)
+        out = F.scaled_dot_product_attention(
+            q, k, v,
+            dropout_p=self.dropout.p if self.training else 0.0
+        )
+        return out.transpose(1, 2).reshape(B, L, D)
+    
+    def _math(self, x):
         qkv = self.qkv(x).chunk(3, dim=-1)
         q, k, v = [rearrange(t, 'b l (h d) -> b h l d', h=self.n_heads) for t in qkv]
         
@@ -101,29 +211,34 @@ class MiniAttention(nn.Module):
         attn = self.dropout(attn)
         
         out = torch.matmul(attn, v)
-        out = rearrange(out, 'b h l d -> b l (h d)')
-        out = self.fc(out)
-        out = self.dropout(out)
-        
-        return out + residual
+        return rearrange(out, 'b h l d -> b l (h d)')
 
 class MamformerBlock(nn.Module):
     """
     Mamformer块 - 串联结构
-    Mamba -> Attention -> MLP
+    Mamba -> Attention (或 SelectiveSSM) -> MLP
     """
-    def __init__(self, d_model, n_heads=4, dropout=0.2):
+    def __init__(self, d_model, n_heads=4, dropout=0.2, attn_backend='sdpa', mixer='attention', d_state=16):
         super().__init__()
+        if mixer not in MIXERS:
+            raise ValueError(f"Unknown mixer: {mixer}")
+        self.mixer = mixer
         self.mamba = MiniMamba(d_model, dropout)
-        self.attn = MiniAttention(d_model, n_heads, dropout)
+        if mixer == 'ssm':
+            self.ssm = SelectiveSSM(d_model, d_state=d_state, dropout=dropout)
+        else:
+            self.attn = MiniAttention(d_model, n_heads, dropout, attn_backend=attn_backend)
         self.mlp = GatedMLP(d_model, expansion_factor=2, dropout=dropout)
         
     def forward(self, x):
         x = self.mamba(x)
-        x = self.attn(x)
+        x = self.ssm(x) if self.mixer == 'ssm' else self.attn(x)
         x = self.mlp(x)
         return x
 
+HEAD_MODES = ('flatten', 'pool', 'attn')
+
+
 class Mamformer(nn.Module):
     """
     Mamformer模型 - 来源: train_whiteness.py
@@ -131,12 +246,23 @@ class Mamformer(nn.Module):
     架构特点:
     - 输入投影: Linear + LayerNorm + GELU + Dropout
     - 核心层: MamformerBlock (Mamba + Attention + MLP) × n_layers
-    - 输出: 展平 + MLP预测头
+    - 输出: 时间维聚合 + MLP预测头
+    - attn_backend: 注意力实现 ('sdpa' 融合内核 / 'math' 原始实现)，不影响权重格式
+    - mixer: 'attention' (MiniAttention，O(L^2)) 或 'ssm' (SelectiveSSM，O(L))
+    - head_mode: 时间维聚合方式
+      - 'flatten': 展平为 d_model * seq_len (原始结构，头部参数随 seq_len 线性增长)
+      - 'pool':    全局平均池化为 d_model
+      - 'attn':    可学习打分的注意力池化为 d_model
+      后两种头部与 seq_len 无关，同一模型可用于任意窗口长度。
     
     适用场景: 表格数据、中小规模时序预测
     """
-    def __init__(self, input_dim, d_model=128, n_layers=3, seq_len=8, pred_len=1, dropout=0.2):
+    def __init__(self, input_dim, d_model=128, n_layers=3, seq_len=8, pred_len=1, dropout=0.2,
+                 attn_backend='sdpa', head_mode='flatten', mixer='attention', d_state=16):
         super().__init__()
+        if head_mode not in HEAD_MODES:
+            raise ValueError(f"Unknown head_mode: {head_mode}")
+        self.head_mode = head_mode
         
         self.input_proj = nn.Sequential(
             nn.Linear(input_dim, d_model),
@@ -146,14 +272,18 @@ class Mamformer(nn.Module):
         )
         
         self.layers = nn.ModuleList([
-            MamformerBlock(d_model, n_heads=4, dropout=dropout)
+            MamformerBlock(d_model, n_heads=4, dropout=dropout, attn_backend=attn_backend,
+                           mixer=mixer, d_state=d_state)
             for _ in range(n_layers)
         ])
         
         self.global_pool = nn.AdaptiveAvgPool1d(1) # Pooling over time dimension
+        if head_mode == 'attn':
+            self.attn_pool = nn.Linear(d_model, 1)
         
+        head_in = d_model * seq_len if head_mode == 'flatten' else d_model
         self.output_proj = nn.Sequential(
-            nn.Linear(d_model * seq_len, d_model),
+            nn.Linear(head_in, d_model),
             nn.GELU(),
             nn.Dropout(dropout),
             nn.Linear(d_model, d_model // 2),
@@ -161,17 +291,35 @@ class Mamformer(nn.Module):
             nn.Linear(d_model // 2, pred_len)
         )
         
-    def forward(self, x):
+    def embed(self, x):
+        """逐时间步的输入投影，结果与所在窗口无关 (StreamingSession 会缓存)"""
+        return self.input_proj(x)
+    
+    def forward_embedded(self, x, x_last=None):
+        """
+        x: embed() 的输出 [B, L, d_model]
+        x_last 不参与计算 (Mamformer 没有基于原始输入的残差支路)，只为与
+        AutoMamformer.forward_embedded(features, x_last) 保持同一签名，
+        StreamingSession 可以不区分模型类型地调用
+        """
         B, L, _ = x.shape
-        x = self.input_proj(x)
-        
         for layer in self.layers:
             x = layer(x)
         
-        # Flatten: B, L, D -> B, L*D
-        x = x.reshape(B, -1)
+        if self.head_mode == 'pool':
+            # B, L, D -> B, D
+            x = self.global_pool(x.transpose(1, 2)).squeeze(-1)
+        elif self.head_mode == 'attn':
+            weights = torch.softmax(self.attn_pool(x), dim=1)  # B, L, 1
+            x = (weights * x).sum(dim=1)
+        else:
+            # Flatten: B, L, D -> B, L*D
+            x = x.reshape(B, -1)
         out = self.output_proj(x)
         return out
+        
+    def forward(self, x):
+        return self.forward_embedded(self.embed(x))
 
 
 # ============== Auto-Mamformer 模型组件 ==============
@@ -182,16 +330,45 @@ class SeriesDecomp(nn.Module):
     """
     序列分解模块 - Autoformer核心组件
     使用移动平均分离趋势项和季节项
+    
+    移动平均基于前缀和实现: 每个位置的窗口和由两次前缀和相减得到，
+    复杂度 O(L) 与 kernel_size 无关。边界处窗口截断并按实际元素数平均
+    (等价于 count_include_pad=False)；偶数窗口左侧少取一个元素，
+    因此输出长度始终为 seq_len，不需要插值。前缀和在 float64 下累加，
+    长序列 (数千步) 也不会出现明显的舍入误差。
     """
     def __init__(self, kernel_size=25):
         super().__init__()
         self.kernel_size = kernel_size
         
     def forward(self, x):
+        trend = self.moving_avg(x)
+        seasonal = x - trend
+        return seasonal, trend
+    
+    def _effective_kernel(self, seq_len):
+        return max(min(self.kernel_size, seq_len), 1)
+    
+    def moving_avg(self, x):
+        batch_size, seq_len, hidden = x.shape
+        kernel_size = self._effective_kernel(seq_len)
+        left = (kernel_size - 1) // 2
+        right = kernel_size - 1 - left
+        
+        # prefix[:, i] = sum(x[:, :i])
+        prefix = F.pad(torch.cumsum(x.double(), dim=1), (0, 0, 1, 0))
+        positions = torch.arange(seq_len, device=x.device)
+        lo = (positions - left).clamp(min=0)
+        hi = (positions + right + 1).clamp(max=seq_len)
+        
+        window_sum = prefix[:, hi] - prefix[:, lo]
+        counts = (hi - lo).to(window_sum.dtype).view(1, seq_len, 1)
+        return (window_sum / counts).to(x.dtype)
+    
+    def moving_avg_pool(self, x):
+        """原始的 avg_pool1d 实现，偶数窗口时依赖插值，保留用于对比测试和基准"""
         batch_size, seq_len, hidden = x.shape
-        kernel_size = min(self.kernel_size, seq_len)
-        if kernel_size < 1:
-            kernel_size = 1
+        kernel_size = self._effective_kernel(seq_len)
         x_transposed = x.transpose(1, 2)
         padding = max((kernel_size - 1) // 2, 0)
         trend = F.avg_pool1d(
@@ -203,9 +380,7 @@ class SeriesDecomp(nn.Module):
         )
         if trend.shape[-1] != seq_len:
             trend = F.interpolate(trend, size=seq_len, mode='linear', align_corners=False)
-        trend = trend.transpose(1, 2)
-        seasonal = x - trend
-        return seasonal, trend
+        return trend.transpose(1, 2)
 
 
 class AutoCorrelation(nn.Module):
@@ -225,9 +400,9 @@ class AutoCorrelation(nn.Module):
         self.v_proj = nn.Linear(d_model, d_model)
         self.out_proj = nn.Linear(d_model, d_model)
         
-    def time_delay_agg(self, values, corr):
-        batch, head, length, channel = values.shape
-        
+    def _select_delays(self, corr):
+        """按批次平均相关性选出 Top-k 时间延迟，返回 (延迟索引 [k], 每个样本的权重 [B, k])"""
+        length = corr.shape[2]
         top_k = int(self.factor * np.log(length + 1)) if length > 1 else 1
         top_k = max(1, min(top_k, length))
         
@@ -237,6 +412,36 @@ class AutoCorrelation(nn.Module):
         indices = torch.topk(mean_across_batch, actual_k, dim=-1)[1]
         selected = mean_value[:, indices]
         weights = torch.softmax(selected, dim=-1)
+        return indices, weights
+    
+    def time_delay_agg(self, values, corr):
+        """
+        向量化的时间延迟聚合
+        
+        对每个延迟先按 softmax 权重缩放 values，再用 [L] 的循环移位索引沿时间维 index_select，
+        逐个累加到输出。任意时刻只存在一个 [B, H, L, C] 的临时张量，不构造 k 个延迟的
+        [B, H, L, k, C] 张量；反向传播只保存 values 本身 (index_select 不保存输入)。
+        延迟索引留在设备上，循环次数取自 indices 的形状，没有 .item() 造成的主机同步。
+        """
+        length = values.shape[2]
+        indices, weights = self._select_delays(corr)
+        weights = weights.to(values.dtype)
+        
+        # 第 t 个输出位置读取 (t + delay) mod L 处的值
+        positions = torch.arange(length, device=values.device)
+        gather_idx = (positions.unsqueeze(1) + indices.unsqueeze(0)) % length  # [L, k]
+        
+        agg = None
+        for j in range(indices.size(0)):
+            term = (values * weights[:, j].view(-1, 1, 1, 1)).index_select(2, gather_idx[:, j])
+            agg = term if agg is None else agg + term
+        return agg
+    
+    def time_delay_agg_loop(self, values, corr):
+        """逐延迟循环的原始实现，保留用于等价性测试和基准对比"""
+        batch, head, length, channel = values.shape
+        indices, weights = self._select_delays(corr)
+        actual_k = indices.size(0)
         
         tmp_values = values.repeat(1, 1, 2, 1)
         delays_agg = torch.zeros_like(values).float()
@@ -288,6 +493,9 @@ class AutoformerAttention(nn.Module):
         seasonal, trend = self.decomp1(x)
         seasonal_out = self.auto_correlation(seasonal, seasonal, seasonal)
         x = residual + seasonal_out
+        if self.decomp2 is None:
+            # optimize_for_inference 已移除 decomp2: seasonal + trend == x
+            return x
         seasonal_out, trend_out = self.decomp2(x)
         return seasonal_out + trend_out
 
@@ -323,13 +531,23 @@ class SimplifiedMambaBlock(nn.Module):
 
 
 class AutoMamformerBlock(nn.Module):
-    """Auto-Mamformer块 - Mamba + Autoformer混合架构"""
-    def __init__(self, d_model, n_heads=8, dropout=0.1):
+    """
+    Auto-Mamformer块 - Mamba + Autoformer混合架构
+    mixer='ssm' 时用 SelectiveSSM 替换 Autoformer 分支
+    """
+    def __init__(self, d_model, n_heads=8, dropout=0.1, mixer='attention', d_state=16):
         super().__init__()
-        
-        self.mamba = SimplifiedMambaBlock(d_model)
-        self.autoformer_attn = AutoformerAttention(d_model, n_heads)
+        if mixer not in MIXERS:
+            raise ValueError(f"Unknown mixer: {mixer}")
+        self.mixer = mixer
+        
+        self.mamba = SimplifiedMambaBlock(d_model, d_state=d_state)
+        if mixer == 'ssm':
+            self.ssm = SelectiveSSM(d_model, d_state=d_state, dropout=dropout)
+        else:
+            self.autoformer_attn = AutoformerAttention(d_model, n_heads)
         self.gate = nn.Parameter(torch.tensor(0.5))
+        self.folded_gate = None
         
         self.ffn = nn.Sequential(
             nn.LayerNorm(d_model),
@@ -344,10 +562,17 @@ class AutoMamformerBlock(nn.Module):
         
     def forward(self, x):
         mamba_out = self.mamba(x)
-        autoformer_out = self.autoformer_attn(x)
-        fused = self.gate * mamba_out + (1 - self.gate) * autoformer_out
+        autoformer_out = self.ssm(x) if self.mixer == 'ssm' else self.autoformer_attn(x)
+        if self.folded_gate is not None:
+            gate, gate_rest = self.folded_gate
+            fused = gate * mamba_out + gate_rest * autoformer_out
+        else:
+            fused = self.gate * mamba_out + (1 - self.gate) * autoformer_out
         
         ffn_out = self.ffn(fused)
+        if self.decomp_ffn is None:
+            # optimize_for_inference 已移除 decomp_ffn: seasonal + trend == fused + ffn_out
+            return fused + ffn_out
         seasonal, trend = self.decomp_ffn(fused + ffn_out)
         output = seasonal + trend
         
@@ -397,12 +622,14 @@ class AutoMamformer(nn.Module):
       - Mamba分支: 状态空间建模
       - Autoformer分支: 自相关(FFT) + 序列分解
       - 门控融合: 可学习权重融合两分支
+      - mixer='ssm' 时 Autoformer 分支替换为线性复杂度的 SelectiveSSM
     - 特征聚合: 最后时刻 + 全局平均池化 + 全局最大池化
     - 预测头: MLP + 残差预测 + 智能融合
     
     适用场景: 复杂时序预测、需要捕捉周期性和趋势的场景
     """
-    def __init__(self, input_dim, d_model=128, n_layers=4, seq_len=24, pred_len=1, dropout=0.15):
+    def __init__(self, input_dim, d_model=128, n_layers=4, seq_len=24, pred_len=1, dropout=0.15,
+                 mixer='attention', d_state=16):
         super().__init__()
         self.seq_len = seq_len
         self.pred_len = pred_len
@@ -416,7 +643,7 @@ class AutoMamformer(nn.Module):
         
         # 3. Auto-Mamformer层
         self.layers = nn.ModuleList([
-            AutoMamformerBlock(d_model, n_heads=8, dropout=dropout)
+            AutoMamformerBlock(d_model, n_heads=8, dropout=dropout, mixer=mixer, d_state=d_state)
             for _ in range(n_layers)
         ])
         
@@ -442,6 +669,7 @@ class AutoMamformer(nn.Module):
         
         # 7. 融合权重
         self.fusion_weights = nn.Parameter(torch.tensor([0.8, 0.15, 0.05]))
+        self.folded_fusion_weights = None
         
         self.apply(self._init_weights)
         
@@ -456,12 +684,18 @@ class AutoMamformer(nn.Module):
         elif isinstance(module, nn.Conv1d):
             torch.nn.init.kaiming_normal_(module.weight, mode='fan_out', nonlinearity='relu')
     
+    def embed(self, x):
+        """逐时间步的增强特征学习，结果与所在窗口无关 (StreamingSession 会缓存)"""
+        return self.feature_learning(x)
+    
     def forward(self, x):
-        batch_size, seq_len, _ = x.shape
-        x_raw = x
-        
         # 1. 增强特征学习
-        features = self.feature_learning(x)
+        features = self.embed(x)
+        return self.forward_embedded(features, x[:, -1, :])
+    
+    def forward_embedded(self, features, x_last):
+        """features: embed() 的输出 [B, L, d_model]；x_last: 窗口最后一行原始输入 [B, input_dim]"""
+        batch_size, seq_len, _ = features.shape
         
         # 2. 位置编码
         features = features + self.pos_embedding[:seq_len].unsqueeze(0)
@@ -482,13 +716,161 @@ class AutoMamformer(nn.Module):
         main_pred = self.prediction_head(combined_features)
         
         # 6. 残差预测
-        linear_pred = self.linear_residual(x_raw[:, -1, :])
-        ar_pred = self.ar_residual(x_raw[:, -1, -1].unsqueeze(-1))
+        linear_pred = self.linear_residual(x_last)
+        ar_pred = self.ar_residual(x_last[:, -1].unsqueeze(-1))
         
         # 7. 智能融合
-        weights = F.softmax(self.fusion_weights, dim=0)
+        if self.folded_fusion_weights is not None:
+            weights = self.folded_fusion_weights
+        else:
+            weights = F.softmax(self.fusion_weights, dim=0)
         final_pred = (weights[0] * main_pred + 
                      weights[1] * linear_pred + 
                      weights[2] * ar_pred)
         
         return final_pred
+
+
+# ============== 向量化集成 ==============
+
+class StackedEnsemble(nn.Module):
+    """
+    向量化集成 - 将 n 个同构成员的参数沿新的第 0 维堆叠
+    (torch.func.stack_module_state)，通过 vmap + functional_call
+    在一次调用中完成所有成员的前向/反向，替代逐模型的 Python 循环。
+    
+    输入 x: [B, L, input_dim] (所有成员共享)
+    输出:   [n_models, B, pred_len]
+    
+    AdamW 等逐元素优化器作用于堆叠参数时，与为每个成员单独建立优化器等价。
+    Dropout 在各成员间独立采样 (randomness='different')。
+    """
+    def __init__(self, models):
+        super().__init__()
+        self.n_models = len(models)
+        params, buffers = stack_module_state(list(models))
+        self.param_names = list(params.keys())
+        self.buffer_names = list(buffers.keys())
+        self.stacked_params = nn.ParameterList([nn.Parameter(params[n]) for n in self.param_names])
+        for i, name in enumerate(self.buffer_names):
+            self.register_buffer(f"stacked_buffer_{i}", buffers[name])
+        # 结构模板放在 meta 设备上，不注册为子模块，避免参数重复计入
+        base = copy.deepcopy(models[0]).to('meta')
+        object.__setattr__(self, '_base', base)
+    
+    def train(self, mode=True):
+        super().train(mode)
+        self._base.train(mode)
+        return self
+    
+    def _member_forward(self, params, buffers, x):
+        return functional_call(self._base, (params, buffers), (x,))
+    
+    def forward(self, x):
+        params = dict(zip(self.param_names, self.stacked_params))
+        buffers = {name: getattr(self, f"stacked_buffer_{i}") for i, name in enumerate(self.buffer_names)}
+        return vmap(
+            self._member_forward, in_dims=(0, 0, None), randomness='different'
+        )(params, buffers, x)
+    
+    def member_state_dict(self, idx):
+        """第 idx 个成员的 state_dict (拷贝)，可直接加载到单个模型"""
+        state = {name: p[idx].detach().clone() for name, p in zip(self.param_names, self.stacked_params)}
+        for i, name in enumerate(self.buffer_names):
+            state[name] = getattr(self, f"stacked_buffer_{i}")[idx].clone()
+        return state
+    
+    @torch.no_grad()
+    def load_member_state_dict(self, idx, state):
+        for name, p in zip(self.param_names, self.stacked_params):
+            p[idx].copy_(state[name])
+        for i, name in enumerate(self.buffer_names):
+            getattr(self, f"stacked_buffer_{i}")[idx].copy_(state[name])
+
+
+# ============== 推理优化 ==============
+
+def optimize_for_inference(model, inplace=False):
+    """
+    返回一个仅用于推理的模型副本 (原模型不变)；inplace=True 时直接改写并返回原模型，
+    不复制参数 (如模型包中指向 mmap 的权重)
+    
+    - 切换到 eval 模式，并将所有 Dropout 替换为 Identity
+    - AutoformerAttention.decomp2 / AutoMamformerBlock.decomp_ffn 只是把分解结果
+      重新相加 (seasonal + trend == x)，直接移除
+    - AutoMamformerBlock.gate 折叠为 (g, 1 - g) 常数
+    - AutoMamformer.fusion_weights 的 softmax 结果折叠为常数
+    
+    参数仍保留在副本中，state_dict 与原模型兼容；输出与原模型在浮点误差内一致。
+    """
+    if not inplace:
+        model = copy.deepcopy(model)
+    model.eval()
+    
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if isinstance(child, nn.Dropout):
+                setattr(module, name, nn.Identity())
+    
+    with torch.no_grad():
+        for module in model.modules():
+            if isinstance(module, AutoformerAttention):
+                module.decomp2 = None
+            elif isinstance(module, AutoMamformerBlock):
+                module.decomp_ffn = None
+                gate = float(module.gate)
+                module.folded_gate = (gate, 1 - gate)
+            elif isinstance(module, AutoMamformer):
+                weights = F.softmax(module.fusion_weights, dim=0)
+                module.folded_fusion_weights = tuple(float(w) for w in weights)
+    
+    return model
+
+
+class StreamingSession:
+    """
+    滑动窗口流式推理会话
+    
+    生产环境中每到一行新数据，窗口向后滑动一步。逐时间步的嵌入
+    (Mamformer.input_proj / AutoMamformer.feature_learning) 与窗口位置无关，
+    这里对每行只计算一次并缓存在长度为 2 * seq_len 的双写环形缓冲区中，
+    当前窗口始终是缓冲区的一个连续切片，无需拷贝或 roll。
+    依赖整个窗口的层 (注意力/自相关/序列分解) 仍按窗口计算。
+    
+    用法:
+        session = StreamingSession(model, seq_len=12)
+        for row in rows:                    # row: [input_dim] 或 [B, input_dim]
+            pred = session.push(row)        # 窗口未填满时返回 None
+    """
+    def __init__(self, model, seq_len, optimize=True):
+        self.model = optimize_for_inference(model) if optimize else model.eval()
+        self.seq_len = seq_len
+        self.reset()
+    
+    def reset(self):
+        self._buffer = None
+        self._pos = 0
+        self._count = 0
+    
+    @torch.no_grad()
+    def push(self, row):
+        row = torch.as_tensor(row, dtype=torch.float32)
+        if row.dim() == 1:
+            row = row.unsqueeze(0)
+        row = row.to(next(self.model.parameters()).device)
+        
+        embedded = self.model.embed(row.unsqueeze(1)).squeeze(1)
+        if self._buffer is None:
+            batch, d_model = embedded.shape
+            self._buffer = embedded.new_zeros(batch, 2 * self.seq_len, d_model)
+        
+        L = self.seq_len
+        self._buffer[:, self._pos] = embedded
+        self._buffer[:, self._pos + L] = embedded
+        self._pos = (self._pos + 1) % L
+        self._count += 1
+        
+        if self._count < L:
+            return None
+        window = self._buffer[:, self._pos:self._pos + L]
+        return self.model.forward_embedded(window, row)
@@ -0,0 +1,149 @@
+"""
+进程内训练任务调度器 (eager 模式，无 Celery 时使用)
+
+- 固定数量的执行槽 (max_workers)，等待中的任务按优先级 (数值越大越优先) 排队，同优先级先进先出
+- 每个执行槽独占一组 CPU 核: 任务在独立的 spawn 子进程中运行，
+  启动时 os.sched_setaffinity 绑定到该组核并 torch.set_num_threads(核数)，
+  多个任务与 API 进程之间不会互相抢占线程
+  (torch.set_num_threads 作用于整个进程，因此无法在同一进程的多个线程间各自限制)
+- status(job_id) 返回排队位置或运行信息，供 /training/{id}/progress 展示
+- 同一 job_id 已在排队或运行时 submit 返回 False，不重复加入
+- shutdown() 终止正在运行的子进程；重启后训练任务从断点继续，超参数搜索从头重新运行
+  (由 app.worker.start_stale_task_monitor 重新派发)
+"""
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+
+
+class TaskClaimLost(Exception):
+    """任务心跳超时后已被其他执行者重新认领，当前执行者应停止 (由 app.worker 的心跳抛出)"""
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _run_job(fn, args, num_threads, cpus):
+    import torch
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(num_threads)
+    fn(*args)
+
+
+class TrainingScheduler:
+    def __init__(self, max_workers=2, threads_per_job=None):
+        cpus = available_cpus()
+        self.max_workers = max(1, max_workers)
+        self.threads_per_job = max(1, threads_per_job or len(cpus) // self.max_workers)
+        # 每个执行槽固定一组核；核数不足时各槽共用全部核
+        self.slot_cpus = [
+            cpus[k * self.threads_per_job:(k + 1) * self.threads_per_job]
+            if len(cpus) >= self.max_workers * self.threads_per_job else cpus
+            for k in range(self.max_workers)
+        ]
+        self._queue = []
+        self._counter = itertools.count()
+        self._queued = {}
+        self._running = {}
+        self._processes = {}
+        self._cond = threading.Condition(threading.RLock())
+        self._ctx = multiprocessing.get_context('spawn')
+        self._threads = [
+            threading.Thread(target=self._worker, args=(slot,), daemon=True, name=f"training-slot-{slot}")
+            for slot in range(self.max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job_id, fn, args=(), priority=0):
+        """fn 与 args 需可被 pickle (模块级函数)，在子进程中执行；返回是否加入队列"""
+        with self._cond:
+            if job_id in self._queued or job_id in self._running:
+                print(f"训练任务 {job_id} 已在调度器中，忽略重复提交")
+                return False
+            entry = [-priority, next(self._counter), job_id, fn, args]
+            heapq.heappush(self._queue, entry)
+            self._queued[job_id] = entry
+            position = self.status(job_id)['position']
+            self._cond.notify()
+        print(f"训练任务 {job_id} 已加入调度队列 (优先级 {priority}, 位置 {position})")
+        return True
+
+    def status(self, job_id):
+        with self._cond:
+            if job_id in self._running:
+                slot = self._running[job_id]
+                return {
+                    'state': 'running',
+                    'slot': slot,
+                    'num_threads': self.threads_per_job,
+                    'cpus': self.slot_cpus[slot]
+                }
+            entry = self._queued.get(job_id)
+            if entry is None:
+                return None
+            position = 1 + sum(1 for other in self._queued.values() if other[:2] < entry[:2])
+            return {'state': 'queued', 'position': position, 'queue_length': len(self._queued)}
+
+    def _worker(self, slot):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, job_id, fn, args = heapq.heappop(self._queue)
+                self._queued.pop(job_id, None)
+                self._running[job_id] = slot
+            try:
+                # 非 daemon 进程: 任务内部仍可创建进程池 (ensemble_mode='process')
+                process = self._ctx.Process(
+                    target=_run_job, args=(fn, args, self.threads_per_job, self.slot_cpus[slot]),
+                    name=f"training-{job_id}"
+                )
+                process.start()
+                with self._cond:
+                    self._processes[job_id] = process
+                process.join()
+                if process.exitcode != 0:
+                    print(f"训练任务 {job_id} 的进程异常退出 (exitcode={process.exitcode})")
+            except Exception as e:
+                print(f"训练任务 {job_id} 启动失败: {e}")
+            finally:
+                with self._cond:
+                    self._running.pop(job_id, None)
+                    self._processes.pop(job_id, None)
+
+    def shutdown(self):
+        with self._cond:
+            processes = list(self._processes.values())
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=10)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from app.core.config import settings
+            _scheduler = TrainingScheduler(
+                max_workers=settings.TRAINING_MAX_CONCURRENT_JOBS,
+                threads_per_job=settings.TRAINING_THREADS_PER_JOB
+            )
+        return _scheduler
+
+
+def shutdown_scheduler():
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.shutdown()
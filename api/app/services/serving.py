@@ -0,0 +1,165 @@
+"""
+CPU 推理产物导出与加载
+
+训练完成后可为整个集成 (MeanEnsemble: 所有成员预测取平均，与训练时的评估一致)
+导出以下产物 (与 model/{task_id}.bundle 放在同一目录):
+- torchscript: optimize_for_inference 后 trace 得到的 float32 TorchScript 图
+- int8:        对 Linear 层做动态 int8 量化后 trace 得到的 TorchScript 图
+
+导出时在测试集上对比各产物与 float32 eager 集成的 R2 / RMSE 差异、
+单样本推理延迟与文件大小，并记录满足精度约束的最快产物，
+预测服务通过 load_serving_model 优先加载该产物，否则由模型包加载全部成员。
+
+训练同时写出包含全部成员与预处理参数的模型包 (见 bundle.py)，
+get_bundle 按文件修改时间缓存已映射的模型包。
+"""
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.metrics import r2_score, mean_squared_error
+
+from app.services.model_arch import optimize_for_inference
+from app.services.bundle import load_bundle
+
+_bundle_cache = {}
+_bundle_lock = threading.Lock()
+
+
+class MeanEnsemble(nn.Module):
+    """集成成员预测取平均，可被 torch.jit.trace (成员循环在 trace 时展开)"""
+    def __init__(self, members):
+        super().__init__()
+        self.members = nn.ModuleList(members)
+
+    def forward(self, x):
+        return torch.stack([member(x) for member in self.members]).mean(dim=0)
+
+
+def _latency_ms(model, example, repeats=50):
+    with torch.no_grad():
+        model(example)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(example)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def _accuracy(model, test_inputs, trues_rescaled, inverse_fn):
+    with torch.no_grad():
+        preds = model(test_inputs).numpy().reshape(-1)
+    preds_rescaled = inverse_fn(preds)
+    return {
+        'r2': float(r2_score(trues_rescaled, preds_rescaled)),
+        'rmse': float(np.sqrt(mean_squared_error(trues_rescaled, preds_rescaled)))
+    }
+
+
+def export_serving_artifacts(models, model_path, test_inputs, trues_rescaled, inverse_fn, max_r2_drop=0.01):
+    """
+    导出整个集成的 TorchScript / 动态 int8 产物并生成对比报告；不修改传入的模型
+
+    models:         训练好的 float32 集成成员列表 (其权重已保存在 model_path，如模型包)
+    test_inputs:    测试集输入 [N, L, input_dim]
+    trues_rescaled: 原始尺度的测试集真实值
+    inverse_fn:     将缩放空间的预测值映射回原始尺度
+    max_r2_drop:    产物相对 float32 的 R2 最大允许下降，超过则不参与最快产物选择
+    """
+    base_path = os.path.splitext(model_path)[0]
+    test_inputs = test_inputs.cpu()
+    example = test_inputs[:1]
+    eager = optimize_for_inference(MeanEnsemble([copy.deepcopy(model).cpu() for model in models]))
+
+    reference = _accuracy(eager, test_inputs, trues_rescaled, inverse_fn)
+    report = {
+        'fp32': {
+            'path': model_path,
+            'size_bytes': os.path.getsize(model_path),
+            'latency_ms': _latency_ms(eager, example),
+            **reference
+        }
+    }
+
+    candidates = {
+        'torchscript': (lambda: eager, f"{base_path}.ts.pt"),
+        'int8': (lambda: torch.ao.quantization.quantize_dynamic(eager, {nn.Linear}, dtype=torch.qint8),
+                 f"{base_path}.int8.ts.pt"),
+    }
+    for name, (build, path) in candidates.items():
+        try:
+            with torch.no_grad():
+                traced = torch.jit.freeze(torch.jit.trace(build(), example).eval())
+            torch.jit.save(traced, path)
+            loaded = torch.jit.load(path)
+            accuracy = _accuracy(loaded, test_inputs, trues_rescaled, inverse_fn)
+            report[name] = {
+                'path': path,
+                'size_bytes': os.path.getsize(path),
+                'latency_ms': _latency_ms(loaded, example),
+                **accuracy,
+                'r2_delta': accuracy['r2'] - reference['r2'],
+                'rmse_delta': accuracy['rmse'] - reference['rmse']
+            }
+        except Exception as e:
+            print(f"导出 {name} 失败: {e}")
+            report[name] = {'error': str(e)}
+
+    eligible = [
+        name for name, info in report.items()
+        if 'latency_ms' in info and info.get('r2_delta', 0.0) >= -max_r2_drop
+    ]
+    fastest = min(eligible, key=lambda name: report[name]['latency_ms'])
+    report['fastest'] = fastest
+
+    print(f"推理产物导出完成 (最快: {fastest}):")
+    for name in ['fp32', *candidates]:
+        info = report[name]
+        if 'latency_ms' in info:
+            print(f"  {name}: {info['latency_ms']:.3f} ms, {info['size_bytes'] / 1024:.1f} KB, "
+                  f"R2={info['r2']:.4f}, RMSE={info['rmse']:.4f}")
+    return report
+
+
+def get_bundle(path, device=None):
+    """加载 (或复用已映射的) 模型包；文件被覆盖后重新映射"""
+    key = (os.path.abspath(path), str(device))
+    mtime = os.path.getmtime(path)
+    with _bundle_lock:
+        cached = _bundle_cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    bundle = load_bundle(path, device=device)
+    with _bundle_lock:
+        _bundle_cache[key] = (mtime, bundle)
+    return bundle
+
+
+def load_serving_model(config, model_path, input_dim, export_report=None, device=None):
+    """
+    加载推理模型 (输出为集成平均预测):
+    若有导出报告，优先加载其中最快的 TorchScript 产物；其次由同名模型包加载全部成员
+    (load_bundle 已对成员应用 optimize_for_inference)；
+    都没有时 (旧任务) 按训练配置重建模型结构并加载 model_path 中的单个 state_dict。
+    """
+    device = device or torch.device('cpu')
+    if export_report:
+        fastest = export_report.get('fastest')
+        info = export_report.get(fastest) or {}
+        if fastest != 'fp32' and info.get('path') and os.path.exists(info['path']):
+            return torch.jit.load(info['path'], map_location=device)
+
+    bundle_path = f"{os.path.splitext(model_path)[0]}.bundle"
+    if os.path.exists(bundle_path):
+        return MeanEnsemble(get_bundle(bundle_path, device=device).models).eval()
+
+    from app.services.trainer import build_model
+    model = build_model(config.get('model_type', 'mamformer'), input_dim, config.get('seq_len', 12), config)
+    state = torch.load(model_path, map_location=device)
+    if isinstance(state, dict) and 'model_state_dict' in state:
+        state = state['model_state_dict']
+    model.load_state_dict(state)
+    return optimize_for_inference(model.to(device))
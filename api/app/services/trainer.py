@@ -2,35 +2,91 @@ import torch
 import torch.nn as nn
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from torch.utils.data import Dataset, DataLoader
 from sklearn.preprocessing import RobustScaler
 from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error, mean_absolute_percentage_error
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-import copy
+import multiprocessing
 import os
 import time
-from app.services.model_arch import Mamformer, AutoMamformer
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from app.services.model_arch import Mamformer, AutoMamformer, StackedEnsemble
+from app.services.serving import export_serving_artifacts
+from app.services.bundle import save_bundle
+from app.services.cache import FeatureRankingCache, PreprocessCache, config_key, file_sha256
+from app.services.checkpoint import TrainingCheckpoint, capture_rng_state, clear_task_checkpoints, restore_rng_state
+from app.core.config import settings
+
+CLIP_QUANTILES = (0.01, 0.99)
+TEST_SIZE = 0.15
+VAL_RATIO = 0.15
+
+_feature_cache = None
+_preprocess_cache = None
+_raw_cache = None
+
+def get_feature_cache():
+    global _feature_cache
+    if _feature_cache is None:
+        _feature_cache = FeatureRankingCache(
+            os.path.join(settings.CACHE_DIR, "feature_ranking"),
+            max_entries=settings.FEATURE_CACHE_MAX_ENTRIES
+        )
+    return _feature_cache
+
+def get_raw_cache():
+    global _raw_cache
+    if _raw_cache is None:
+        _raw_cache = PreprocessCache(
+            os.path.join(settings.CACHE_DIR, "raw"),
+            max_entries=settings.PREPROCESS_CACHE_MAX_ENTRIES
+        )
+    return _raw_cache
+
+def get_preprocess_cache():
+    global _preprocess_cache
+    if _preprocess_cache is None:
+        _preprocess_cache = PreprocessCache(
+            os.path.join(settings.CACHE_DIR, "preprocess"),
+            max_entries=settings.PREPROCESS_CACHE_MAX_ENTRIES
+        )
+    return _preprocess_cache
 
 class AugmentedDataset(Dataset):
-    """Augmented Dataset"""
-    def __init__(self, data, target_idx, seq_len=8, augment=False):
+    """
+    Augmented Dataset
+    
+    每个样本的目标为窗口最后一步起连续 pred_len 步的目标列
+    (pred_len=1 时即窗口最后一步)。
+    
+    窗口不逐个复制: 先对整段数据复制一次并将目标列置零，
+    再用 sliding_window_view 得到 [N, seq_len, features] 的跨步视图，
+    内存占用与原始数据同量级，而不是 seq_len 倍。
+    """
+    def __init__(self, data, target_idx, seq_len=8, augment=False, pred_len=1):
         self.data = data
         self.target_idx = target_idx
         self.seq_len = seq_len
+        self.pred_len = pred_len
         self.augment = augment
         
-        self.sequences = []
-        self.targets = []
-        
-        for i in range(len(data) - seq_len + 1):
-            seq = data[i:i+seq_len, :].copy()
-            target = data[i+seq_len-1, target_idx]
-            seq[:, target_idx] = 0
-            self.sequences.append(seq)
-            self.targets.append([target])
+        n_windows = max(len(data) - seq_len - pred_len + 2, 0)
+        n_features = data.shape[1]
         
-        self.sequences = np.array(self.sequences)
-        self.targets = np.array(self.targets)
+        inputs = np.array(data, copy=True)
+        inputs[:, target_idx] = 0
+        self.inputs = inputs
+        if n_windows > 0:
+            # [len - seq_len + 1, features, seq_len] -> [N, seq_len, features]
+            windows = sliding_window_view(inputs, seq_len, axis=0).transpose(0, 2, 1)
+            targets = sliding_window_view(data[seq_len - 1:, target_idx], pred_len)
+            self.sequences = windows[:n_windows]
+            self.targets = targets[:n_windows]
+        else:
+            self.sequences = np.empty((0, seq_len, n_features), dtype=inputs.dtype)
+            self.targets = np.empty((0, pred_len), dtype=inputs.dtype)
         
     def __len__(self):
         return len(self.sequences)
@@ -58,6 +114,123 @@ class AugmentedDataset(Dataset):
         
         return torch.FloatTensor(seq), torch.FloatTensor(target)
 
+class TensorBatchLoader:
+    """
+    内存张量批迭代器 - 绕过 DataLoader 的逐样本 __getitem__ 与 collate
+    
+    只保存一份连续的输入张量 [T, features] (目标列已置零) 和目标张量 [N, pred_len]；
+    每个 batch 通过打乱后的索引切片，用 起点 + arange(seq_len) 的索引一次 gather 出
+    [B, seq_len, features] 的窗口。不支持逐样本增强 (可配合 BatchAugmenter)。
+    迭代语义与 DataLoader(batch_size, shuffle, drop_last=False) 一致。
+    """
+    def __init__(self, dataset, batch_size=32, shuffle=False):
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.inputs = torch.as_tensor(np.ascontiguousarray(dataset.inputs), dtype=torch.float32)
+        self.targets = torch.as_tensor(np.ascontiguousarray(dataset.targets), dtype=torch.float32)
+        self.offsets = torch.arange(dataset.seq_len)
+        self.n_samples = len(dataset)
+    
+    def __len__(self):
+        return (self.n_samples + self.batch_size - 1) // self.batch_size
+    
+    def __iter__(self):
+        if self.shuffle:
+            order = torch.randperm(self.n_samples)
+        else:
+            order = torch.arange(self.n_samples)
+        for start in range(0, self.n_samples, self.batch_size):
+            idx = order[start:start + self.batch_size]
+            yield self.inputs[idx.unsqueeze(1) + self.offsets], self.targets[idx]
+
+def make_loader(dataset, batch_size, shuffle, max_bytes=512 * 1024 * 1024):
+    """数据集不做逐样本增强且输入张量小于 max_bytes 时使用 TensorBatchLoader，否则回退 DataLoader"""
+    tensor_bytes = dataset.inputs.size * 4 + dataset.targets.size * 4
+    if not dataset.augment and tensor_bytes <= max_bytes:
+        return TensorBatchLoader(dataset, batch_size=batch_size, shuffle=shuffle)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle)
+
+class BatchAugmenter:
+    """
+    批量数据增强 - 与 AugmentedDataset 的逐样本增强策略相同，
+    但对整个 minibatch 用张量运算一次完成:
+    - mixup (p=0.3): 与同一 batch 内随机样本按 Beta(0.4, 0.4) 混合，目标同步混合
+    - 缩放 (p=0.4): 乘以 N(1, 0.05)
+    - 高斯噪声 (p=0.5): 加 N(0, 0.02)
+    - 时间遮挡 (p=0.2): 将连续 seq_len // 4 步置零
+    每个样本独立决定是否应用各项增强。给定 seed 时结果可复现。
+    """
+    def __init__(self, seed=None, mixup_p=0.3, scale_p=0.4, noise_p=0.5, mask_p=0.2):
+        self.mixup_p = mixup_p
+        self.scale_p = scale_p
+        self.noise_p = noise_p
+        self.mask_p = mask_p
+        self.seed = seed
+        self._generator = None
+        # Beta 分布采样不支持 torch.Generator，用 numpy Generator 保证可复现
+        self._np_rng = np.random.default_rng(seed)
+    
+    def _get_generator(self, device):
+        if self._generator is None or self._generator.device != device:
+            self._generator = torch.Generator(device=device)
+            if self.seed is not None:
+                self._generator.manual_seed(self.seed)
+            else:
+                self._generator.seed()
+        return self._generator
+    
+    def state_dict(self):
+        return {
+            'generator': None if self._generator is None else (
+                str(self._generator.device), self._generator.get_state()
+            ),
+            'np_rng': self._np_rng.bit_generator.state
+        }
+    
+    def load_state_dict(self, state):
+        if state['generator'] is not None:
+            device, generator_state = state['generator']
+            self._get_generator(torch.device(device)).set_state(generator_state)
+        self._np_rng.bit_generator.state = state['np_rng']
+    
+    def _rand(self, *shape, device):
+        return torch.rand(*shape, generator=self._get_generator(device), device=device)
+    
+    def _randn(self, *shape, device):
+        return torch.randn(*shape, generator=self._get_generator(device), device=device)
+    
+    def __call__(self, seq, target):
+        B, L = seq.shape[:2]
+        device = seq.device
+        expand = (B,) + (1,) * (seq.dim() - 1)
+        
+        if B > 1:
+            apply = self._rand(B, device=device) < self.mixup_p
+            partner = (self._rand(B, device=device) * B).long().clamp(max=B - 1)
+            lam = torch.as_tensor(self._np_rng.beta(0.4, 0.4, size=B), dtype=seq.dtype, device=device)
+            lam = torch.where(apply, lam, torch.ones_like(lam))
+            seq = lam.view(expand) * seq + (1 - lam.view(expand)) * seq[partner]
+            lam_t = lam.view((B,) + (1,) * (target.dim() - 1))
+            target = lam_t * target + (1 - lam_t) * target[partner]
+        
+        apply = self._rand(B, device=device) < self.scale_p
+        scale = 1.0 + 0.05 * self._randn(B, device=device)
+        seq = seq * torch.where(apply, scale, torch.ones_like(scale)).view(expand)
+        
+        apply = self._rand(B, device=device) < self.noise_p
+        noise = 0.02 * self._randn(*seq.shape, device=device)
+        seq = seq + noise * apply.view(expand)
+        
+        mask_len = max(1, L // 4)
+        if L > mask_len:
+            apply = self._rand(B, device=device) < self.mask_p
+            start = (self._rand(B, device=device) * (L - mask_len)).long()
+            steps = torch.arange(L, device=device).unsqueeze(0)
+            masked = (steps >= start.unsqueeze(1)) & (steps < (start + mask_len).unsqueeze(1)) & apply.unsqueeze(1)
+            seq = seq.masked_fill(masked.view(B, L, *([1] * (seq.dim() - 2))), 0)
+        
+        return seq, target
+
 def set_seed(seed=42):
     import random
     random.seed(seed)
@@ -85,59 +258,1117 @@ def select_top_features(df, target_col, top_k=20):
     
     return df[selected_features + [target_col]].copy()
 
-def train_model_task(
-    file_path: str,
-    target_col: str,
-    config: dict,
-    task_id: str,
-    update_progress_callback=None
-):
-    try:
-        set_seed(42)
-        df = pd.read_csv(file_path)
+def scaler_from_params(center, scale):
+    """由 center_ / scale_ 重建已拟合的 RobustScaler"""
+    scaler = RobustScaler()
+    scaler.center_ = np.asarray(center, dtype=np.float64)
+    scaler.scale_ = np.asarray(scale, dtype=np.float64)
+    scaler.n_features_in_ = len(scaler.center_)
+    return scaler
+
+def prepare_raw_dataset(file_path, target_col, config, dataset_hash=None, fit_end=None):
+    """
+    读取 CSV 并完成异常值截断与特征选择 (未划分、未缩放)
+    
+    fit_end 不为空时截断分位数与特征排序只在前 fit_end 行上拟合，再应用到整段数据
+    (walk-forward 各折以自身 train_end 调用，测试块不参与任何拟合)。
+    结果以 (文件内容哈希, 目标列, 截断分位数, top_k, fit_end) 为键缓存为 .npy，命中时直接内存映射。
+    返回 dict: data ([T, features] 数组), columns (含目标列的特征顺序), target_idx, dataset_hash
+    """
+    top_k = config.get('top_k', 12)
+    dataset_hash = dataset_hash or file_sha256(file_path)
+    
+    raw_cache = get_raw_cache()
+    cache_key = config_key('raw', dataset_hash, target_col, list(CLIP_QUANTILES), top_k, fit_end)
+    cached = raw_cache.get(cache_key)
+    if cached is not None:
+        arrays, meta = cached
+        return {
+            'data': arrays['data'],
+            'columns': meta['columns'],
+            'target_idx': meta['target_idx'],
+            'dataset_hash': dataset_hash
+        }
+    
+    df = pd.read_csv(file_path)
+    
+    # Preprocessing: 各特征列按分位数截断 (一次计算所有列的分位数)
+    feature_cols = df.columns.drop(target_col)
+    bounds = df[feature_cols].iloc[:fit_end].quantile(list(CLIP_QUANTILES))
+    df[feature_cols] = df[feature_cols].clip(bounds.iloc[0], bounds.iloc[1], axis=1)
+    
+    # 相同数据/目标/截断参数/top_k/拟合区间的任务直接复用特征排序结果
+    feature_cache = get_feature_cache()
+    feature_key = feature_cache.make_key(dataset_hash, target_col, CLIP_QUANTILES, top_k, fit_end)
+    selected_features = feature_cache.get(feature_key)
+    if selected_features is None:
+        df_fit = select_top_features(df.iloc[:fit_end], target_col, top_k=top_k)
+        selected_features = df_fit.columns.drop(target_col).tolist()
+        feature_cache.put(feature_key, selected_features)
+    df_selected = df[selected_features + [target_col]].copy()
+    
+    columns = df_selected.columns.tolist()
+    target_idx = columns.index(target_col)
+    data = df_selected.values
+    raw_cache.put(cache_key, {'data': data}, {'columns': columns, 'target_idx': target_idx})
+    return {'data': data, 'columns': columns, 'target_idx': target_idx, 'dataset_hash': dataset_hash}
+
+def split_and_scale(data, seq_len, train_end, test_end):
+    """
+    按时间顺序划分: data[:train_end] 的前 1 - VAL_RATIO 为训练集、其余为验证集，
+    测试集为 data[train_end:test_end] (向前多取 seq_len - 1 步作为第一个窗口的历史)。
+    RobustScaler 只在训练集上拟合。
+    """
+    train_data_raw = data[:train_end]
+    test_data_raw = data[train_end - seq_len + 1:test_end]
+    
+    train_size = int(len(train_data_raw) * (1 - VAL_RATIO))
+    train_subset_data = train_data_raw[:train_size]
+    val_subset_data = train_data_raw[train_size:]
+    
+    scaler = RobustScaler()
+    scaler.fit(train_subset_data)
+    return {
+        'train': scaler.transform(train_subset_data),
+        'val': scaler.transform(val_subset_data),
+        'test': scaler.transform(test_data_raw),
+        'scaler': scaler
+    }
+
+def prepare_dataset(file_path, target_col, config):
+    """
+    在 prepare_raw_dataset 的基础上按时间顺序划分 train/val/test 并做 RobustScaler 缩放
+    
+    结果以 (文件内容哈希, 目标列, 截断分位数, top_k, seq_len, 划分比例) 为键缓存为 .npy，
+    命中时直接内存映射，不再解析 CSV / 重新拟合 scaler。
+    返回 dict: train / val / test (缩放后的数组), scaler, columns (含目标列的特征顺序), target_idx,
+    cache_path (缓存条目目录，写入失败时为 None)
+    """
+    top_k = config.get('top_k', 12)
+    seq_len = config.get('seq_len', 12)
+    dataset_hash = file_sha256(file_path)
+    
+    preprocess_cache = get_preprocess_cache()
+    cache_key = config_key('preprocess', dataset_hash, target_col, list(CLIP_QUANTILES), top_k,
+                           seq_len, TEST_SIZE, VAL_RATIO)
+    cached = preprocess_cache.get(cache_key)
+    if cached is not None:
+        arrays, meta = cached
+        return {
+            'train': arrays['train'],
+            'val': arrays['val'],
+            'test': arrays['test'],
+            'scaler': scaler_from_params(arrays['scaler_center'], arrays['scaler_scale']),
+            'columns': meta['columns'],
+            'target_idx': meta['target_idx'],
+            'cache_path': preprocess_cache.entry_path(cache_key)
+        }
+    
+    raw = prepare_raw_dataset(file_path, target_col, config, dataset_hash=dataset_hash)
+    data = raw['data']
+    total_len = len(data)
+    split = split_and_scale(data, seq_len, int(total_len * (1 - TEST_SIZE)), total_len)
+    scaler = split['scaler']
+    
+    arrays = {
+        'train': split['train'],
+        'val': split['val'],
+        'test': split['test'],
+        'scaler_center': scaler.center_,
+        'scaler_scale': scaler.scale_
+    }
+    preprocess_cache.put(cache_key, arrays, {'columns': raw['columns'], 'target_idx': raw['target_idx']})
+    return {
+        'train': arrays['train'],
+        'val': arrays['val'],
+        'test': arrays['test'],
+        'scaler': scaler,
+        'columns': raw['columns'],
+        'target_idx': raw['target_idx'],
+        'cache_path': preprocess_cache.entry_path(cache_key)
+    }
+
+def make_data_loaders(prepared, config):
+    """
+    由 prepare_dataset 的结果构建 train / val / test 批迭代器
+    返回 (train_loader, val_loader, test_loader, augmenter)，prepared 不含 test 时 test_loader 为 None；
+    augment_mode='batch' (默认) 时由 BatchAugmenter 在 batch 上统一增强，数据集本身不再逐样本增强，
+    训练集可以使用 TensorBatchLoader；'sample' 为逐样本增强 (回退到 DataLoader)，'none' 不增强
+    """
+    seq_len = config.get('seq_len', 12)
+    pred_len = config.get('pred_len', 1)
+    target_idx = prepared['target_idx']
+    augment_mode = config.get('augment_mode', 'batch')
+    augmenter = BatchAugmenter(seed=42) if augment_mode == 'batch' else None
+    train_dataset = AugmentedDataset(
+        prepared['train'], target_idx, seq_len=seq_len, augment=augment_mode == 'sample', pred_len=pred_len
+    )
+    val_dataset = AugmentedDataset(prepared['val'], target_idx, seq_len=seq_len, augment=False, pred_len=pred_len)
+    
+    batch_size = config.get('batch_size', 32)
+    max_bytes = config.get('fast_loader_max_mb', 512) * 1024 * 1024
+    train_loader = make_loader(train_dataset, batch_size, shuffle=True, max_bytes=max_bytes)
+    val_loader = make_loader(val_dataset, batch_size, shuffle=False, max_bytes=max_bytes)
+    test_loader = None
+    if 'test' in prepared:
+        test_dataset = AugmentedDataset(prepared['test'], target_idx, seq_len=seq_len, augment=False, pred_len=pred_len)
+        test_loader = make_loader(test_dataset, batch_size, shuffle=False, max_bytes=max_bytes)
+    return train_loader, val_loader, test_loader, augmenter
+
+def inverse_transform_target(scaler, values, target_idx):
+    """只对目标列做 scaler 的逆变换"""
+    values = np.asarray(values).reshape(-1)
+    dummy = np.zeros((len(values), scaler.n_features_in_))
+    dummy[:, target_idx] = values
+    return scaler.inverse_transform(dummy)[:, target_idx]
+
+def regression_metrics(trues, preds):
+    """预测值/真实值为 [N] 或 [N, pred_len]，多步时在所有步上整体计算"""
+    trues = np.asarray(trues).reshape(-1)
+    preds = np.asarray(preds).reshape(-1)
+    return {
+        'r2': r2_score(trues, preds),
+        'mae': mean_absolute_error(trues, preds),
+        'rmse': np.sqrt(mean_squared_error(trues, preds)),
+        'mape': mean_absolute_percentage_error(trues, preds) * 100
+    }
+
+def build_model(model_type, input_dim, seq_len, config):
+    """根据模型类型选择不同的模型架构和默认参数"""
+    if model_type == 'auto-mamformer':
+        # Auto-Mamformer: Mamba + Autoformer (自相关 + 序列分解) + 门控融合
+        # 参考 auto_mamformer_bod.py 的配置
+        return AutoMamformer(
+            input_dim=input_dim,
+            d_model=config.get('d_model', 64),
+            n_layers=config.get('n_layers', 2),
+            seq_len=seq_len,
+            pred_len=config.get('pred_len', 1),
+            dropout=config.get('dropout', 0.05),  # Auto-Mamformer 使用较低的 dropout
+            mixer=config.get('mixer', 'attention'),
+            d_state=config.get('d_state', 16)
+        )
+    # 默认使用 mamformer
+    # Mamformer: Mamba + Attention + GatedMLP
+    # 参考 train_whiteness.py 的配置
+    return Mamformer(
+        input_dim=input_dim,
+        d_model=config.get('d_model', 64),
+        n_layers=config.get('n_layers', 2),
+        seq_len=seq_len,
+        pred_len=config.get('pred_len', 1),
+        dropout=config.get('dropout', 0.3),  # Mamformer 使用较高的 dropout 防止过拟合
+        attn_backend=config.get('attn_backend', 'sdpa'),
+        head_mode=config.get('head_mode', 'flatten'),
+        mixer=config.get('mixer', 'attention'),
+        d_state=config.get('d_state', 16)
+    )
+
+class ValidationEvaluator:
+    """
+    验证集指标的向量化计算
+    
+    RobustScaler 对每列是仿射变换 x * scale_ + center_，因此只用目标列的
+    center / scale 逆变换预测值与真实值，不再构造全宽矩阵调用 inverse_transform；
+    R2 / MAE / RMSE / MAPE 在 float64 张量上一次算出，定义与 sklearn 一致。
+    preds 可带前导维度 (如 [n_models, N])，对每一行分别计算。
+    """
+    def __init__(self, scaler, target_idx):
+        center = getattr(scaler, 'center_', None)
+        scale = getattr(scaler, 'scale_', None)
+        self.center = float(center[target_idx]) if center is not None else 0.0
+        self.scale = float(scale[target_idx]) if scale is not None else 1.0
+    
+    def inverse(self, values):
+        return values.double() * self.scale + self.center
+    
+    def __call__(self, preds, trues):
+        """preds: [..., N]，trues: [N] (均为缩放空间)；返回原始尺度指标张量的字典"""
+        y = self.inverse(trues)
+        p = self.inverse(preds)
+        err = p - y
+        n = y.shape[-1]
         
-        # Preprocessing
-        for col in df.columns:
-            if col != target_col:
-                q1 = df[col].quantile(0.01)
-                q3 = df[col].quantile(0.99)
-                df[col] = df[col].clip(q1, q3)
+        ss_res = (err ** 2).sum(dim=-1)
+        ss_tot = ((y - y.mean()) ** 2).sum()
+        # 与 sklearn 一致: 真实值为常数时，完全预测正确记 1，否则记 0
+        r2 = torch.where(
+            ss_tot > 0,
+            1 - ss_res / ss_tot.clamp_min(torch.finfo(torch.float64).tiny),
+            (ss_res == 0).double()
+        )
+        eps = torch.finfo(torch.float64).eps
+        return {
+            'r2': r2,
+            'mae': err.abs().mean(dim=-1),
+            'rmse': (ss_res / n).sqrt(),
+            'mape': (err.abs() / y.abs().clamp_min(eps)).mean(dim=-1) * 100
+        }
+
+class BestStateTracker:
+    """
+    最佳权重跟踪 - 替代每次提升都 copy.deepcopy(model.state_dict())
+    
+    初始化时为 state_dict 中每个张量预分配一份影子缓冲区，之后只做原地 copy_，
+    训练过程中不再产生新的张量分配。对 StackedEnsemble 可通过 index
+    只保存某个成员在第 0 维上的切片。
+    
+    ema_decay 不为空时另外维护一份权重的指数滑动平均 (每次 optimizer.step 后
+    调用 update_ema)；apply_ema / restore 用预分配的备份缓冲区在 EMA 权重与
+    当前权重之间原地切换，用于在 EMA 权重上验证并保存最佳状态。
+    """
+    def __init__(self, module, ema_decay=None):
+        # state_dict 返回与参数共享存储的张量，缓存后可反复原地读写
+        self._live = module.state_dict()
+        self.best = {k: v.clone() for k, v in self._live.items()}
+        self.has_best = False
+        self.ema_decay = ema_decay
+        self.ema = {k: v.clone() for k, v in self._live.items()} if ema_decay else None
+        self._backup = {k: torch.empty_like(v) for k, v in self._live.items()} if ema_decay else None
+    
+    @torch.no_grad()
+    def update_ema(self):
+        if self.ema is None:
+            return
+        for k, v in self._live.items():
+            if v.is_floating_point():
+                self.ema[k].mul_(self.ema_decay).add_(v, alpha=1 - self.ema_decay)
+            else:
+                self.ema[k].copy_(v)
+    
+    @torch.no_grad()
+    def apply_ema(self):
+        if self.ema is None:
+            return
+        for k, v in self._live.items():
+            self._backup[k].copy_(v)
+            v.copy_(self.ema[k])
+    
+    @torch.no_grad()
+    def restore(self):
+        if self.ema is None:
+            return
+        for k, v in self._live.items():
+            v.copy_(self._backup[k])
+    
+    @torch.no_grad()
+    def save(self, index=None):
+        """保存当前权重为最佳；index 不为空时只保存第 0 维上的该切片"""
+        for k, v in self._live.items():
+            if index is None:
+                self.best[k].copy_(v)
+            else:
+                self.best[k][index].copy_(v[index])
+        self.has_best = True
+    
+    @torch.no_grad()
+    def load_best(self, module):
+        if self.has_best:
+            module.load_state_dict(self.best)
+    
+    def state_dict(self):
+        return {'best': self.best, 'has_best': self.has_best, 'ema': self.ema}
+    
+    @torch.no_grad()
+    def load_state_dict(self, state):
+        """原地恢复，保持预分配缓冲区不变"""
+        for k, v in state['best'].items():
+            self.best[k].copy_(v)
+        self.has_best = state['has_best']
+        if self.ema is not None and state['ema'] is not None:
+            for k, v in state['ema'].items():
+                self.ema[k].copy_(v)
+
+class EarlyStopping:
+    """
+    基于验证 R2 (越大越好) 的早停
+    连续 patience 个 epoch 未超过历史最佳 + min_delta 时停止；patience <= 0 表示不启用。
+    """
+    def __init__(self, patience=0, min_delta=0.0):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best = -float('inf')
+        self.bad_epochs = 0
+    
+    def step(self, score, epochs=1):
+        """记录本次验证得分 (距上次验证经过 epochs 个 epoch)，返回是否应当停止"""
+        if score > self.best + self.min_delta:
+            self.best = score
+            self.bad_epochs = 0
+        else:
+            self.bad_epochs += epochs
+        return self.patience > 0 and self.bad_epochs >= self.patience
+    
+    def state_dict(self):
+        return {'best': self.best, 'bad_epochs': self.bad_epochs}
+    
+    def load_state_dict(self, state):
+        self.best = state['best']
+        self.bad_epochs = state['bad_epochs']
+
+def make_lr_scheduler(optimizer, config, epochs):
+    """lr_scheduler: none / plateau (按验证 R2 的 ReduceLROnPlateau) / cosine"""
+    name = config.get('lr_scheduler', 'none')
+    if name == 'plateau':
+        return torch.optim.lr_scheduler.ReduceLROnPlateau(
+            optimizer,
+            mode='max',
+            factor=config.get('lr_factor', 0.5),
+            patience=config.get('lr_patience', 10),
+            threshold=config.get('min_delta', 0.0),
+            threshold_mode='abs'
+        )
+    if name == 'cosine':
+        return torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=epochs)
+    return None
+
+def _step_lr_scheduler(scheduler, score):
+    """plateau 调度只在有验证得分的 epoch 更新，其余调度每个 epoch 更新"""
+    if isinstance(scheduler, torch.optim.lr_scheduler.ReduceLROnPlateau):
+        if score is not None:
+            scheduler.step(score)
+    elif scheduler is not None:
+        scheduler.step()
+
+def _should_validate(epoch, epochs, validate_every):
+    return epoch % validate_every == 0 or epoch == epochs - 1
+
+def _training_state(next_epoch, module, optimizer, scheduler, tracker, early_stoppings, loop, augmenter):
+    """训练中断点: 恢复后从 next_epoch 开始的结果与不中断时一致"""
+    return {
+        'done': False,
+        'next_epoch': next_epoch,
+        'model': module.state_dict(),
+        'optimizer': optimizer.state_dict(),
+        'scheduler': scheduler.state_dict() if scheduler is not None else None,
+        'tracker': tracker.state_dict(),
+        'early_stopping': [es.state_dict() for es in early_stoppings],
+        'loop': loop,
+        'rng': capture_rng_state(augmenter)
+    }
+
+def _restore_training_state(state, module, optimizer, scheduler, tracker, early_stoppings, augmenter):
+    """恢复训练中断点，返回 (next_epoch, 循环变量)"""
+    module.load_state_dict(state['model'])
+    optimizer.load_state_dict(state['optimizer'])
+    if scheduler is not None and state['scheduler'] is not None:
+        scheduler.load_state_dict(state['scheduler'])
+    tracker.load_state_dict(state['tracker'])
+    for es, es_state in zip(early_stoppings, state['early_stopping']):
+        es.load_state_dict(es_state)
+    restore_rng_state(state['rng'], augmenter)
+    return state['next_epoch'], state['loop']
+
+class ForwardRunner:
+    """
+    训练/验证阶段的前向执行方式 (由 config 的 compile_model / precision 控制)
+    - compile_model: 用 torch.compile 包装前向，编译发生在首次调用 (及 train/eval 切换) 时；
+      编译或运行失败时记录原因并回退 eager 重新执行，不中断训练
+    - precision='bf16': 前向在 bf16 autocast 下运行，输出转回 float32 后再计算损失与指标
+    参数仍属于原模块，优化器、BestStateTracker 与 state_dict 不受影响。
+    """
+    def __init__(self, module, compile_model=False, precision='fp32'):
+        self.module = module
+        self.precision = precision
+        self.autocast = precision == 'bf16'
+        self.compile_requested = compile_model
+        self.compiled = None
+        self.compile_error = None
+        self.first_call_s = None
+        if compile_model:
+            try:
+                self.compiled = torch.compile(module)
+            except Exception as e:
+                self._fallback(e)
+    
+    @classmethod
+    def from_config(cls, module, config):
+        return cls(module, config.get('compile_model', False), config.get('precision', 'fp32'))
+    
+    @property
+    def accelerated(self):
+        return self.compile_requested or self.autocast
+    
+    def _fallback(self, e):
+        self.compiled = None
+        self.compile_error = f"{type(e).__name__}: {e}"
+        print(f"    torch.compile 失败，回退 eager: {self.compile_error}")
+    
+    def __call__(self, x):
+        start = time.perf_counter() if self.first_call_s is None else None
+        with torch.autocast(x.device.type, dtype=torch.bfloat16, enabled=self.autocast):
+            out = None
+            if self.compiled is not None:
+                try:
+                    out = self.compiled(x)
+                except Exception as e:
+                    self._fallback(e)
+            if out is None:
+                out = self.module(x)
+        if start is not None:
+            self.first_call_s = time.perf_counter() - start
+        return out.float()
+    
+    def stats(self):
+        return {
+            'compiled': self.compiled is not None,
+            'precision': self.precision,
+            'first_call_s': self.first_call_s,
+            'compile_error': self.compile_error
+        }
+
+def _predict(forward, loader, device):
+    """返回展平后的 (预测, 真实值)；StackedEnsemble 的预测为 [M, N * pred_len]"""
+    preds, trues = [], []
+    with torch.no_grad():
+        for batch_x, batch_y in loader:
+            batch_x, batch_y = batch_x.to(device), batch_y.to(device)
+            out = forward(batch_x)
+            preds.append(out.reshape(out.shape[0], -1) if out.dim() == 3 else out.reshape(-1))
+            trues.append(batch_y.reshape(-1))
+    return torch.cat(preds, dim=-1), torch.cat(trues)
+
+def _acceleration_report(runner, module, val_loader, evaluator, device, step_ms):
+    """
+    加速模式的效果记录: 编译情况、首次调用耗时 (含编译)、稳态单步耗时，
+    以及最佳权重下加速前向与 eager float32 前向的验证 R2 差异
+    """
+    module.eval()
+    fast_r2 = evaluator(*_predict(runner, val_loader, device))['r2']
+    eager_r2 = evaluator(*_predict(module, val_loader, device))['r2']
+    return {
+        **runner.stats(),
+        'step_ms': step_ms,
+        'val_r2': fast_r2.tolist(),
+        'eager_fp32_val_r2': eager_r2.tolist(),
+        'val_r2_delta': (fast_r2 - eager_r2).tolist()
+    }
+
+class StepTimer:
+    """统计稳态单步训练耗时: 跳过第一个训练的 epoch (含 torch.compile 编译与预热)"""
+    def __init__(self):
+        self.total = 0.0
+        self.steps = 0
+        self.warmup = None
+    
+    def add_epoch(self, seconds, steps):
+        if self.warmup is None:
+            self.warmup = (seconds, steps)
+        else:
+            self.total += seconds
+            self.steps += steps
+    
+    @property
+    def step_ms(self):
+        total, steps = (self.total, self.steps) if self.steps else (self.warmup or (0.0, 0))
+        return total / steps * 1000 if steps else None
+
+def train_single_model(model, i, n_models, train_loader, val_loader, scaler, target_idx,
+                       config, device, task_id, update_progress_callback=None, augmenter=None,
+                       checkpoint=None, heartbeat=None):
+    """
+    训练单个集成成员
+    返回 (加载了最佳验证 R2 权重的模型, 训练摘要 {best_val_r2, stopped_epoch, early_stopped})
+    checkpoint 不为空时每 checkpoint.every 个 epoch 保存一次断点，并在开始时从已有断点继续
+    heartbeat 不为空时每个 epoch 调用 heartbeat(i, epoch)，用于任务存活检测
+    """
+    epochs = config.get('epochs', 100)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=config.get('lr', 0.001), weight_decay=0.01)
+    scheduler = make_lr_scheduler(optimizer, config, epochs)
+    early_stopping = EarlyStopping(config.get('patience', 0), config.get('min_delta', 0.0))
+    criterion = nn.MSELoss()
+    
+    evaluator = ValidationEvaluator(scaler, target_idx)
+    validate_every = max(1, config.get('validate_every', 1))
+    
+    tracker = BestStateTracker(model, ema_decay=config.get('ema_decay'))
+    forward = ForwardRunner.from_config(model, config)
+    timer = StepTimer()
+    best_val_r2 = -float('inf')
+    stopped_epoch = epochs
+    last_val_epoch = -1
+    last_report_epoch = None
+    start_epoch = 0
+    
+    resumed = checkpoint.load() if checkpoint is not None else None
+    if resumed is not None and resumed['done']:
+        model.load_state_dict(resumed['model'])
+        restore_rng_state(resumed['rng'], augmenter)
+        print(f"    [模型 {i+1}] 从断点恢复: 已训练完成")
+        return model, resumed['summary']
+    if resumed is not None:
+        start_epoch, loop = _restore_training_state(
+            resumed, model, optimizer, scheduler, tracker, [early_stopping], augmenter
+        )
+        best_val_r2, last_val_epoch, last_report_epoch = loop
+        print(f"    [模型 {i+1}] 从断点恢复: epoch {start_epoch}")
+    
+    for epoch in range(start_epoch, epochs):
+        if checkpoint is not None and epoch > start_epoch and checkpoint.due(epoch):
+            checkpoint.save(_training_state(
+                epoch, model, optimizer, scheduler, tracker, [early_stopping],
+                (best_val_r2, last_val_epoch, last_report_epoch), augmenter
+            ))
+        model.train()
+        train_loss = 0
+        epoch_start = time.perf_counter()
+        for batch_x, batch_y in train_loader:
+            batch_x, batch_y = batch_x.to(device), batch_y.to(device)
+            if augmenter is not None:
+                batch_x, batch_y = augmenter(batch_x, batch_y)
+            optimizer.zero_grad()
+            preds = forward(batch_x)
+            loss = criterion(preds.squeeze(), batch_y.squeeze())
+            loss.backward()
+            optimizer.step()
+            tracker.update_ema()
+            train_loss += loss.item()
+        timer.add_epoch(time.perf_counter() - epoch_start, len(train_loader))
+        if heartbeat is not None:
+            heartbeat(i, epoch)
         
-        top_k = config.get('top_k', 12)
-        df_selected = select_top_features(df, target_col, top_k=top_k)
+        if not _should_validate(epoch, epochs, validate_every):
+            _step_lr_scheduler(scheduler, None)
+            continue
         
-        target_idx = df_selected.columns.tolist().index(target_col)
-        data = df_selected.values
-        input_dim = df_selected.shape[1]
+        # Validation (启用 EMA 时在 EMA 权重上验证)
+        model.eval()
+        tracker.apply_ema()
+        val_preds, val_trues = [], []
+        val_loss = torch.zeros((), device=device)
+        with torch.no_grad():
+            for batch_x, batch_y in val_loader:
+                batch_x, batch_y = batch_x.to(device), batch_y.to(device)
+                preds = forward(batch_x)
+                val_loss += criterion(preds.squeeze(), batch_y.squeeze())
+                val_preds.append(preds.reshape(-1))
+                val_trues.append(batch_y.reshape(-1))
         
-        seq_len = config.get('seq_len', 12)
-        test_size = 0.15
-        val_ratio = 0.15
+        # Calculate validation metrics on original scale (只逆变换目标列)
+        val_metrics = {
+            k: v.item() for k, v in evaluator(torch.cat(val_preds), torch.cat(val_trues)).items()
+        }
+        val_r2 = val_metrics['r2']
+        avg_val_loss = val_loss.item() / len(val_loader)
         
-        total_len = len(data)
-        test_size_idx = int(total_len * (1 - test_size))
+        if val_r2 > best_val_r2:
+            best_val_r2 = val_r2
+            tracker.save()
+        tracker.restore()
         
-        train_data_raw = data[:test_size_idx]
-        test_data_raw = data[test_size_idx - seq_len + 1:]
+        # Update progress with all metrics
+        if update_progress_callback and i == 0 and (last_report_epoch is None or epoch - last_report_epoch >= 5):
+            last_report_epoch = epoch
+            overall_progress = ((i * epochs) + epoch) / (n_models * epochs) * 100
+            metrics = {
+                'val_r2': val_r2,
+                'val_mae': val_metrics['mae'],
+                'val_rmse': val_metrics['rmse'],
+                'val_mape': val_metrics['mape'],
+                'val_loss': avg_val_loss
+            }
+            update_progress_callback(
+                task_id, 
+                overall_progress, 
+                epoch, 
+                train_loss / len(train_loader), 
+                val_r2,
+                metrics
+            )
         
-        train_size = int(len(train_data_raw) * (1 - val_ratio))
-        train_subset_data = train_data_raw[:train_size]
-        val_subset_data = train_data_raw[train_size:]
+        _step_lr_scheduler(scheduler, val_r2)
+        stop = early_stopping.step(val_r2, epochs=epoch - last_val_epoch)
+        last_val_epoch = epoch
+        if stop:
+            stopped_epoch = epoch + 1
+            print(f"    [模型 {i+1}] 早停于 epoch {stopped_epoch}，最佳验证 R2: {best_val_r2:.4f}")
+            break
+    
+    tracker.load_best(model)
+    summary = {
+        'best_val_r2': best_val_r2,
+        'stopped_epoch': stopped_epoch,
+        'early_stopped': stopped_epoch < epochs,
+        'step_ms': timer.step_ms
+    }
+    if forward.accelerated:
+        summary['acceleration'] = _acceleration_report(forward, model, val_loader, evaluator, device, timer.step_ms)
+    if checkpoint is not None:
+        checkpoint.save({
+            'done': True, 'model': model.state_dict(), 'summary': summary, 'rng': capture_rng_state(augmenter)
+        })
+    return model, summary
+
+def train_vectorized_ensemble(models, train_loader, val_loader, scaler, target_idx,
+                              config, device, task_id, update_progress_callback=None, augmenter=None,
+                              checkpoint=None, heartbeat=None):
+    """
+    向量化集成训练: 所有成员堆叠为 StackedEnsemble，每个 batch 一次前向/反向。
+    各成员共享同一批次数据，成员间的差异来自初始化和独立的 dropout。
+    每个成员独立跟踪最佳验证 R2 与早停；成员触发早停后其损失不再参与反向传播，
+    参数在每次 optimizer.step 后恢复为早停时的值 (AdamW 的动量与权重衰减不会使其漂移)，
+    也不再更新其最佳权重；全部成员都触发后结束训练。学习率调度按成员平均验证 R2 进行。
+    返回 (加载了各自最佳权重的模型列表, 各成员训练摘要)。
+    checkpoint 与 train_single_model 相同，断点保存整个堆叠集成的状态；
+    所有成员在同一次前向/反向中训练，heartbeat 每个 epoch 调用一次 heartbeat(None, epoch)。
+    """
+    n_models = len(models)
+    epochs = config.get('epochs', 100)
+    ensemble = StackedEnsemble(models).to(device)
+    optimizer = torch.optim.AdamW(ensemble.parameters(), lr=config.get('lr', 0.001), weight_decay=0.01)
+    scheduler = make_lr_scheduler(optimizer, config, epochs)
+    early_stoppings = [
+        EarlyStopping(config.get('patience', 0), config.get('min_delta', 0.0)) for _ in range(n_models)
+    ]
+    
+    evaluator = ValidationEvaluator(scaler, target_idx)
+    validate_every = max(1, config.get('validate_every', 1))
+    
+    tracker = BestStateTracker(ensemble, ema_decay=config.get('ema_decay'))
+    forward = ForwardRunner.from_config(ensemble, config)
+    timer = StepTimer()
+    best_val_r2 = [-float('inf')] * n_models
+    stopped_epochs = [None] * n_models
+    last_val_epoch = -1
+    last_report_epoch = None
+    start_epoch = 0
+    
+    resumed = checkpoint.load() if checkpoint is not None else None
+    if resumed is not None and resumed['done']:
+        ensemble.load_state_dict(resumed['model'])
+        for m, model in enumerate(models):
+            model.load_state_dict(ensemble.member_state_dict(m))
+        restore_rng_state(resumed['rng'], augmenter)
+        print("    从断点恢复: 集成已训练完成")
+        return models, resumed['summary']
+    if resumed is not None:
+        start_epoch, loop = _restore_training_state(
+            resumed, ensemble, optimizer, scheduler, tracker, early_stoppings, augmenter
+        )
+        best_val_r2, stopped_epochs, last_val_epoch, last_report_epoch = loop
+        print(f"    从断点恢复: epoch {start_epoch}")
+    
+    def freeze_stopped():
+        """已早停成员: 损失权重置零，并记录其当前参数供每步之后恢复"""
+        stopped = [m for m, e in enumerate(stopped_epochs) if e is not None]
+        active = torch.ones(n_models, device=device)
+        if not stopped:
+            return active, None, None
+        index = torch.tensor(stopped, device=device)
+        active[index] = 0
+        return active, index, [p.detach().index_select(0, index).clone() for p in ensemble.stacked_params]
+    
+    active, frozen_index, frozen_params = freeze_stopped()
+    for epoch in range(start_epoch, epochs):
+        if checkpoint is not None and epoch > start_epoch and checkpoint.due(epoch):
+            checkpoint.save(_training_state(
+                epoch, ensemble, optimizer, scheduler, tracker, early_stoppings,
+                (best_val_r2, stopped_epochs, last_val_epoch, last_report_epoch), augmenter
+            ))
+        ensemble.train()
+        train_loss = 0
+        epoch_start = time.perf_counter()
+        for batch_x, batch_y in train_loader:
+            batch_x, batch_y = batch_x.to(device), batch_y.to(device)
+            if augmenter is not None:
+                batch_x, batch_y = augmenter(batch_x, batch_y)
+            optimizer.zero_grad()
+            preds = forward(batch_x)  # [M, B, 1]
+            # 每个成员各自的 MSE，求和后各成员得到与单独训练相同的梯度
+            member_losses = ((preds.reshape(n_models, -1) - batch_y.reshape(1, -1)) ** 2).mean(dim=1)
+            (member_losses * active).sum().backward()
+            optimizer.step()
+            if frozen_index is not None:
+                with torch.no_grad():
+                    for p, frozen in zip(ensemble.stacked_params, frozen_params):
+                        p.index_copy_(0, frozen_index, frozen)
+            tracker.update_ema()
+            train_loss += member_losses[0].item()
+        timer.add_epoch(time.perf_counter() - epoch_start, len(train_loader))
+        if heartbeat is not None:
+            heartbeat(None, epoch)
         
-        scaler = RobustScaler()
-        scaler.fit(train_subset_data)
+        if not _should_validate(epoch, epochs, validate_every):
+            _step_lr_scheduler(scheduler, None)
+            continue
         
-        train_scaled = scaler.transform(train_subset_data)
-        val_scaled = scaler.transform(val_subset_data)
-        test_scaled = scaler.transform(test_data_raw)
+        # Validation (启用 EMA 时在 EMA 权重上验证)
+        ensemble.eval()
+        tracker.apply_ema()
+        val_preds, val_trues = [], []
+        val_losses = torch.zeros(n_models, device=device)
+        with torch.no_grad():
+            for batch_x, batch_y in val_loader:
+                batch_x, batch_y = batch_x.to(device), batch_y.to(device)
+                preds = forward(batch_x).reshape(n_models, -1)
+                val_losses += ((preds - batch_y.reshape(1, -1)) ** 2).mean(dim=1)
+                val_preds.append(preds)
+                val_trues.append(batch_y.reshape(-1))
+        
+        # 所有成员的指标一次算出: 每个指标为 [n_models]
+        stacked_metrics = evaluator(torch.cat(val_preds, dim=1), torch.cat(val_trues))
+        stacked_metrics = {k: v.tolist() for k, v in stacked_metrics.items()}
+        member_metrics = [{k: v[m] for k, v in stacked_metrics.items()} for m in range(n_models)]
         
-        train_dataset = AugmentedDataset(train_scaled, target_idx, seq_len=seq_len, augment=True)
-        val_dataset = AugmentedDataset(val_scaled, target_idx, seq_len=seq_len, augment=False)
-        test_dataset = AugmentedDataset(test_scaled, target_idx, seq_len=seq_len, augment=False)
+        newly_stopped = False
+        for m in range(n_models):
+            if stopped_epochs[m] is not None:
+                continue
+            if member_metrics[m]['r2'] > best_val_r2[m]:
+                best_val_r2[m] = member_metrics[m]['r2']
+                tracker.save(index=m)
+            if early_stoppings[m].step(member_metrics[m]['r2'], epochs=epoch - last_val_epoch):
+                stopped_epochs[m] = epoch + 1
+                newly_stopped = True
+        tracker.restore()
+        last_val_epoch = epoch
+        if newly_stopped:
+            active, frozen_index, frozen_params = freeze_stopped()
         
-        train_loader = DataLoader(train_dataset, batch_size=config.get('batch_size', 32), shuffle=True)
-        val_loader = DataLoader(val_dataset, batch_size=config.get('batch_size', 32), shuffle=False)
-        test_loader = DataLoader(test_dataset, batch_size=config.get('batch_size', 32), shuffle=False)
+        # Update progress with all metrics (与顺序模式一致，报告第一个成员)
+        if update_progress_callback and (last_report_epoch is None or epoch - last_report_epoch >= 5):
+            last_report_epoch = epoch
+            overall_progress = epoch / epochs * 100
+            metrics = {
+                'val_r2': member_metrics[0]['r2'],
+                'val_mae': member_metrics[0]['mae'],
+                'val_rmse': member_metrics[0]['rmse'],
+                'val_mape': member_metrics[0]['mape'],
+                'val_loss': val_losses[0].item() / len(val_loader)
+            }
+            update_progress_callback(
+                task_id,
+                overall_progress,
+                epoch,
+                train_loss / len(train_loader),
+                member_metrics[0]['r2'],
+                metrics
+            )
+        
+        _step_lr_scheduler(scheduler, float(np.mean([mm['r2'] for mm in member_metrics])))
+        if all(stopped is not None for stopped in stopped_epochs):
+            print(f"    所有成员均已早停于 epoch {epoch + 1}")
+            break
+    
+    tracker.load_best(ensemble)
+    acceleration = None
+    if forward.accelerated:
+        acceleration = _acceleration_report(forward, ensemble, val_loader, evaluator, device, timer.step_ms)
+    summaries = []
+    for m, (model, r2, stopped) in enumerate(zip(models, best_val_r2, stopped_epochs)):
+        model.load_state_dict(ensemble.member_state_dict(m))
+        summary = {
+            'best_val_r2': r2,
+            'stopped_epoch': stopped or epochs,
+            'early_stopped': stopped is not None and stopped < epochs,
+            'step_ms': timer.step_ms
+        }
+        if acceleration is not None:
+            summary['acceleration'] = {
+                **acceleration,
+                **{k: acceleration[k][m] for k in ('val_r2', 'eager_fp32_val_r2', 'val_r2_delta')}
+            }
+        summaries.append(summary)
+    if checkpoint is not None:
+        checkpoint.save({
+            'done': True, 'model': ensemble.state_dict(), 'summary': summaries, 'rng': capture_rng_state(augmenter)
+        })
+    return models, summaries
+
+def _forward_events(events, task_id, update_progress_callback=None, heartbeat=None):
+    """
+    转发进程池 worker 放入事件队列的消息:
+    ('progress', 进度参数) -> update_progress_callback，('heartbeat', (成员, epoch)) -> heartbeat
+    """
+    while events is not None and not events.empty():
+        kind, payload = events.get()
+        if kind == 'progress':
+            if update_progress_callback is not None:
+                update_progress_callback(task_id, *payload)
+        elif heartbeat is not None:
+            heartbeat(*payload)
+
+class _QueueHeartbeat:
+    """进程池 worker 内的心跳: 放入父进程的事件队列，由 _forward_events 转发 (可被 pickle)"""
+    def __init__(self, events):
+        self.events = events
+    
+    def __call__(self, member, epoch):
+        self.events.put(('heartbeat', (member, epoch)))
+
+def _train_member_worker(i, model_type, input_dim, seq_len, prepared, config, num_threads,
+                         events=None, checkpoint=None):
+    """
+    进程池中训练单个集成成员，返回 (最佳 state_dict (CPU 张量), 训练摘要)
+    prepared 含 scaler、target_idx，以及预处理缓存条目目录 cache_path (在本进程内存映射
+    train / val) 或缩放后的 train / val 数组 (缓存不可用时)；批迭代器在本进程内构建
+    """
+    torch.set_num_threads(num_threads)
+    set_seed(42 + i)
+    device = torch.device('cpu')
+    if prepared.get('cache_path'):
+        prepared = {
+            **prepared,
+            'train': np.load(os.path.join(prepared['cache_path'], 'train.npy'), mmap_mode='r'),
+            'val': np.load(os.path.join(prepared['cache_path'], 'val.npy'), mmap_mode='r')
+        }
+    train_loader, val_loader, _, _ = make_data_loaders(prepared, config)
+    model = build_model(model_type, input_dim, seq_len, config)
+    
+    callback = None
+    if events is not None and i == 0:
+        def callback(tid, *args):
+            events.put(('progress', args))
+    augmenter = BatchAugmenter(seed=42 + i) if config.get('augment_mode', 'batch') == 'batch' else None
+    
+    # 成员并发训练，进度按单个成员的 epoch 计算 (n_models=1)
+    model, summary = train_single_model(
+        model, i, 1, train_loader, val_loader, prepared['scaler'], prepared['target_idx'],
+        config, device, task_id=None, update_progress_callback=callback, augmenter=augmenter,
+        checkpoint=checkpoint, heartbeat=_QueueHeartbeat(events) if events is not None else None
+    )
+    return {k: v.detach().cpu() for k, v in model.state_dict().items()}, summary
+
+def train_process_ensemble(model_type, input_dim, seq_len, n_models, prepared, config, task_id,
+                           update_progress_callback=None, max_workers=None, checkpoints=None, heartbeat=None):
+    """
+    进程并行集成训练: 各成员在 spawn 进程池中并发训练 (成员 i 使用种子 42 + i)，
+    CPU 线程预算 torch.get_num_threads() 在 worker 间平分。
+    prepared 为 prepare_dataset 的结果；有预处理缓存条目时只把其目录传给 worker，
+    各 worker 自行内存映射 train / val (多个进程共享页缓存，不经过 pickle)；
+    缓存不可用时才把缩放后的数组传给 worker。各 worker 自行构建批迭代器。
+    第一个成员的进度与所有成员每个 epoch 的心跳通过队列转发给 update_progress_callback / heartbeat。
+    checkpoints 为各成员的 TrainingCheckpoint 列表 (可为空)。
+    返回各成员的 (最佳 state_dict, 训练摘要) 列表。
+    """
+    # 按当前进程可用的核计算 (调度器可能已将任务绑定到部分核)
+    available = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    workers = max(1, min(n_models, max_workers or available))
+    num_threads = max(1, torch.get_num_threads() // workers)
+    print(f"  进程并行训练: {workers} 个进程 × {num_threads} 线程")
+    
+    member_data = {'scaler': prepared['scaler'], 'target_idx': prepared['target_idx']}
+    if prepared.get('cache_path'):
+        member_data['cache_path'] = prepared['cache_path']
+    else:
+        member_data['train'] = np.asarray(prepared['train'])
+        member_data['val'] = np.asarray(prepared['val'])
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Manager() as manager:
+        events = manager.Queue() if update_progress_callback or heartbeat else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = [
+                pool.submit(
+                    _train_member_worker, i, model_type, input_dim, seq_len, member_data, config,
+                    num_threads, events, checkpoints[i] if checkpoints else None
+                )
+                for i in range(n_models)
+            ]
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                _forward_events(events, task_id, update_progress_callback, heartbeat)
+            results = [future.result() for future in futures]
+        _forward_events(events, task_id, update_progress_callback, heartbeat)
+    return results
+
+def predict_members(models, loader, device):
+    """各成员在 loader 上的预测，返回 [n_models, N * pred_len]"""
+    all_preds = []
+    for model in models:
+        model.eval()
+        model_preds = []
+        with torch.no_grad():
+            for batch_x, _ in loader:
+                preds = model(batch_x.to(device))
+                model_preds.append(preds.cpu().numpy().reshape(-1))
+        all_preds.append(np.concatenate(model_preds))
+    return np.stack(all_preds)
+
+MIN_EVAL_WINDOWS = 2
+
+def _n_windows(length, seq_len, pred_len):
+    """与 AugmentedDataset 相同的窗口数计算"""
+    return max(length - seq_len - pred_len + 2, 0)
+
+def walk_forward_splits(total_len, n_folds, seq_len, pred_len=1):
+    """
+    滚动原点 (walk-forward) 划分: 末尾 n_folds 个等长时间块依次作为测试集，
+    第 f 折在其测试块之前的全部数据上训练 (扩展窗口)。
+    每折的训练集至少 1 个窗口，验证集 (train_end 的末尾 VAL_RATIO) 与测试块至少
+    MIN_EVAL_WINDOWS 个窗口 (只有 1 个窗口时 R2 恒为 0)，否则抛出 ValueError。
+    返回 [(train_end, test_end), ...]，与 split_and_scale 的参数一致。
+    """
+    if n_folds < 2:
+        raise ValueError(f"walk-forward 至少需要 2 折 (当前 {n_folds})")
+    block = total_len // (n_folds + 1)
+    first_train_end = total_len - n_folds * block
+    splits = [
+        (first_train_end + f * block, total_len if f == n_folds - 1 else first_train_end + (f + 1) * block)
+        for f in range(n_folds)
+    ]
+    for f, (train_end, test_end) in enumerate(splits):
+        train_size = int(train_end * (1 - VAL_RATIO))
+        windows = {
+            'train': _n_windows(train_size, seq_len, pred_len),
+            'val': _n_windows(train_end - train_size, seq_len, pred_len),
+            'test': _n_windows(test_end - train_end + seq_len - 1, seq_len, pred_len)
+        }
+        if windows['train'] < 1 or windows['val'] < MIN_EVAL_WINDOWS or windows['test'] < MIN_EVAL_WINDOWS:
+            raise ValueError(
+                f"数据长度 {total_len} 不足以划分 {n_folds} 折: 第 {f + 1} 折的训练/验证/测试窗口数为 "
+                f"{windows['train']}/{windows['val']}/{windows['test']} "
+                f"(seq_len={seq_len}, pred_len={pred_len}，验证与测试至少需要 {MIN_EVAL_WINDOWS} 个)"
+            )
+    return splits
+
+def fit_walk_forward_splits(total_len, n_folds, seq_len, pred_len=1):
+    """从 n_folds 起逐步减少折数，返回第一个每折窗口数都足够的划分；降到 2 折仍不足时抛出 ValueError"""
+    for folds in range(n_folds, 1, -1):
+        try:
+            return walk_forward_splits(total_len, folds, seq_len, pred_len)
+        except ValueError as e:
+            error = e
+    raise error if n_folds >= 2 else ValueError(f"walk-forward 至少需要 2 折 (当前 {n_folds})")
+
+def _train_fold_worker(fold, file_path, target_col, config, train_end, test_end, num_threads, heartbeat=None):
+    """
+    训练并评估一折: 截断分位数、特征选择与 scaler 都只在该折的 data[:train_end] 上拟合，
+    预处理结果按 train_end 存入 prepare_raw_dataset 的内存映射缓存。返回该折的指标与样本数。
+    """
+    torch.set_num_threads(num_threads)
+    set_seed(42)
+    device = torch.device('cpu')
+    raw = prepare_raw_dataset(file_path, target_col, config, fit_end=train_end)
+    target_idx = raw['target_idx']
+    seq_len = config.get('seq_len', 12)
+    prepared = {
+        **split_and_scale(raw['data'], seq_len, train_end, test_end),
+        'columns': raw['columns'],
+        'target_idx': target_idx
+    }
+    train_loader, val_loader, test_loader, augmenter = make_data_loaders(prepared, config)
+    
+    n_models = config.get('n_models', 3)
+    models, summaries = [], []
+    for i in range(n_models):
+        model = build_model(config.get('model_type', 'mamformer'), len(raw['columns']), seq_len, config)
+        model, summary = train_single_model(
+            model, i, n_models, train_loader, val_loader, prepared['scaler'], target_idx,
+            config, device, task_id=None, augmenter=augmenter, heartbeat=heartbeat
+        )
+        models.append(model)
+        summaries.append(summary)
+    
+    ensemble_preds = predict_members(models, test_loader, device).mean(axis=0)
+    trues = np.concatenate([batch_y.numpy().reshape(-1) for _, batch_y in test_loader])
+    metrics = regression_metrics(
+        inverse_transform_target(prepared['scaler'], trues, target_idx),
+        inverse_transform_target(prepared['scaler'], ensemble_preds, target_idx)
+    )
+    return {
+        'fold': fold,
+        'train_end': train_end,
+        'test_end': test_end,
+        'n_test': len(trues) // config.get('pred_len', 1),
+        **{k: float(v) for k, v in metrics.items()},
+        'members': summaries
+    }
+
+def run_walk_forward_cv(file_path, target_col, config, max_workers=None, heartbeat=None):
+    """
+    walk-forward 交叉验证: 各折在 spawn 进程池中并发训练，CPU 线程预算在进程间平分；
+    进程池不可用时 (如 Celery daemon worker) 顺序训练。各折每个 epoch 的心跳转发给 heartbeat。
+    各折的全部预处理只在自身训练区间上拟合，指标不含测试块信息泄漏。
+    数据过短时从 cv_folds 起减少折数，直到每折都有足够的训练/验证/测试窗口。
+    返回 {'n_folds', 'requested_folds', 'folds': 各折指标, 'aggregate': 各指标的均值与标准差}
+    """
+    total_len = len(pd.read_csv(file_path, usecols=[target_col]))
+    requested_folds = config.get('cv_folds', 5)
+    splits = fit_walk_forward_splits(total_len, requested_folds, config.get('seq_len', 12), config.get('pred_len', 1))
+    n_folds = len(splits)
+    if n_folds < requested_folds:
+        print(f"数据长度 {total_len} 不足以划分 {requested_folds} 折，减少为 {n_folds} 折")
+    
+    available = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    workers = max(1, min(n_folds, max_workers or available))
+    num_threads = max(1, torch.get_num_threads() // workers)
+    print(f"walk-forward 交叉验证: {n_folds} 折, {workers} 个进程 × {num_threads} 线程")
+    
+    args = [(f, file_path, target_col, config, train_end, test_end, num_threads)
+            for f, (train_end, test_end) in enumerate(splits)]
+    try:
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Manager() as manager:
+            events = manager.Queue() if heartbeat else None
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                fold_heartbeat = _QueueHeartbeat(events) if events is not None else None
+                futures = [pool.submit(_train_fold_worker, *fold_args, fold_heartbeat) for fold_args in args]
+                pending = set(futures)
+                while pending:
+                    _, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                    _forward_events(events, None, heartbeat=heartbeat)
+                folds = [future.result() for future in futures]
+            _forward_events(events, None, heartbeat=heartbeat)
+    except (AssertionError, OSError, BrokenProcessPool) as e:
+        print(f"进程池不可用，顺序训练各折: {e}")
+        threads = torch.get_num_threads()
+        folds = [_train_fold_worker(*fold_args[:-1], threads, heartbeat) for fold_args in args]
+        torch.set_num_threads(threads)
+    
+    for fold in folds:
+        print(f"  第 {fold['fold'] + 1} 折: R2={fold['r2']:.4f}, RMSE={fold['rmse']:.4f}")
+    aggregate = {}
+    for key in ('r2', 'mae', 'rmse', 'mape'):
+        values = np.array([fold[key] for fold in folds])
+        aggregate[f'{key}_mean'] = float(values.mean())
+        aggregate[f'{key}_std'] = float(values.std())
+    return {'n_folds': n_folds, 'requested_folds': requested_folds, 'folds': folds, 'aggregate': aggregate}
+
+def evaluate_config(file_path, target_col, config, device=None, heartbeat=None):
+    """
+    超参搜索用: 按 config 训练单个模型 (固定种子)，返回训练摘要 (含最佳验证 R2)。
+    只使用 train / val 划分，不接触测试集；预处理结果经 prepare_dataset 缓存在各次试验间共享。
+    """
+    device = device or torch.device('cpu')
+    set_seed(42)
+    prepared = prepare_dataset(file_path, target_col, config)
+    train_loader, val_loader, _, augmenter = make_data_loaders(prepared, config)
+    model = build_model(
+        config.get('model_type', 'mamformer'), len(prepared['columns']), config.get('seq_len', 12), config
+    ).to(device)
+    _, summary = train_single_model(
+        model, 0, 1, train_loader, val_loader, prepared['scaler'], prepared['target_idx'],
+        config, device, task_id=None, augmenter=augmenter, heartbeat=heartbeat
+    )
+    return summary
+
+def train_model_task(
+    file_path: str,
+    target_col: str,
+    config: dict,
+    task_id: str,
+    update_progress_callback=None,
+    heartbeat=None
+):
+    try:
+        cv_metrics = None
+        if config.get('eval_mode', 'holdout') == 'walk_forward':
+            # 先做交叉验证评估，随后照常在固定划分上训练用于部署与展示的模型
+            cv_metrics = run_walk_forward_cv(
+                file_path, target_col, config, max_workers=config.get('cv_max_workers'), heartbeat=heartbeat
+            )
+        
+        set_seed(42)
+        prepared = prepare_dataset(file_path, target_col, config)
+        scaler = prepared['scaler']
+        target_idx = prepared['target_idx']
+        input_dim = len(prepared['columns'])
+        
+        seq_len = config.get('seq_len', 12)
+        pred_len = config.get('pred_len', 1)
+        
+        train_loader, val_loader, test_loader, augmenter = make_data_loaders(prepared, config)
         
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         
@@ -151,117 +1382,76 @@ def train_model_task(
         print(f"  模型类型: {model_type}")
         print(f"  输入维度: {input_dim}")
         print(f"  序列长度: {seq_len}")
+        print(f"  预测步数: {pred_len}")
         print(f"  训练轮次: {epochs}")
         print(f"  集成数量: {n_models}")
+        if config.get('compile_model', False) or config.get('precision', 'fp32') != 'fp32':
+            print(f"  加速模式: compile={config.get('compile_model', False)}, precision={config.get('precision', 'fp32')}")
         print(f"=" * 50)
         
-        trained_models = []
-        
-        for i in range(n_models):
-            # 根据模型类型选择不同的模型架构和默认参数
-            if model_type == 'auto-mamformer':
-                # Auto-Mamformer: Mamba + Autoformer (自相关 + 序列分解) + 门控融合
-                # 参考 auto_mamformer_bod.py 的配置
-                print(f"  [模型 {i+1}/{n_models}] 使用 Auto-Mamformer 架构")
-                model = AutoMamformer(
-                    input_dim=input_dim,
-                    d_model=config.get('d_model', 64),
-                    n_layers=config.get('n_layers', 2),
-                    seq_len=seq_len,
-                    pred_len=1,
-                    dropout=config.get('dropout', 0.05)  # Auto-Mamformer 使用较低的 dropout
-                ).to(device)
-            else:  # 默认使用 mamformer
-                # Mamformer: Mamba + Attention + GatedMLP
-                # 参考 train_whiteness.py 的配置
-                print(f"  [模型 {i+1}/{n_models}] 使用 Mamformer 架构")
-                model = Mamformer(
-                    input_dim=input_dim,
-                    d_model=config.get('d_model', 64),
-                    n_layers=config.get('n_layers', 2),
-                    seq_len=seq_len,
-                    dropout=config.get('dropout', 0.3)  # Mamformer 使用较高的 dropout 防止过拟合
-                ).to(device)
-            
+        ensemble_mode = config.get('ensemble_mode', 'sequential')
+        
+        # 断点按 task_id 保存，同一任务重新运行时从断点继续
+        checkpoint_every = config.get('checkpoint_every', 10)
+        def member_checkpoint(name):
+            if task_id is None or checkpoint_every <= 0:
+                return None
+            return TrainingCheckpoint.for_task(task_id, name, every=checkpoint_every)
+        
+        def new_model(i):
+            print(f"  [模型 {i+1}/{n_models}] 使用 {'Auto-Mamformer' if model_type == 'auto-mamformer' else 'Mamformer'} 架构")
+            model = build_model(model_type, input_dim, seq_len, config).to(device)
             # 打印模型参数量
             total_params = sum(p.numel() for p in model.parameters() if p.requires_grad)
             print(f"    参数量: {total_params:,}")
-            
-            optimizer = torch.optim.AdamW(model.parameters(), lr=config.get('lr', 0.001), weight_decay=0.01)
-            criterion = nn.MSELoss()
-            
-            best_val_r2 = -float('inf')
-            best_state = None
-            
-            for epoch in range(epochs):
-                model.train()
-                train_loss = 0
-                for batch_x, batch_y in train_loader:
-                    batch_x, batch_y = batch_x.to(device), batch_y.to(device)
-                    optimizer.zero_grad()
-                    preds = model(batch_x)
-                    loss = criterion(preds.squeeze(), batch_y.squeeze())
-                    loss.backward()
-                    optimizer.step()
-                    train_loss += loss.item()
-                
-                # Validation
-                model.eval()
-                val_preds, val_trues = [], []
-                val_loss = 0
-                with torch.no_grad():
-                    for batch_x, batch_y in val_loader:
-                        batch_x, batch_y = batch_x.to(device), batch_y.to(device)
-                        preds = model(batch_x)
-                        loss = criterion(preds.squeeze(), batch_y.squeeze())
-                        val_loss += loss.item()
-                        val_preds.extend(preds.cpu().numpy().reshape(-1).tolist())
-                        val_trues.extend(batch_y.cpu().numpy().reshape(-1).tolist())
-                
-                # Calculate validation metrics on original scale
-                # Inverse transform to original scale for meaningful R2
-                val_preds_array = np.array(val_preds)
-                val_trues_array = np.array(val_trues)
-                
-                dummy_pred_val = np.zeros((len(val_preds_array), scaler.n_features_in_))
-                dummy_true_val = np.zeros((len(val_trues_array), scaler.n_features_in_))
-                dummy_pred_val[:, target_idx] = val_preds_array
-                dummy_true_val[:, target_idx] = val_trues_array
-                
-                val_preds_rescaled = scaler.inverse_transform(dummy_pred_val)[:, target_idx]
-                val_trues_rescaled = scaler.inverse_transform(dummy_true_val)[:, target_idx]
-                
-                val_r2 = r2_score(val_trues_rescaled, val_preds_rescaled)
-                val_mae = mean_absolute_error(val_trues_rescaled, val_preds_rescaled)
-                val_rmse = np.sqrt(mean_squared_error(val_trues_rescaled, val_preds_rescaled))
-                val_mape = mean_absolute_percentage_error(val_trues_rescaled, val_preds_rescaled) * 100
-                avg_val_loss = val_loss / len(val_loader)
-                
-                if val_r2 > best_val_r2:
-                    best_val_r2 = val_r2
-                    best_state = copy.deepcopy(model.state_dict())
-                
-                # Update progress with all metrics
-                if update_progress_callback and i == 0 and epoch % 5 == 0:
-                    overall_progress = ((i * epochs) + epoch) / (n_models * epochs) * 100
-                    metrics = {
-                        'val_r2': val_r2,
-                        'val_mae': val_mae,
-                        'val_rmse': val_rmse,
-                        'val_mape': val_mape,
-                        'val_loss': avg_val_loss
-                    }
-                    update_progress_callback(
-                        task_id, 
-                        overall_progress, 
-                        epoch, 
-                        train_loss / len(train_loader), 
-                        val_r2,
-                        metrics
-                    )
-            
-            model.load_state_dict(best_state)
-            trained_models.append(model)
+            return model
+        
+        train_kwargs = dict(
+            train_loader=train_loader,
+            val_loader=val_loader,
+            scaler=scaler,
+            target_idx=target_idx,
+            config=config,
+            device=device,
+            task_id=task_id,
+            update_progress_callback=update_progress_callback,
+            augmenter=augmenter,
+            heartbeat=heartbeat
+        )
+        if ensemble_mode == 'process':
+            try:
+                results = train_process_ensemble(
+                    model_type, input_dim, seq_len, n_models, prepared, config, task_id, update_progress_callback,
+                    max_workers=config.get('max_workers'),
+                    checkpoints=[member_checkpoint(f"member_{i}") for i in range(n_models)],
+                    heartbeat=heartbeat
+                )
+            except (AssertionError, OSError, BrokenProcessPool) as e:
+                # 例如 Celery prefork worker 为 daemon 进程，不允许再创建子进程
+                print(f"进程池不可用，回退为顺序训练: {e}")
+                ensemble_mode = 'sequential'
+            else:
+                trained_models, summaries = [], []
+                for i, (state, summary) in enumerate(results):
+                    model = new_model(i)
+                    model.load_state_dict(state)
+                    trained_models.append(model)
+                    summaries.append(summary)
+        
+        if ensemble_mode == 'vectorized':
+            models = [new_model(i) for i in range(n_models)]
+            trained_models, summaries = train_vectorized_ensemble(
+                models, checkpoint=member_checkpoint("ensemble"), **train_kwargs
+            )
+        elif ensemble_mode != 'process':
+            # 逐个创建并训练，保持与原实现相同的随机数消耗顺序
+            trained_models, summaries = [], []
+            for i in range(n_models):
+                model, summary = train_single_model(
+                    new_model(i), i, n_models, checkpoint=member_checkpoint(f"member_{i}"), **train_kwargs
+                )
+                trained_models.append(model)
+                summaries.append(summary)
         
         # Evaluation
         all_preds = []
@@ -271,26 +1461,23 @@ def train_model_task(
             for batch_x, batch_y in test_loader:
                 true_values.extend(batch_y.numpy().reshape(-1).tolist())
         
-        for model in trained_models:
-            model.eval()
-            model_preds = []
+        if ensemble_mode == 'vectorized':
+            # 所有成员一次批量前向
+            ensemble = StackedEnsemble(trained_models).to(device)
+            ensemble.eval()
             with torch.no_grad():
                 for batch_x, _ in test_loader:
-                    batch_x = batch_x.to(device)
-                    preds = model(batch_x)
-                    model_preds.extend(preds.cpu().numpy().reshape(-1).tolist())
-            all_preds.append(np.array(model_preds))
+                    preds = ensemble(batch_x.to(device))
+                    all_preds.append(preds.cpu().numpy().reshape(n_models, -1))
+            all_preds = np.concatenate(all_preds, axis=1)
+        else:
+            all_preds = predict_members(trained_models, test_loader, device)
             
         ensemble_preds = np.mean(all_preds, axis=0)
         
-        # Inverse Transform
-        dummy_pred = np.zeros((len(ensemble_preds), scaler.n_features_in_))
-        dummy_true = np.zeros((len(true_values), scaler.n_features_in_))
-        dummy_pred[:, target_idx] = ensemble_preds
-        dummy_true[:, target_idx] = true_values
-        
-        preds_rescaled = scaler.inverse_transform(dummy_pred)[:, target_idx]
-        trues_rescaled = scaler.inverse_transform(dummy_true)[:, target_idx]
+        # Inverse Transform (多步预测时按 [N, pred_len] 展平，所有步共用目标列的缩放参数)
+        preds_rescaled = inverse_transform_target(scaler, ensemble_preds, target_idx)
+        trues_rescaled = inverse_transform_target(scaler, true_values, target_idx)
         
         r2 = r2_score(trues_rescaled, preds_rescaled)
         rmse = np.sqrt(mean_squared_error(trues_rescaled, preds_rescaled))
@@ -298,17 +1485,57 @@ def train_model_task(
         mape = mean_absolute_percentage_error(trues_rescaled, preds_rescaled) * 100
         
         metrics = {'r2': r2, 'rmse': rmse, 'mae': mae, 'mape': mape}
+        # 各成员的最佳验证 R2 与实际停止的 epoch
+        metrics['members'] = summaries
+        if cv_metrics is not None:
+            metrics['cv'] = cv_metrics
+        if 'acceleration' in summaries[0]:
+            metrics['acceleration'] = summaries[0]['acceleration']
+            print(f"加速模式: {metrics['acceleration']}")
+        
+        preds_series, trues_series = preds_rescaled, trues_rescaled
+        if pred_len > 1:
+            # 逐步指标；predictions / true_values 保留第一步序列以兼容前端展示
+            preds_by_horizon = preds_rescaled.reshape(-1, pred_len)
+            trues_by_horizon = trues_rescaled.reshape(-1, pred_len)
+            metrics['pred_len'] = pred_len
+            metrics['horizons'] = [
+                {'horizon': h + 1, **regression_metrics(trues_by_horizon[:, h], preds_by_horizon[:, h])}
+                for h in range(pred_len)
+            ]
+            preds_series = preds_by_horizon[:, 0]
+            trues_series = trues_by_horizon[:, 0]
         
         # Save model (just one for now or all? Saving best state of first model for simplicity of file handling)
         model_dir = "model"
         os.makedirs(model_dir, exist_ok=True)
         model_path = os.path.join(model_dir, f"{task_id}.pth")
         torch.save(trained_models[0].state_dict(), model_path)
+        # 全部成员 + 预处理参数 + 结构参数的自包含模型包，推理时直接内存映射加载
+        bundle_path = os.path.join(model_dir, f"{task_id}.bundle")
+        metrics['bundle'] = save_bundle(
+            bundle_path, trained_models, model_type, config,
+            input_dim, seq_len, scaler, prepared['columns'], target_idx
+        )
+        
+        if config.get('export_artifacts', False):
+            test_inputs = torch.cat([batch_x for batch_x, _ in test_loader])
+            metrics['export'] = export_serving_artifacts(
+                trained_models,
+                bundle_path,
+                test_inputs,
+                trues_rescaled,
+                lambda preds: inverse_transform_target(scaler, preds, target_idx),
+                max_r2_drop=config.get('export_max_r2_drop', 0.01)
+            )
+        
+        if task_id is not None:
+            clear_task_checkpoints(task_id)
         
         return {
             "metrics": metrics,
-            "predictions": preds_rescaled.tolist(),
-            "true_values": trues_rescaled.tolist(),
+            "predictions": preds_series.tolist(),
+            "true_values": trues_series.tolist(),
             "model_path": model_path,
             "r2_score": r2,
             "rmse": rmse,
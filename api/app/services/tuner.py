@@ -0,0 +1,140 @@
+"""
+超参数搜索 - 逐级减半 (successive halving)
+
+从搜索空间随机采样 n_trials 组配置，第 k 级 (rung) 以 min_epochs * eta^k 个 epoch
+(不超过 max_epochs) 训练当前存活的所有试验，按最佳验证 R2 保留前 1/eta 进入下一级，
+其余试验剪枝。到达 max_epochs 或只剩一个试验时结束。
+大多数配置只在很小的预算上训练，总 epoch 数远小于逐一完整训练 n_trials 个任务。
+
+搜索空间格式 (参数名 -> 采样规则):
+- {"type": "choice", "values": [...]}
+- {"type": "int", "low": 1, "high": 4}            闭区间均匀整数
+- {"type": "float", "low": 1e-4, "high": 1e-2, "log": true}
+"""
+import math
+import random
+
+from app.services.scheduler import TaskClaimLost
+
+DEFAULT_SEARCH_SPACE = {
+    'd_model': {'type': 'choice', 'values': [32, 64, 128]},
+    'n_layers': {'type': 'int', 'low': 1, 'high': 4},
+    'lr': {'type': 'float', 'low': 1e-4, 'high': 3e-3, 'log': True},
+    'seq_len': {'type': 'choice', 'values': [8, 12, 16, 24]},
+    'dropout': {'type': 'float', 'low': 0.05, 'high': 0.4},
+}
+
+
+def sample_params(search_space, rng):
+    params = {}
+    for name, spec in search_space.items():
+        kind = spec.get('type', 'choice')
+        if kind == 'choice':
+            params[name] = rng.choice(list(spec['values']))
+        elif kind == 'int':
+            params[name] = rng.randint(int(spec['low']), int(spec['high']))
+        elif kind == 'float':
+            low, high = float(spec['low']), float(spec['high'])
+            if spec.get('log', False):
+                params[name] = math.exp(rng.uniform(math.log(low), math.log(high)))
+            else:
+                params[name] = rng.uniform(low, high)
+        else:
+            raise ValueError(f"不支持的搜索空间类型: {name}={kind}")
+    return params
+
+
+def rung_budgets(min_epochs, max_epochs, eta):
+    """各级的训练 epoch 数: min_epochs * eta^k，最后一级为 max_epochs"""
+    budgets = []
+    budget = min_epochs
+    while budget < max_epochs:
+        budgets.append(budget)
+        budget *= eta
+    budgets.append(max_epochs)
+    return budgets
+
+
+def successive_halving(trials, evaluate, min_epochs, max_epochs, eta=3, on_update=None):
+    """
+    trials:    [{'params': {...}}, ...]，就地补充 status / rung / epochs / val_r2 / history
+    evaluate:  evaluate(params, epochs) -> 验证 R2；抛出异常的试验记为 failed 并移出搜索，
+               TaskClaimLost 表示整个搜索已被其他执行者接管，直接向上抛出
+    on_update: 每个试验状态变化后回调 on_update(trial)，用于记录进度
+    返回最佳试验 (全部失败时为 None)
+    """
+    for index, trial in enumerate(trials):
+        trial.update({'trial': index, 'status': 'pending', 'rung': None, 'epochs': None,
+                      'val_r2': None, 'history': []})
+
+    def notify(trial):
+        if on_update is not None:
+            on_update(trial)
+
+    survivors = list(trials)
+    for rung, budget in enumerate(rung_budgets(min_epochs, max_epochs, eta)):
+        print(f"逐级减半: 第 {rung} 级, {len(survivors)} 个试验 × {budget} epochs")
+        for trial in survivors:
+            trial['status'] = 'running'
+            notify(trial)
+            try:
+                score = float(evaluate(trial['params'], budget))
+            except TaskClaimLost:
+                raise
+            except Exception as e:
+                print(f"  试验 {trial['trial']} 失败: {e}")
+                trial.update({'status': 'failed', 'error': str(e)})
+                notify(trial)
+                continue
+            if math.isnan(score):
+                score = -float('inf')
+            trial.update({'rung': rung, 'epochs': budget, 'val_r2': score})
+            trial['history'].append({'rung': rung, 'epochs': budget, 'val_r2': score})
+            notify(trial)
+
+        survivors = sorted(
+            (t for t in survivors if t['status'] != 'failed'), key=lambda t: t['val_r2'], reverse=True
+        )
+        if budget >= max_epochs or len(survivors) <= 1:
+            break
+        keep = max(1, len(survivors) // eta)
+        for trial in survivors[keep:]:
+            trial['status'] = 'pruned'
+            notify(trial)
+        survivors = survivors[:keep]
+
+    for trial in survivors:
+        trial['status'] = 'completed'
+        notify(trial)
+    return survivors[0] if survivors else None
+
+
+def run_hyperparameter_search(file_path, target_col, base_config, search_space=None, n_trials=27,
+                              min_epochs=10, max_epochs=None, eta=3, seed=42, on_update=None, heartbeat=None):
+    """
+    在 base_config 基础上搜索 search_space 中的参数。每个试验训练单个模型 (n_models=1)
+    并以最佳验证 R2 为得分；所有试验共享 prepare_dataset 的特征选择与预处理缓存。
+    heartbeat 透传给每个试验的训练循环 (每个 epoch 调用一次)。
+    返回 {'best': 最佳试验, 'trials': 全部试验, 'epochs_used', 'epochs_full'}，
+    epochs_full 为每个试验都完整训练 max_epochs 时的总 epoch 数。
+    """
+    from app.services.trainer import evaluate_config
+
+    search_space = search_space or DEFAULT_SEARCH_SPACE
+    max_epochs = max_epochs or base_config.get('epochs', 400)
+    min_epochs = max(1, min(min_epochs, max_epochs))
+    rng = random.Random(seed)
+    trials = [{'params': sample_params(search_space, rng)} for _ in range(n_trials)]
+
+    def evaluate(params, epochs):
+        config = {**base_config, **params, 'epochs': epochs, 'n_models': 1, 'ensemble_mode': 'sequential'}
+        return evaluate_config(file_path, target_col, config, heartbeat=heartbeat)['best_val_r2']
+
+    best = successive_halving(trials, evaluate, min_epochs, max_epochs, eta=eta, on_update=on_update)
+    epochs_used = sum(h['epochs'] for t in trials for h in t['history'])
+    return {
+        'best': best,
+        'trials': trials,
+        'epochs_used': epochs_used,
+        'epochs_full': n_trials * max_epochs
+    }
@@ -1,10 +1,17 @@
 import os
+import socket
+import threading
+import time
 from celery import Celery
+from celery.signals import worker_init
+from sqlalchemy import and_, or_
 from app.core.config import settings
 from app.services.trainer import train_model_task
-from app.core.database import SessionLocal
-from app.models.models import TrainingTask, TrainingResult, TrainingLog
-from datetime import datetime
+from app.services.tuner import run_hyperparameter_search
+from app.services.scheduler import TaskClaimLost, get_scheduler
+from app.core.database import Base, SessionLocal, add_missing_columns, engine
+from app.models.models import DataFile, TrainingTask, TrainingResult, TrainingLog, HyperparameterStudy, HyperparameterTrial
+from datetime import datetime, timedelta
 import json
 import uuid
 
@@ -13,10 +20,146 @@ celery.conf.broker_url = settings.CELERY_BROKER_URL
 celery.conf.result_backend = settings.CELERY_RESULT_BACKEND
 celery.conf.task_always_eager = settings.CELERY_TASK_ALWAYS_EAGER
 
-@celery.task(bind=True)
+@worker_init.connect
+def upgrade_database(**kwargs):
+    # Celery worker 可能先于 API 进程启动，同样补齐旧数据库缺少的列
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+# acks_late: worker 进程崩溃时任务消息重新投递，认领成功后由断点继续训练
+@celery.task(bind=True, acks_late=True, reject_on_worker_lost=True)
 def train_mamformer_task(self, task_id_db: str, file_path: str, target_col: str, config: dict):
     run_training_logic(task_id_db, file_path, target_col, config, celery_task=self)
 
+# 超参数搜索没有断点，重新投递后从头运行
+@celery.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def hyperparameter_search_task(self, study_id: str, file_path: str, target_col: str):
+    run_search_logic(study_id, file_path, target_col, celery_task=self)
+
+def _dispatch(job_id, logic, celery_task, args, priority=0):
+    """
+    eager 模式 (无 Redis/Broker) 交给进程内调度器排队执行 (并发数与每个任务的线程数受限)；
+    否则交给 Celery。
+    """
+    if settings.CELERY_TASK_ALWAYS_EAGER:
+        get_scheduler().submit(job_id, logic, args, priority=priority)
+    else:
+        celery_task.delay(*args)
+
+def dispatch_training(task_id_db: str, file_path: str, target_col: str, config: dict):
+    _dispatch(task_id_db, run_training_logic, train_mamformer_task, (task_id_db, file_path, target_col, config),
+              priority=config.get('priority', 0))
+
+def dispatch_search(study_id: str, file_path: str, target_col: str, priority: int = 0):
+    _dispatch(study_id, run_search_logic, hyperparameter_search_task, (study_id, file_path, target_col),
+              priority=priority)
+
+def get_queue_status(job_id: str):
+    """eager 模式下任务在调度器中的排队位置 / 运行信息；Celery 模式或任务不在调度器中时为 None"""
+    if not settings.CELERY_TASK_ALWAYS_EAGER:
+        return None
+    return get_scheduler().status(job_id)
+
+def _new_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def _stale_cutoff(now=None):
+    return (now or datetime.utcnow()) - timedelta(minutes=settings.STALE_TASK_TIMEOUT_MINUTES)
+
+def _stale_running(model, cutoff):
+    return and_(
+        model.status == "running",
+        or_(model.heartbeat_at.is_(None), model.heartbeat_at < cutoff)
+    )
+
+def claim_task(db, job_uuid, worker_id, now=None, model=TrainingTask):
+    """
+    原子地认领训练任务 (model=HyperparameterStudy 时为超参数搜索):
+    单条 UPDATE，仅当状态为 pending 或 running 但心跳超时时成功。
+    同一任务的多份派发 (broker 重投、多个 API 进程恢复) 只有一份能认领并执行。
+    """
+    now = now or datetime.utcnow()
+    claimed = db.query(model).filter(
+        model.id == job_uuid,
+        or_(model.status == "pending", _stale_running(model, _stale_cutoff(now)))
+    ).update({
+        model.status: "running",
+        model.worker_id: worker_id,
+        model.heartbeat_at: now,
+        model.started_at: now
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def touch_heartbeat(db, job_uuid, worker_id, now=None, model=TrainingTask):
+    """刷新心跳；返回 False 表示任务已不再由 worker_id 持有"""
+    updated = db.query(model).filter(
+        model.id == job_uuid,
+        model.worker_id == worker_id,
+        model.status == "running"
+    ).update({model.heartbeat_at: now or datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return updated == 1
+
+def _heartbeat_writer(db, job_uuid, worker_id, model=TrainingTask):
+    """
+    训练循环的心跳回调: 每个成员每个 epoch 调用一次，写库间隔不小于 TASK_HEARTBEAT_INTERVAL_SECONDS；
+    任务已被重新认领时抛出 TaskClaimLost 终止训练
+    """
+    last_beat = [time.monotonic()]
+    def heartbeat(member=None, epoch=None):
+        now = time.monotonic()
+        if now - last_beat[0] < settings.TASK_HEARTBEAT_INTERVAL_SECONDS:
+            return
+        last_beat[0] = now
+        if not touch_heartbeat(db, job_uuid, worker_id, model=model):
+            raise TaskClaimLost(f"{job_uuid} 已被其他执行者重新认领")
+    return heartbeat
+
+def find_stale_tasks(db, include_pending=False, now=None, model=TrainingTask):
+    """心跳超过 STALE_TASK_TIMEOUT_MINUTES 的 running 任务；include_pending 时也包括 pending 任务"""
+    condition = _stale_running(model, _stale_cutoff(now))
+    if include_pending:
+        condition = or_(model.status == "pending", condition)
+    return db.query(model).filter(condition).all()
+
+def requeue_stale_tasks(include_pending=False):
+    """
+    重新派发中断的训练任务与超参数搜索: 训练从最近的断点继续，搜索从头重新运行；
+    是否真正执行由 claim_task 决定
+    """
+    db = SessionLocal()
+    try:
+        for task in find_stale_tasks(db, include_pending=include_pending):
+            print(f"恢复中断的训练任务: {task.id} ({task.status})")
+            dispatch_training(str(task.id), task.data_file.file_path, task.config['target_col'], task.config)
+        for study in find_stale_tasks(db, include_pending=include_pending, model=HyperparameterStudy):
+            data_file = db.query(DataFile).filter(DataFile.id == study.data_id).first()
+            if data_file is None:
+                continue
+            print(f"恢复中断的超参数搜索: {study.id} ({study.status})")
+            dispatch_search(str(study.id), data_file.file_path, study.config['target_col'])
+    except Exception as e:
+        print(f"Error requeueing stale tasks: {e}")
+    finally:
+        db.close()
+
+def start_stale_task_monitor():
+    """
+    eager 模式的任务恢复: 启动时派发 pending 与心跳超时的 running 训练任务/超参数搜索，
+    之后每隔半个超时时间重新派发心跳超时的任务。
+    Celery 模式只依赖 broker 重新投递 acks_late 消息，API 进程不重复派发。
+    """
+    if not settings.CELERY_TASK_ALWAYS_EAGER:
+        return
+    requeue_stale_tasks(include_pending=True)
+    interval = settings.STALE_TASK_TIMEOUT_MINUTES * 60 / 2
+    def monitor():
+        while True:
+            time.sleep(interval)
+            requeue_stale_tasks()
+    threading.Thread(target=monitor, daemon=True, name="stale-task-monitor").start()
+
 import math
 
 def sanitize_for_json(obj):
@@ -31,23 +174,32 @@ def sanitize_for_json(obj):
 
 def run_training_logic(task_id_db: str, file_path: str, target_col: str, config: dict, celery_task=None):
     db = SessionLocal()
+    worker_id = _new_worker_id()
     try:
         # Cast string ID to UUID object for SQLAlchemy/SQLite compatibility
         task_uuid = uuid.UUID(task_id_db)
+        claimed = claim_task(db, task_uuid, worker_id)
         task = db.query(TrainingTask).filter(TrainingTask.id == task_uuid).first()
-        
-        if not task:
-            print(f"Task {task_id_db} not found in DB")
-            return "Task not found"
-            
-        task.status = "running"
-        task.started_at = datetime.utcnow()
-        db.commit()
     except Exception as e:
         print(f"Error initializing task: {e}")
         db.close()
         return f"Error initializing task: {e}"
     
+    if not task:
+        print(f"Task {task_id_db} not found in DB")
+        db.close()
+        return "Task not found"
+    if not claimed:
+        status = task.status
+        db.close()
+        if status == "running" and celery_task is not None:
+            # broker 重投的消息: 原执行者的心跳尚未超时，超时后再尝试认领
+            raise celery_task.retry(countdown=settings.STALE_TASK_TIMEOUT_MINUTES * 60, max_retries=None)
+        print(f"Task {task_id_db} is {status} and cannot be claimed, skipping")
+        return "Task already claimed"
+    
+    heartbeat = _heartbeat_writer(db, task_uuid, worker_id)
+    
     def progress_callback(tid, progress, epoch, train_loss, val_r2, metrics=None):
         if celery_task:
             celery_task.update_state(state='PROGRESS', meta={
@@ -78,8 +230,11 @@ def run_training_logic(task_id_db: str, file_path: str, target_col: str, config:
             target_col=target_col,
             config=config,
             task_id=task_id_db,
-            update_progress_callback=progress_callback
+            update_progress_callback=progress_callback,
+            heartbeat=heartbeat
         )
+        if not touch_heartbeat(db, task_uuid, worker_id):
+            raise TaskClaimLost(f"训练任务 {task_id_db} 已被其他执行者重新认领")
         
         # Save result
         # Sanitize data to ensure valid JSON (no NaNs/Infs)
@@ -108,7 +263,17 @@ def run_training_logic(task_id_db: str, file_path: str, target_col: str, config:
         
         return "训练已完成"
         
+    except TaskClaimLost as e:
+        # 新的执行者负责任务状态与结果，这里不再写入
+        db.rollback()
+        print(f"Training stopped: {e}")
+        return "Task claimed by another worker"
     except Exception as e:
+        db.rollback()
+        db.refresh(task)
+        if task.worker_id != worker_id:
+            print(f"Training stopped after losing claim: {e}")
+            return "Task claimed by another worker"
         task.status = "failed"
         task.error_message = str(e)
         task.completed_at = datetime.utcnow()
@@ -120,3 +285,99 @@ def run_training_logic(task_id_db: str, file_path: str, target_col: str, config:
         print(f"Training failed: {e}")
     finally:
         db.close()
+
+def run_search_logic(study_id: str, file_path: str, target_col: str, celery_task=None):
+    """
+    执行超参数搜索，并将每个试验的状态变化和最终结果写入数据库。
+    搜索没有断点: 中断后重新认领时删除已记录的试验并从头运行 (试验采样由 seed 决定，结果可复现)
+    """
+    db = SessionLocal()
+    worker_id = _new_worker_id()
+    study_uuid = uuid.UUID(study_id)
+    try:
+        claimed = claim_task(db, study_uuid, worker_id, model=HyperparameterStudy)
+        study = db.query(HyperparameterStudy).filter(HyperparameterStudy.id == study_uuid).first()
+    except Exception as e:
+        print(f"Error initializing study: {e}")
+        db.close()
+        return f"Error initializing study: {e}"
+    
+    if not study:
+        print(f"Study {study_id} not found in DB")
+        db.close()
+        return "Study not found"
+    if not claimed:
+        status = study.status
+        db.close()
+        if status == "running" and celery_task is not None:
+            # broker 重投的消息: 原执行者的心跳尚未超时，超时后再尝试认领
+            raise celery_task.retry(countdown=settings.STALE_TASK_TIMEOUT_MINUTES * 60, max_retries=None)
+        print(f"Study {study_id} is {status} and cannot be claimed, skipping")
+        return "Study already claimed"
+    
+    try:
+        db.query(HyperparameterTrial).filter(HyperparameterTrial.study_id == study_uuid).delete(synchronize_session=False)
+        db.commit()
+        heartbeat = _heartbeat_writer(db, study_uuid, worker_id, model=HyperparameterStudy)
+        
+        trial_rows = {}
+        def on_update(trial):
+            row = trial_rows.get(trial['trial'])
+            if row is None:
+                row = HyperparameterTrial(study_id=study.id, trial_index=trial['trial'], params=trial['params'])
+                db.add(row)
+                trial_rows[trial['trial']] = row
+            row.status = trial['status']
+            row.rung = trial['rung']
+            row.epochs = trial['epochs']
+            row.val_r2 = sanitize_for_json(trial['val_r2'])
+            row.history = sanitize_for_json(list(trial['history']))
+            db.commit()
+            if celery_task:
+                celery_task.update_state(state='PROGRESS', meta={'trial': trial['trial'], 'status': trial['status']})
+        
+        search_settings = study.settings
+        result = run_hyperparameter_search(
+            file_path,
+            target_col,
+            study.config,
+            search_space=study.search_space,
+            n_trials=search_settings['n_trials'],
+            min_epochs=search_settings['min_epochs'],
+            max_epochs=search_settings.get('max_epochs'),
+            eta=search_settings['eta'],
+            seed=search_settings['seed'],
+            on_update=on_update,
+            heartbeat=heartbeat
+        )
+        if not touch_heartbeat(db, study_uuid, worker_id, model=HyperparameterStudy):
+            raise TaskClaimLost(f"超参数搜索 {study_id} 已被其他执行者重新认领")
+        
+        best = result['best']
+        study.best_params = best['params'] if best else None
+        study.best_val_r2 = sanitize_for_json(best['val_r2']) if best else None
+        study.epochs_used = result['epochs_used']
+        study.epochs_full = result['epochs_full']
+        study.status = "completed" if best else "failed"
+        if not best:
+            study.error_message = "所有试验均失败"
+        study.completed_at = datetime.utcnow()
+        db.commit()
+        return "超参数搜索已完成"
+    except TaskClaimLost as e:
+        db.rollback()
+        print(f"Hyperparameter search stopped: {e}")
+        return "Study claimed by another worker"
+    except Exception as e:
+        db.rollback()
+        study = db.query(HyperparameterStudy).filter(HyperparameterStudy.id == study_uuid).first()
+        if study and study.worker_id == worker_id:
+            study.status = "failed"
+            study.error_message = str(e)
+            study.completed_at = datetime.utcnow()
+            db.commit()
+        if celery_task:
+            raise e
+        print(f"Hyperparameter search failed: {e}")
+    finally:
+        db.close()
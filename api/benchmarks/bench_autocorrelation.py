@@ -0,0 +1,82 @@
+"""
+AutoCorrelation 时间延迟聚合基准测试
+
+对比逐延迟循环 (time_delay_agg_loop) 与向量化实现 (time_delay_agg)
+在不同 seq_len / d_model 下的耗时与内存:
+- saved(KB): 训练时为反向传播保存的张量总大小 (按存储去重)
+- peak(KB):  CUDA 上前向的峰值显存增量 (CPU 上不统计，显示为 -)
+
+用法 (在 api 目录下):
+    python -m benchmarks.bench_autocorrelation
+"""
+import time
+
+import torch
+
+from app.services.model_arch import AutoCorrelation
+
+
+def _sync(device):
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+
+
+def _time(fn, repeats, device):
+    fn()
+    _sync(device)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    _sync(device)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def _memory(fn, values, corr, device):
+    """返回 (反向传播保存的字节数, CUDA 前向峰值增量字节数或 None)"""
+    values = values.detach().requires_grad_()
+    corr = corr.detach().requires_grad_()
+    saved = {}
+
+    def pack(tensor):
+        storage = tensor.untyped_storage()
+        saved[storage.data_ptr()] = storage.nbytes()
+        return tensor
+
+    if device.type == 'cuda':
+        _sync(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        base = torch.cuda.memory_allocated(device)
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda tensor: tensor):
+        out = fn(values, corr)
+    peak = torch.cuda.max_memory_allocated(device) - base if device.type == 'cuda' else None
+    del out
+    return sum(saved.values()), peak
+
+
+def _kb(nbytes):
+    return '-' if nbytes is None else f"{nbytes / 1024:.0f}"
+
+
+def main() -> None:
+    torch.manual_seed(0)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    batch, n_heads, repeats = 32, 8, 50
+    print(f"{'seq_len':>8} {'d_model':>8} {'loop(ms)':>10} {'vector(ms)':>11} {'speedup':>8} "
+          f"{'loop saved(KB)':>15} {'vector saved(KB)':>17} {'loop peak(KB)':>14} {'vector peak(KB)':>16}")
+    for seq_len in (12, 24, 96, 336):
+        for d_model in (64, 128, 256):
+            module = AutoCorrelation(d_model, n_heads)
+            d_k = d_model // n_heads
+            values = torch.randn(batch, n_heads, seq_len, d_k, device=device)
+            corr = torch.randn(batch, n_heads, seq_len, d_k, device=device)
+            with torch.no_grad():
+                loop_ms = _time(lambda: module.time_delay_agg_loop(values, corr), repeats, device)
+                vec_ms = _time(lambda: module.time_delay_agg(values, corr), repeats, device)
+            loop_saved, loop_peak = _memory(module.time_delay_agg_loop, values, corr, device)
+            vec_saved, vec_peak = _memory(module.time_delay_agg, values, corr, device)
+            print(f"{seq_len:>8} {d_model:>8} {loop_ms:>10.3f} {vec_ms:>11.3f} {loop_ms / vec_ms:>7.2f}x "
+                  f"{_kb(loop_saved):>15} {_kb(vec_saved):>17} {_kb(loop_peak):>14} {_kb(vec_peak):>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+训练数据迭代基准测试
+
+对比 DataLoader (逐样本 __getitem__ + collate) 与 TensorBatchLoader
+遍历一个 epoch 的耗时。数据来自 data/prediction_dataset_full.csv，
+并按倍数平铺以模拟更大的数据集。
+
+用法 (在 api 目录下):
+    python -m benchmarks.bench_loader
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from torch.utils.data import DataLoader
+
+from app.services.trainer import AugmentedDataset, TensorBatchLoader
+
+DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data", "prediction_dataset_full.csv"
+)
+
+
+def _epoch_ms(loader, repeats=3):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for _batch in loader:
+            pass
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main() -> None:
+    df = pd.read_csv(DATA_PATH).select_dtypes(include=[np.number]).dropna(axis=1)
+    base = df.values.astype(np.float64)
+    base = (base - base.mean(axis=0)) / (base.std(axis=0) + 1e-6)
+    print(f"{'rows':>8} {'seq_len':>8} {'DataLoader(ms)':>15} {'Tensor(ms)':>11} {'speedup':>8}")
+    for tile in (1, 10, 100):
+        data = np.tile(base, (tile, 1))
+        for seq_len in (12, 96):
+            dataset = AugmentedDataset(data, target_idx=data.shape[1] - 1, seq_len=seq_len)
+            slow = _epoch_ms(DataLoader(dataset, batch_size=32, shuffle=True))
+            fast = _epoch_ms(TensorBatchLoader(dataset, batch_size=32, shuffle=True))
+            print(f"{len(data):>8} {seq_len:>8} {slow:>15.1f} {fast:>11.1f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Mamformer 预测头基准测试
+
+对比 head_mode = flatten / pool / attn 在不同 seq_len 下的
+参数量、头部参数量与前向+反向延迟。
+
+用法 (在 api 目录下):
+    python -m benchmarks.bench_mamformer_head
+"""
+import time
+
+import torch
+
+from app.services.model_arch import HEAD_MODES, Mamformer
+
+
+def _step_ms(model, x, repeats):
+    def step():
+        model.zero_grad()
+        model(x).sum().backward()
+    step()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        step()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main() -> None:
+    torch.manual_seed(0)
+    batch, input_dim, d_model, repeats = 32, 13, 64, 10
+    print(f"{'seq_len':>8} {'head':>8} {'params':>10} {'head_params':>12} {'step(ms)':>10}")
+    for seq_len in (12, 96, 256, 512):
+        x = torch.randn(batch, seq_len, input_dim)
+        for head_mode in HEAD_MODES:
+            model = Mamformer(input_dim, d_model=d_model, n_layers=2, seq_len=seq_len,
+                              dropout=0.3, head_mode=head_mode)
+            params = sum(p.numel() for p in model.parameters())
+            head_params = sum(p.numel() for p in model.output_proj.parameters())
+            step_ms = _step_ms(model, x, repeats)
+            print(f"{seq_len:>8} {head_mode:>8} {params:>10,} {head_params:>12,} {step_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
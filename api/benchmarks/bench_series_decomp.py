@@ -0,0 +1,40 @@
+"""
+SeriesDecomp 移动平均基准测试
+
+对比 avg_pool1d(+interpolate) 实现 (moving_avg_pool) 与前缀和实现
+(moving_avg) 在不同 seq_len / kernel_size 下的耗时。
+
+用法 (在 api 目录下):
+    python -m benchmarks.bench_series_decomp
+"""
+import time
+
+import torch
+
+from app.services.model_arch import SeriesDecomp
+
+
+def _time(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main() -> None:
+    torch.manual_seed(0)
+    batch, d_model, repeats = 32, 64, 50
+    print(f"{'seq_len':>8} {'kernel':>7} {'pool(ms)':>10} {'cumsum(ms)':>11} {'speedup':>8}")
+    for seq_len in (12, 96, 512, 2048):
+        for kernel_size in (25, 101):
+            decomp = SeriesDecomp(kernel_size=kernel_size)
+            x = torch.randn(batch, seq_len, d_model)
+            with torch.no_grad():
+                pool_ms = _time(lambda: decomp.moving_avg_pool(x), repeats)
+                cumsum_ms = _time(lambda: decomp.moving_avg(x), repeats)
+            print(f"{seq_len:>8} {kernel_size:>7} {pool_ms:>10.3f} {cumsum_ms:>11.3f} {pool_ms / cumsum_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
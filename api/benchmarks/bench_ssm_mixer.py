@@ -0,0 +1,46 @@
+"""
+序列混合层基准测试: 注意力 vs 选择性状态空间
+
+对比 mixer = attention / ssm 在不同 seq_len 下两种模型的
+前向+反向耗时，用于确定 SelectiveSSM 开始占优的 seq_len 交叉点。
+
+用法 (在 api 目录下):
+    python -m benchmarks.bench_ssm_mixer
+"""
+import time
+
+import torch
+
+from app.services.model_arch import AutoMamformer, MIXERS, Mamformer
+
+
+def _step_ms(model, x, repeats):
+    def step():
+        model.zero_grad()
+        model(x).sum().backward()
+    step()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        step()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main() -> None:
+    torch.manual_seed(0)
+    batch, input_dim, d_model, repeats = 16, 13, 64, 5
+    print(f"{'model':>15} {'seq_len':>8} " + " ".join(f"{m + '(ms)':>15}" for m in MIXERS))
+    for name, cls, kwargs in (
+        ("mamformer", Mamformer, {'head_mode': 'pool'}),
+        ("auto-mamformer", AutoMamformer, {}),
+    ):
+        for seq_len in (12, 48, 96, 192, 384, 768):
+            x = torch.randn(batch, seq_len, input_dim)
+            times = []
+            for mixer in MIXERS:
+                model = cls(input_dim, d_model=d_model, n_layers=2, seq_len=seq_len, mixer=mixer, **kwargs)
+                times.append(_step_ms(model, x, repeats))
+            print(f"{name:>15} {seq_len:>8} " + " ".join(f"{t:>15.2f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+滑动窗口流式推理基准测试
+
+在 data/prediction_dataset_full.csv 上逐行推进窗口，对比
+每行重新计算完整窗口 与 StreamingSession 增量推理 的吞吐 (rows/sec)。
+
+用法 (在 api 目录下):
+    python -m benchmarks.bench_streaming
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+
+from app.services.model_arch import AutoMamformer, Mamformer, StreamingSession, optimize_for_inference
+
+DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data", "prediction_dataset_full.csv"
+)
+
+
+def _load_rows():
+    df = pd.read_csv(DATA_PATH).select_dtypes(include=[np.number]).dropna(axis=1)
+    values = df.values.astype(np.float32)
+    values = (values - values.mean(axis=0)) / (values.std(axis=0) + 1e-6)
+    return torch.from_numpy(values)
+
+
+def _full_window(model, rows, seq_len):
+    model = optimize_for_inference(model)
+    start = time.perf_counter()
+    with torch.no_grad():
+        for t in range(seq_len - 1, len(rows)):
+            model(rows[t - seq_len + 1:t + 1].unsqueeze(0))
+    return (len(rows) - seq_len + 1) / (time.perf_counter() - start)
+
+
+def _streaming(model, rows, seq_len):
+    session = StreamingSession(model, seq_len=seq_len)
+    start = time.perf_counter()
+    for row in rows:
+        session.push(row)
+    return (len(rows) - seq_len + 1) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    torch.manual_seed(0)
+    rows = _load_rows()
+    input_dim = rows.shape[1]
+    print(f"rows={len(rows)} input_dim={input_dim}")
+    print(f"{'model':>15} {'seq_len':>8} {'full(rows/s)':>13} {'stream(rows/s)':>15} {'speedup':>8}")
+    for seq_len in (12, 48):
+        for name, cls in (("mamformer", Mamformer), ("auto-mamformer", AutoMamformer)):
+            model = cls(input_dim=input_dim, d_model=64, n_layers=2, seq_len=seq_len)
+            full = _full_window(model, rows, seq_len)
+            stream = _streaming(model, rows, seq_len)
+            print(f"{name:>15} {seq_len:>8} {full:>13.1f} {stream:>15.1f} {stream / full:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import ctypes
+import numpy as np
+import torch
+from sklearn.preprocessing import RobustScaler
+from app.services.bundle import load_bundle, read_bundle_header, save_bundle
+from app.services.trainer import build_model
+
+
+def _models_and_scaler(model_type, config):
+    torch.manual_seed(0)
+    models = [build_model(model_type, 4, 6, config).eval() for _ in range(2)]
+    scaler = RobustScaler().fit(np.random.default_rng(0).normal(size=(50, 4)))
+    return models, scaler
+
+
+def test_bundle_roundtrip_maps_all_members_without_copying(tmp_path):
+    config = {'d_model': 16, 'n_layers': 1, 'pred_len': 2, 'head_mode': 'pool'}
+    models, scaler = _models_and_scaler('mamformer', config)
+    path = str(tmp_path / "task.bundle")
+    info = save_bundle(path, models, 'mamformer', config, 4, 6, scaler, ['a', 'b', 'y', 'c'], 2)
+    assert info['size_bytes'] > 0
+
+    header, data_start = read_bundle_header(path)
+    assert data_start % 64 == 0
+    assert header['metadata']['architecture'] == config
+    assert all(t['offsets'][0] % 64 == 0 for t in header['tensors'].values())
+
+    bundle = load_bundle(path)
+    assert bundle.feature_names == ['a', 'b', 'c'] and bundle.target_idx == 2
+    np.testing.assert_allclose(bundle.scaler.center_, scaler.center_)
+
+    x = torch.randn(3, 6, 4)
+    member_preds = bundle.predict_members(x)
+    assert member_preds.shape == (2, 3, 2)
+    for m, model in enumerate(models):
+        with torch.no_grad():
+            torch.testing.assert_close(member_preds[m], model(x))
+
+    # 成员已为推理优化，且优化未复制 mmap 中的权重
+    assert not any(isinstance(m, torch.nn.Dropout) for model in bundle.models for m in model.modules())
+    start = ctypes.addressof(ctypes.c_char.from_buffer(bundle._buffer))
+    end = start + len(bundle._buffer)
+    for model in bundle.models:
+        for p in model.parameters():
+            assert start <= p.data_ptr() < end
+
+
+def test_bundle_transform_inputs_matches_training_preprocessing(tmp_path):
+    config = {'d_model': 16, 'n_layers': 1}
+    models, scaler = _models_and_scaler('auto-mamformer', config)
+    path = str(tmp_path / "auto.bundle")
+    save_bundle(path, models, 'auto-mamformer', config, 4, 6, scaler, ['a', 'b', 'c', 'y'], 3)
+    bundle = load_bundle(path)
+    raw = np.random.default_rng(1).normal(size=(6, 4))
+    expected = scaler.transform(raw)
+    expected[:, 3] = 0
+    np.testing.assert_allclose(bundle.transform_inputs(raw), expected)
+    values = np.array([0.5, -1.0])
+    dummy = np.zeros((2, 4))
+    dummy[:, 3] = values
+    np.testing.assert_allclose(bundle.inverse_target(values), scaler.inverse_transform(dummy)[:, 3])
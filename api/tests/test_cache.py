@@ -0,0 +1,51 @@
+import os
+import time
+import numpy as np
+from app.services.cache import FeatureRankingCache, PreprocessCache, file_sha256
+
+
+def test_feature_ranking_cache_roundtrip_and_counts(tmp_path):
+    cache = FeatureRankingCache(str(tmp_path), max_entries=4)
+    key = cache.make_key("abc", "target", (0.01, 0.99), 12)
+    assert cache.get(key) is None
+    cache.put(key, ["b", "a"])
+    assert cache.get(key) == ["b", "a"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert key != cache.make_key("abc", "target", (0.01, 0.99), 10)
+    assert key != cache.make_key("abc", "target", (0.05, 0.95), 12)
+
+
+def test_feature_ranking_cache_evicts_least_recently_used(tmp_path):
+    cache = FeatureRankingCache(str(tmp_path), max_entries=2)
+    keys = [cache.make_key(str(i), "t", (0.01, 0.99), 1) for i in range(3)]
+    cache.put(keys[0], ["x"])
+    cache.put(keys[1], ["y"])
+    past = time.time() - 100
+    os.utime(os.path.join(str(tmp_path), f"{keys[1]}.json"), (past, past))
+    cache.put(keys[2], ["z"])
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == ["x"]
+    assert cache.get(keys[2]) == ["z"]
+
+
+def test_file_sha256_depends_on_content(tmp_path):
+    a = tmp_path / "a.csv"
+    b = tmp_path / "b.csv"
+    a.write_text("x,y\n1,2\n")
+    b.write_text("x,y\n1,3\n")
+    assert file_sha256(str(a)) != file_sha256(str(b))
+
+
+def test_preprocess_cache_maps_arrays_read_only(tmp_path):
+    cache = PreprocessCache(str(tmp_path), max_entries=2)
+    train = np.arange(12, dtype=float).reshape(4, 3)
+    assert cache.get("k") is None
+    cache.put("k", {"train": train}, {"columns": ["a", "b", "c"]})
+    arrays, meta = cache.get("k")
+    assert isinstance(arrays["train"], np.memmap)
+    assert not arrays["train"].flags.writeable
+    np.testing.assert_array_equal(arrays["train"], train)
+    assert meta["columns"] == ["a", "b", "c"]
+    # 同一键重复写入不报错，保留已有条目
+    cache.put("k", {"train": train + 1}, {"columns": []})
+    np.testing.assert_array_equal(cache.get("k")[0]["train"], train)
@@ -0,0 +1,44 @@
+import uuid
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base, add_missing_columns
+from app.models.models import TrainingTask
+from app.worker import claim_task
+
+# 新增 worker_id / heartbeat_at 之前的 training_tasks 表结构
+OLD_TRAINING_TASKS = """
+CREATE TABLE training_tasks (
+    id UUID NOT NULL,
+    user_id UUID NOT NULL,
+    data_id UUID NOT NULL,
+    status VARCHAR,
+    config JSON NOT NULL,
+    started_at DATETIME,
+    completed_at DATETIME,
+    error_message TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+)
+"""
+
+
+def test_add_missing_columns_upgrades_old_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    task_id = uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(text(OLD_TRAINING_TASKS))
+        conn.execute(
+            text("INSERT INTO training_tasks (id, user_id, data_id, status, config) VALUES (:id, :u, :d, 'pending', '{}')"),
+            {"id": task_id.hex, "u": uuid.uuid4().hex, "d": uuid.uuid4().hex}
+        )
+
+    Base.metadata.create_all(bind=engine)
+    assert sorted(add_missing_columns(engine)) == ["training_tasks.heartbeat_at", "training_tasks.worker_id"]
+    assert add_missing_columns(engine) == []
+    columns = {col['name'] for col in inspect(engine).get_columns("training_tasks")}
+    assert {"worker_id", "heartbeat_at"} <= columns
+
+    db = sessionmaker(bind=engine)()
+    assert db.query(TrainingTask).count() == 1
+    assert claim_task(db, task_id, "worker-a")
+    assert db.query(TrainingTask).filter(TrainingTask.id == task_id).one().worker_id == "worker-a"
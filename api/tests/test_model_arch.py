@@ -0,0 +1,200 @@
+import torch
+from app.services.model_arch import (
+    AutoCorrelation, AutoMamformer, Mamformer, SeriesDecomp, StackedEnsemble, StreamingSession,
+    associative_scan, optimize_for_inference
+)
+
+
+def _random_corr(batch, heads, length, channels):
+    return torch.randn(batch, heads, length, channels)
+
+
+def test_time_delay_agg_matches_loop():
+    torch.manual_seed(0)
+    for length in (1, 2, 12, 24, 97):
+        module = AutoCorrelation(d_model=32, n_heads=4)
+        values = torch.randn(3, 4, length, 8)
+        corr = _random_corr(3, 4, length, 8)
+        expected = module.time_delay_agg_loop(values, corr)
+        actual = module.time_delay_agg(values, corr)
+        assert actual.shape == expected.shape
+        assert torch.allclose(actual, expected, atol=1e-5)
+
+
+def test_time_delay_agg_backward_matches_loop():
+    torch.manual_seed(0)
+    module = AutoCorrelation(d_model=32, n_heads=4)
+    values = torch.randn(2, 4, 16, 8, requires_grad=True)
+    corr = torch.randn(2, 4, 16, 8, requires_grad=True)
+
+    module.time_delay_agg_loop(values, corr).sum().backward()
+    expected_values_grad = values.grad.clone()
+    expected_corr_grad = corr.grad.clone()
+    values.grad = None
+    corr.grad = None
+
+    module.time_delay_agg(values, corr).sum().backward()
+    assert torch.allclose(values.grad, expected_values_grad, atol=1e-5)
+    assert torch.allclose(corr.grad, expected_corr_grad, atol=1e-5)
+
+
+def test_time_delay_agg_does_not_save_every_delay_for_backward():
+    torch.manual_seed(0)
+    module = AutoCorrelation(d_model=64, n_heads=8)
+    values = torch.randn(4, 8, 96, 8, requires_grad=True)
+    corr = torch.randn(4, 8, 96, 8, requires_grad=True)
+    saved = {}
+
+    def pack(tensor):
+        saved[tensor.untyped_storage().data_ptr()] = tensor.untyped_storage().nbytes()
+        return tensor
+
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda tensor: tensor):
+        module.time_delay_agg(values, corr)
+    # seq_len=96 时选出 22 个延迟，保存的张量不随延迟数增长
+    values_bytes = values.numel() * values.element_size()
+    assert sum(saved.values()) < 4 * values_bytes
+
+
+def test_auto_mamformer_forward_shape():
+    torch.manual_seed(0)
+    model = AutoMamformer(input_dim=6, d_model=32, n_layers=2, seq_len=12)
+    model.eval()
+    with torch.no_grad():
+        out = model(torch.randn(4, 12, 6))
+    assert out.shape == (4, 1)
+
+
+def test_mamformer_attention_backends_share_checkpoints():
+    torch.manual_seed(0)
+    math_model = Mamformer(input_dim=6, d_model=32, n_layers=2, seq_len=12, attn_backend='math')
+    sdpa_model = Mamformer(input_dim=6, d_model=32, n_layers=2, seq_len=12, attn_backend='sdpa')
+    sdpa_model.load_state_dict(math_model.state_dict())
+    math_model.eval()
+    sdpa_model.eval()
+
+    x = torch.randn(4, 12, 6)
+    with torch.no_grad():
+        assert torch.allclose(sdpa_model(x), math_model(x), atol=1e-5)
+
+
+def test_series_decomp_matches_pooling_for_odd_kernels():
+    torch.manual_seed(0)
+    for seq_len, kernel_size in ((12, 5), (25, 25), (96, 25), (1000, 25), (7, 7)):
+        decomp = SeriesDecomp(kernel_size=kernel_size)
+        x = torch.randn(2, seq_len, 8)
+        assert torch.allclose(decomp.moving_avg(x), decomp.moving_avg_pool(x), atol=1e-5)
+
+
+def test_series_decomp_even_kernel_keeps_length_and_reconstructs():
+    torch.manual_seed(0)
+    decomp = SeriesDecomp(kernel_size=25)
+    x = torch.randn(2, 12, 8)
+    seasonal, trend = decomp(x)
+    assert trend.shape == x.shape
+    assert torch.allclose(trend[:, 5], x[:, :12].mean(dim=1), atol=1e-6)
+    assert torch.allclose(seasonal + trend, x, atol=1e-6)
+
+
+def test_series_decomp_long_sequence_with_offset_is_exact():
+    torch.manual_seed(0)
+    decomp = SeriesDecomp(kernel_size=25)
+    x = torch.randn(1, 4096, 4) + 1e4
+    reference = x.double().unfold(1, 25, 1).mean(dim=-1)
+    trend = decomp.moving_avg(x)
+    assert torch.allclose(trend[:, 12:-12].double(), reference, atol=2e-3)
+
+
+def test_optimize_for_inference_preserves_outputs():
+    torch.manual_seed(0)
+    x = torch.randn(4, 12, 6)
+    for model in (
+        AutoMamformer(input_dim=6, d_model=32, n_layers=2, seq_len=12, dropout=0.1),
+        Mamformer(input_dim=6, d_model=32, n_layers=2, seq_len=12, dropout=0.3),
+    ):
+        model.eval()
+        optimized = optimize_for_inference(model)
+        assert not any(isinstance(m, torch.nn.Dropout) for m in optimized.modules())
+        assert optimized.state_dict().keys() == model.state_dict().keys()
+        with torch.no_grad():
+            assert torch.allclose(optimized(x), model(x), atol=1e-5)
+        # 原模型不受影响
+        assert any(isinstance(m, torch.nn.Dropout) for m in model.modules())
+
+
+def test_streaming_session_matches_full_window():
+    torch.manual_seed(0)
+    seq_len = 8
+    rows = torch.randn(20, 6)
+    for model in (
+        AutoMamformer(input_dim=6, d_model=32, n_layers=2, seq_len=seq_len),
+        Mamformer(input_dim=6, d_model=32, n_layers=2, seq_len=seq_len),
+    ):
+        model.eval()
+        session = StreamingSession(model, seq_len=seq_len)
+        for t in range(len(rows)):
+            pred = session.push(rows[t])
+            if t < seq_len - 1:
+                assert pred is None
+                continue
+            with torch.no_grad():
+                expected = model(rows[t - seq_len + 1:t + 1].unsqueeze(0))
+            assert torch.allclose(pred, expected, atol=1e-5)
+
+
+def test_stacked_ensemble_matches_members():
+    torch.manual_seed(0)
+    x = torch.randn(4, 12, 6)
+    for cls in (AutoMamformer, Mamformer):
+        members = [cls(input_dim=6, d_model=32, n_layers=2, seq_len=12) for _ in range(3)]
+        ensemble = StackedEnsemble(members)
+        ensemble.eval()
+        for m in members:
+            m.eval()
+        with torch.no_grad():
+            out = ensemble(x)
+            expected = torch.stack([m(x) for m in members])
+        assert out.shape == (3, 4, 1)
+        assert torch.allclose(out, expected, atol=1e-5)
+
+        state = ensemble.member_state_dict(1)
+        fresh = cls(input_dim=6, d_model=32, n_layers=2, seq_len=12)
+        fresh.load_state_dict(state)
+        fresh.eval()
+        with torch.no_grad():
+            assert torch.allclose(fresh(x), expected[1], atol=1e-5)
+
+
+def test_mamformer_pooled_heads_are_seq_len_independent():
+    torch.manual_seed(0)
+    for head_mode in ('pool', 'attn'):
+        short = Mamformer(input_dim=6, d_model=32, n_layers=2, seq_len=12, head_mode=head_mode)
+        long = Mamformer(input_dim=6, d_model=32, n_layers=2, seq_len=256, head_mode=head_mode)
+        assert sum(p.numel() for p in short.parameters()) == sum(p.numel() for p in long.parameters())
+        short.eval()
+        with torch.no_grad():
+            assert short(torch.randn(2, 12, 6)).shape == (2, 1)
+            assert short(torch.randn(2, 96, 6)).shape == (2, 1)
+
+
+def test_associative_scan_matches_recurrence():
+    torch.manual_seed(0)
+    for length in (1, 2, 3, 12, 33, 100):
+        a = torch.rand(2, length, 4, 3)
+        b = torch.randn(2, length, 4, 3)
+        h = torch.zeros(2, 4, 3)
+        expected = []
+        for t in range(length):
+            h = a[:, t] * h + b[:, t]
+            expected.append(h)
+        assert torch.allclose(associative_scan(a, b), torch.stack(expected, dim=1), atol=1e-5)
+
+
+def test_ssm_mixer_forward_for_both_models():
+    torch.manual_seed(0)
+    x = torch.randn(2, 40, 6)
+    for cls in (AutoMamformer, Mamformer):
+        model = cls(input_dim=6, d_model=32, n_layers=2, seq_len=40, mixer='ssm', d_state=8)
+        out = model(x)
+        assert out.shape == (2, 1)
+        out.sum().backward()
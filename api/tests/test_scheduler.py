@@ -0,0 +1,44 @@
+import time
+from app.services.scheduler import TrainingScheduler
+
+
+def _wait_until(predicate, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_scheduler_orders_queue_by_priority_then_fifo():
+    scheduler = TrainingScheduler(max_workers=1, threads_per_job=1)
+    scheduler.submit('first', time.sleep, (1.0,))
+    assert _wait_until(lambda: (scheduler.status('first') or {}).get('state') == 'running')
+    assert scheduler.status('first')['num_threads'] == 1
+
+    scheduler.submit('low', time.sleep, (0.1,))
+    scheduler.submit('high', time.sleep, (1.0,), priority=5)
+    scheduler.submit('low-2', time.sleep, (0.1,))
+    assert scheduler.status('high') == {'state': 'queued', 'position': 1, 'queue_length': 3}
+    assert scheduler.status('low')['position'] == 2
+    assert scheduler.status('low-2')['position'] == 3
+
+    assert _wait_until(lambda: scheduler.status('first') is None)
+    assert _wait_until(lambda: (scheduler.status('high') or {}).get('state') == 'running')
+    assert scheduler.status('low')['position'] == 1
+    assert _wait_until(lambda: all(scheduler.status(j) is None for j in ('high', 'low', 'low-2')))
+    assert scheduler.status('unknown') is None
+
+
+def test_scheduler_ignores_duplicate_job_ids():
+    scheduler = TrainingScheduler(max_workers=1, threads_per_job=1)
+    assert scheduler.submit('first', time.sleep, (1.0,))
+    assert _wait_until(lambda: (scheduler.status('first') or {}).get('state') == 'running')
+    assert scheduler.submit('dup', time.sleep, (0.1,))
+    assert not scheduler.submit('dup', time.sleep, (0.1,))
+    assert scheduler.status('dup')['queue_length'] == 1
+    assert _wait_until(lambda: scheduler.status('dup') is None)
+    # 执行槽在重复提交后仍可继续执行新任务
+    assert scheduler.submit('dup', time.sleep, (0.1,))
+    assert _wait_until(lambda: scheduler.status('dup') is None)
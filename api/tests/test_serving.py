@@ -0,0 +1,33 @@
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.preprocessing import RobustScaler
+from app.services.bundle import save_bundle
+from app.services.serving import export_serving_artifacts, load_serving_model
+from app.services.trainer import build_model
+
+
+def test_exported_artifacts_serve_the_ensemble_mean(tmp_path):
+    torch.manual_seed(0)
+    config = {'model_type': 'mamformer', 'd_model': 16, 'n_layers': 1, 'seq_len': 6}
+    models = [build_model('mamformer', 4, 6, config).eval() for _ in range(2)]
+    scaler = RobustScaler().fit(np.random.default_rng(0).normal(size=(50, 4)))
+    path = str(tmp_path / "task.bundle")
+    save_bundle(path, models, 'mamformer', config, 4, 6, scaler, ['a', 'b', 'y', 'c'], 2)
+
+    x = torch.randn(32, 6, 4)
+    with torch.no_grad():
+        expected = torch.stack([model(x) for model in models]).mean(dim=0)
+    trues = expected.numpy().reshape(-1) + np.random.default_rng(1).normal(scale=0.01, size=expected.numel())
+
+    report = export_serving_artifacts(models, path, x, trues, lambda preds: preds)
+    assert abs(report['torchscript']['r2_delta']) < 1e-4
+    # 导出不修改调用方的模型
+    assert all(any(isinstance(m, nn.Dropout) for m in model.modules()) for model in models)
+
+    for fastest in ('torchscript', 'fp32'):
+        serving = load_serving_model(config, path, 4, export_report={**report, 'fastest': fastest})
+        with torch.no_grad():
+            torch.testing.assert_close(serving(x), expected, rtol=1e-4, atol=1e-5)
+    # 没有更快的导出产物时，模型包成员同样经过推理优化
+    assert not any(isinstance(m, nn.Dropout) for m in serving.modules())
@@ -0,0 +1,352 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from torch.utils.data import DataLoader
+from sklearn.preprocessing import RobustScaler
+from app.services.trainer import (
+    AugmentedDataset, BatchAugmenter, ForwardRunner, BestStateTracker, EarlyStopping, TensorBatchLoader, ValidationEvaluator, build_model,
+    inverse_transform_target, make_loader, prepare_dataset, regression_metrics, train_process_ensemble,
+    fit_walk_forward_splits, run_walk_forward_cv, train_single_model, walk_forward_splits
+)
+from app.core.config import settings
+from app.services.checkpoint import TrainingCheckpoint
+from app.services import trainer
+from app.services.cache import FeatureRankingCache, PreprocessCache
+
+
+def test_augmented_dataset_multi_horizon_targets():
+    data = np.arange(60, dtype=float).reshape(20, 3)
+    dataset = AugmentedDataset(data, target_idx=2, seq_len=5, pred_len=3)
+    assert len(dataset) == 20 - 5 - 3 + 2
+    seq, target = dataset[0]
+    assert seq.shape == (5, 3)
+    assert (seq[:, 2] == 0).all()
+    assert target.tolist() == [data[4, 2], data[5, 2], data[6, 2]]
+
+    single = AugmentedDataset(data, target_idx=2, seq_len=5)
+    assert len(single) == 16
+    assert single[3][1].tolist() == [data[7, 2]]
+
+
+def test_augmented_dataset_windows_are_views_matching_copies():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(50, 4))
+    dataset = AugmentedDataset(data, target_idx=1, seq_len=8, pred_len=2)
+    assert np.shares_memory(dataset.sequences[0], dataset.sequences[1])
+    assert not np.shares_memory(dataset.sequences, data)
+    for i in range(len(dataset)):
+        expected = data[i:i + 8].copy()
+        expected[:, 1] = 0
+        np.testing.assert_array_equal(dataset.sequences[i], expected)
+        np.testing.assert_array_equal(dataset.targets[i], data[i + 7:i + 9, 1])
+    # 数据不足一个窗口时为空数据集
+    assert len(AugmentedDataset(data[:5], target_idx=1, seq_len=8)) == 0
+
+
+def test_batch_augmenter_is_seedable_and_preserves_shapes():
+    seq = torch.randn(64, 12, 5)
+    target = torch.randn(64, 3)
+    out_a = BatchAugmenter(seed=7)(seq, target)
+    out_b = BatchAugmenter(seed=7)(seq, target)
+    assert out_a[0].shape == seq.shape and out_a[1].shape == target.shape
+    assert torch.equal(out_a[0], out_b[0]) and torch.equal(out_a[1], out_b[1])
+    assert not torch.equal(out_a[0], seq)
+
+
+def test_batch_augmenter_disabled_policies_are_identity():
+    seq = torch.randn(16, 12, 5)
+    target = torch.randn(16, 1)
+    augmenter = BatchAugmenter(seed=0, mixup_p=0, scale_p=0, noise_p=0, mask_p=0)
+    out_seq, out_target = augmenter(seq, target)
+    assert torch.equal(out_seq, seq) and torch.equal(out_target, target)
+
+
+def test_tensor_batch_loader_matches_dataloader():
+    rng = np.random.default_rng(0)
+    dataset = AugmentedDataset(rng.normal(size=(70, 4)), target_idx=3, seq_len=6, pred_len=2)
+    fast = TensorBatchLoader(dataset, batch_size=16, shuffle=False)
+    reference = DataLoader(dataset, batch_size=16, shuffle=False)
+    assert len(fast) == len(reference)
+    for (x_fast, y_fast), (x_ref, y_ref) in zip(fast, reference):
+        assert torch.equal(x_fast, x_ref)
+        assert torch.equal(y_fast, y_ref)
+
+    shuffled = TensorBatchLoader(dataset, batch_size=16, shuffle=True)
+    assert sum(len(x) for x, _ in shuffled) == len(dataset)
+
+
+def test_make_loader_falls_back_for_per_sample_augmentation():
+    data = np.random.default_rng(0).normal(size=(40, 3))
+    assert isinstance(make_loader(AugmentedDataset(data, 0, seq_len=4), 8, True), TensorBatchLoader)
+    assert isinstance(make_loader(AugmentedDataset(data, 0, seq_len=4, augment=True), 8, True), DataLoader)
+    assert isinstance(make_loader(AugmentedDataset(data, 0, seq_len=4), 8, True, max_bytes=16), DataLoader)
+
+
+def test_make_data_loaders_defaults_to_batch_augmentation_on_fast_loader():
+    data = np.random.default_rng(0).normal(size=(40, 3))
+    prepared = {'train': data[:30], 'val': data[30:], 'target_idx': 2}
+    train_loader, val_loader, test_loader, augmenter = trainer.make_data_loaders(prepared, {'seq_len': 4})
+    assert isinstance(train_loader, TensorBatchLoader) and isinstance(val_loader, TensorBatchLoader)
+    assert isinstance(augmenter, BatchAugmenter)
+    assert test_loader is None
+    sample_loader, _, _, no_augmenter = trainer.make_data_loaders(prepared, {'seq_len': 4, 'augment_mode': 'sample'})
+    assert isinstance(sample_loader, DataLoader) and no_augmenter is None
+
+
+def test_train_process_ensemble_returns_member_states():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(80, 4))
+    scaler = RobustScaler().fit(data)
+    scaled = scaler.transform(data)
+    prepared = {'train': scaled[:60], 'val': scaled[60:], 'scaler': scaler, 'target_idx': 3}
+    config = {'d_model': 16, 'n_layers': 1, 'epochs': 2, 'batch_size': 16}
+
+    results = train_process_ensemble('mamformer', 4, 6, 2, prepared, config, task_id=None, max_workers=2)
+    assert len(results) == 2
+    states = [state for state, _ in results]
+    assert results[0][1]['stopped_epoch'] == 2
+    model = build_model('mamformer', 4, 6, config)
+    model.load_state_dict(states[1])
+    assert not torch.equal(states[0]['input_proj.0.weight'], states[1]['input_proj.0.weight'])
+
+
+def test_train_process_ensemble_workers_map_the_preprocess_cache(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(80, 4))
+    scaler = RobustScaler().fit(data)
+    scaled = scaler.transform(data)
+    cache = PreprocessCache(str(tmp_path / "preprocess"))
+    cache.put("entry", {'train': scaled[:60], 'val': scaled[60:]}, {})
+    # 不含数组，worker 只能从缓存条目读取 train / val
+    prepared = {'cache_path': cache.entry_path("entry"), 'scaler': scaler, 'target_idx': 3}
+    config = {'d_model': 16, 'n_layers': 1, 'epochs': 1, 'batch_size': 16}
+
+    results = train_process_ensemble('mamformer', 4, 6, 2, prepared, config, task_id=None, max_workers=2)
+    assert len(results) == 2 and results[0][1]['stopped_epoch'] == 1
+    assert cache.entry_path("missing") is None
+
+
+def test_early_stopping_patience_and_min_delta():
+    stopper = EarlyStopping(patience=2, min_delta=0.01)
+    assert not stopper.step(0.5)
+    assert not stopper.step(0.505)  # 未超过 min_delta
+    assert stopper.step(0.509)
+    assert not EarlyStopping(patience=0).step(-1.0)
+
+
+def test_validation_evaluator_matches_sklearn_metrics():
+    rng = np.random.default_rng(0)
+    data = rng.normal(loc=50, scale=5, size=(100, 4))
+    scaler = RobustScaler().fit(data)
+    trues = scaler.transform(data)[:, 2]
+    preds = np.stack([trues + rng.normal(scale=0.1, size=100) for _ in range(3)])
+
+    evaluator = ValidationEvaluator(scaler, target_idx=2)
+    metrics = evaluator(torch.tensor(preds, dtype=torch.float32), torch.tensor(trues, dtype=torch.float32))
+    for m in range(3):
+        expected = regression_metrics(
+            inverse_transform_target(scaler, trues.astype(np.float32), 2),
+            inverse_transform_target(scaler, preds[m].astype(np.float32), 2)
+        )
+        for name, value in expected.items():
+            assert np.isclose(metrics[name][m].item(), value, rtol=1e-6, atol=1e-9)
+
+
+def test_best_state_tracker_copies_in_place():
+    model = torch.nn.Linear(4, 2)
+    tracker = BestStateTracker(model)
+    buffers = {k: v.data_ptr() for k, v in tracker.best.items()}
+    tracker.save()
+    saved = model.weight.detach().clone()
+    with torch.no_grad():
+        model.weight.add_(1.0)
+    tracker.save()
+    with torch.no_grad():
+        model.weight.add_(1.0)
+    tracker.load_best(model)
+    assert torch.allclose(model.weight, saved + 1.0)
+    assert {k: v.data_ptr() for k, v in tracker.best.items()} == buffers
+
+
+def test_best_state_tracker_ema_and_member_slices():
+    stacked = torch.nn.Linear(3, 1)
+    tracker = BestStateTracker(stacked, ema_decay=0.5)
+    original = stacked.weight.detach().clone()
+    with torch.no_grad():
+        stacked.weight.add_(2.0)
+    tracker.update_ema()
+    tracker.apply_ema()
+    assert torch.allclose(stacked.weight, original + 1.0)
+    tracker.save(index=0)
+    tracker.restore()
+    assert torch.allclose(stacked.weight, original + 2.0)
+    assert torch.allclose(tracker.best['weight'][0], original[0] + 1.0)
+
+
+def test_prepare_dataset_reuses_memory_mapped_cache(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(120, 6)), columns=[f"f{i}" for i in range(5)] + ["y"])
+    csv_path = tmp_path / "data.csv"
+    df.to_csv(csv_path, index=False)
+    monkeypatch.setattr(trainer, "_feature_cache", FeatureRankingCache(str(tmp_path / "features")))
+    monkeypatch.setattr(trainer, "_preprocess_cache", PreprocessCache(str(tmp_path / "preprocess")))
+    monkeypatch.setattr(trainer, "_raw_cache", PreprocessCache(str(tmp_path / "raw")))
+    config = {"top_k": 3, "seq_len": 6}
+
+    first = prepare_dataset(str(csv_path), "y", config)
+    second = prepare_dataset(str(csv_path), "y", config)
+    assert trainer._preprocess_cache.hits == 1
+    assert isinstance(second["train"], np.memmap)
+    assert second["columns"] == first["columns"] and second["columns"][-1] == "y"
+    assert second["target_idx"] == first["target_idx"] == 3
+    assert first["cache_path"] and second["cache_path"] == first["cache_path"]
+    for split in ("train", "val", "test"):
+        np.testing.assert_array_equal(first[split], second[split])
+    np.testing.assert_allclose(second["scaler"].transform(first["test"]), first["scaler"].transform(first["test"]))
+
+    prepare_dataset(str(csv_path), "y", {"top_k": 3, "seq_len": 8})
+    assert trainer._preprocess_cache.misses == 2
+
+
+def test_forward_runner_falls_back_to_eager_when_compile_fails(monkeypatch):
+    def broken_compile(module):
+        def run(x):
+            raise RuntimeError("backend unavailable")
+        return run
+    monkeypatch.setattr(torch, "compile", broken_compile)
+    model = torch.nn.Linear(4, 2)
+    runner = ForwardRunner(model, compile_model=True)
+    x = torch.randn(3, 4)
+    torch.testing.assert_close(runner(x), model(x))
+    stats = runner.stats()
+    assert not stats["compiled"] and "backend unavailable" in stats["compile_error"]
+    assert stats["first_call_s"] is not None
+
+
+def test_forward_runner_bf16_autocast_returns_float32():
+    model = torch.nn.Linear(8, 1)
+    runner = ForwardRunner(model, precision="bf16")
+    x = torch.randn(16, 8)
+    out = runner(x)
+    assert runner.accelerated and out.dtype == torch.float32
+    torch.testing.assert_close(out, model(x), atol=5e-2, rtol=5e-2)
+    out.sum().backward()
+    assert model.weight.grad is not None and model.weight.grad.dtype == torch.float32
+
+
+class _CrashingLoader:
+    """在第 crash_epoch 次迭代开始时抛出异常，模拟 worker 中途被杀死"""
+    def __init__(self, loader, crash_epoch):
+        self.loader = loader
+        self.crash_epoch = crash_epoch
+        self.epoch = -1
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self.epoch += 1
+        if self.epoch == self.crash_epoch:
+            raise RuntimeError("worker killed")
+        return iter(self.loader)
+
+
+def test_train_single_model_resumes_from_checkpoint_exactly(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(80, 4))
+    scaler = RobustScaler().fit(data)
+    scaled = scaler.transform(data)
+    train_loader = make_loader(AugmentedDataset(scaled[:60], 3, seq_len=6), 16, True)
+    val_loader = make_loader(AugmentedDataset(scaled[60:], 3, seq_len=6), 16, False)
+    config = {'d_model': 16, 'n_layers': 1, 'epochs': 5, 'lr_scheduler': 'cosine', 'ema_decay': 0.9}
+    kwargs = dict(val_loader=val_loader, scaler=scaler, target_idx=3, config=config,
+                  device=torch.device('cpu'), task_id=None)
+
+    def run(loader, checkpoint=None, augmenter_seed=0):
+        torch.manual_seed(0)
+        np.random.seed(0)
+        model = build_model('mamformer', 4, 6, config)
+        return train_single_model(model, 0, 1, train_loader=loader, augmenter=BatchAugmenter(seed=augmenter_seed),
+                                  checkpoint=checkpoint, **kwargs)
+
+    reference, reference_summary = run(train_loader)
+
+    checkpoint = TrainingCheckpoint(str(tmp_path), "member_0", every=2)
+    try:
+        run(_CrashingLoader(train_loader, crash_epoch=4), checkpoint)
+    except RuntimeError:
+        pass
+    assert checkpoint.load()['next_epoch'] == 4
+
+    # 不同的增强种子也应被断点中的随机数状态覆盖
+    resumed, resumed_summary = run(train_loader, checkpoint, augmenter_seed=1)
+    assert resumed_summary['best_val_r2'] == reference_summary['best_val_r2']
+    for k, v in reference.state_dict().items():
+        torch.testing.assert_close(resumed.state_dict()[k], v, rtol=0, atol=0)
+    assert checkpoint.load()['done']
+
+
+def test_walk_forward_splits_use_expanding_windows():
+    splits = walk_forward_splits(100, 4, seq_len=2)
+    assert splits == [(20, 40), (40, 60), (60, 80), (80, 100)]
+    assert walk_forward_splits(103, 4, seq_len=2)[-1] == (83, 103)
+    with pytest.raises(ValueError):
+        walk_forward_splits(30, 4, seq_len=6)
+
+
+def test_walk_forward_splits_require_enough_validation_windows_per_fold():
+    # 442 行 5 折时第一折验证集只有 12 行: seq_len=12 仅 1 个窗口，更长的 seq_len/pred_len 为 0 个
+    for seq_len, pred_len in ((12, 1), (16, 1), (12, 3)):
+        with pytest.raises(ValueError, match="第 1 折"):
+            walk_forward_splits(442, 5, seq_len=seq_len, pred_len=pred_len)
+    splits = fit_walk_forward_splits(442, 5, seq_len=12)
+    assert len(splits) == 4 and splits[-1][1] == 442
+    assert len(fit_walk_forward_splits(442, 5, seq_len=12, pred_len=3)) == 3
+    with pytest.raises(ValueError):
+        fit_walk_forward_splits(40, 5, seq_len=12)
+
+
+def test_run_walk_forward_cv_reports_fold_and_aggregate_metrics(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(200, 5)), columns=[f"f{i}" for i in range(4)] + ["y"])
+    csv_path = tmp_path / "data.csv"
+    df.to_csv(csv_path, index=False)
+    # 子进程重新读取配置，通过环境变量指向同一缓存目录
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    for name in ("_feature_cache", "_preprocess_cache", "_raw_cache"):
+        monkeypatch.setattr(trainer, name, None)
+    config = {"top_k": 3, "seq_len": 6, "d_model": 16, "n_layers": 1, "epochs": 1, "n_models": 1, "cv_folds": 3}
+
+    cv = run_walk_forward_cv(str(csv_path), "y", config, max_workers=3)
+    assert cv["n_folds"] == 3
+    assert [fold["fold"] for fold in cv["folds"]] == [0, 1, 2]
+    assert cv["folds"][-1]["test_end"] == 200
+    assert all(fold["n_test"] > 0 for fold in cv["folds"])
+    r2 = np.array([fold["r2"] for fold in cv["folds"]])
+    assert cv["aggregate"]["r2_mean"] == pytest.approx(r2.mean())
+    assert cv["aggregate"]["r2_std"] == pytest.approx(r2.std())
+    # 每折按自身 train_end 拟合截断与特征选择，各有一份缓存
+    assert len(os.listdir(tmp_path / "cache" / "raw")) == 3
+
+
+def test_prepare_raw_dataset_fits_only_on_prefix(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(100, 3)), columns=["f0", "f1", "y"])
+    df.loc[90, "f0"] = 1000.0
+    csv_path = tmp_path / "data.csv"
+    df.to_csv(csv_path, index=False)
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    for name in ("_feature_cache", "_raw_cache"):
+        monkeypatch.setattr(trainer, name, None)
+    config = {"top_k": 2}
+
+    raw = trainer.prepare_raw_dataset(str(csv_path), "y", config, fit_end=80)
+    f0 = raw["data"][:, raw["columns"].index("f0")]
+    # 测试块中的异常值按训练区间的分位数截断
+    assert f0[90] == pytest.approx(df["f0"].iloc[:80].quantile(0.99))
+    full = trainer.prepare_raw_dataset(str(csv_path), "y", config)
+    assert full["data"][90, full["columns"].index("f0")] > f0[90]
+    assert trainer._raw_cache.misses == 2
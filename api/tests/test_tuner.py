@@ -0,0 +1,61 @@
+import random
+import pytest
+from app.services.scheduler import TaskClaimLost
+from app.services.tuner import DEFAULT_SEARCH_SPACE, rung_budgets, sample_params, successive_halving
+
+
+def test_rung_budgets_grow_geometrically_up_to_max():
+    assert rung_budgets(10, 90, 3) == [10, 30, 90]
+    assert rung_budgets(10, 100, 3) == [10, 30, 90, 100]
+    assert rung_budgets(50, 50, 3) == [50]
+
+
+def test_sample_params_respects_search_space():
+    rng = random.Random(0)
+    for _ in range(50):
+        params = sample_params(DEFAULT_SEARCH_SPACE, rng)
+        assert params['d_model'] in (32, 64, 128)
+        assert 1 <= params['n_layers'] <= 4
+        assert 1e-4 <= params['lr'] <= 3e-3
+        assert 0.05 <= params['dropout'] <= 0.4
+
+
+def test_successive_halving_prunes_and_spends_less_than_full_budget():
+    calls = []
+
+    def evaluate(params, epochs):
+        calls.append((params['x'], epochs))
+        if params['x'] == 3:
+            raise RuntimeError("diverged")
+        return params['x'] - 1.0 / epochs
+
+    trials = [{'params': {'x': x}} for x in range(9)]
+    updates = []
+    best = successive_halving(trials, evaluate, min_epochs=1, max_epochs=9, eta=3, on_update=updates.append)
+
+    assert best['params'] == {'x': 8}
+    assert best['epochs'] == 9 and best['status'] == 'completed'
+    statuses = {t['params']['x']: t['status'] for t in trials}
+    assert statuses[3] == 'failed'
+    assert sum(s == 'pruned' for s in statuses.values()) == 7
+    # 8 个有效试验 -> 3 epoch 级保留 2 个 -> 9 epoch 级保留 1 个
+    assert sum(epochs for _, epochs in calls) < 9 * len(trials)
+    assert [epochs for x, epochs in calls if x == 8] == [1, 3, 9]
+    assert updates[-1]['status'] == 'completed'
+
+
+def test_successive_halving_stops_when_claim_is_lost():
+    calls = []
+
+    def evaluate(params, epochs):
+        calls.append(params['x'])
+        if params['x'] == 1:
+            raise TaskClaimLost("re-claimed")
+        return float(params['x'])
+
+    trials = [{'params': {'x': x}} for x in range(4)]
+    with pytest.raises(TaskClaimLost):
+        successive_halving(trials, evaluate, min_epochs=1, max_epochs=9, eta=3)
+    # 认领丢失后不再评估后续试验，也不把该试验记为 failed
+    assert calls == [0, 1]
+    assert trials[1]['status'] == 'running'
@@ -0,0 +1,60 @@
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.core.database import Base
+from app.models.models import HyperparameterStudy, TrainingTask
+from app.worker import claim_task, find_stale_tasks, touch_heartbeat
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def _add_task(db, **fields):
+    task = TrainingTask(user_id=uuid.uuid4(), data_id=uuid.uuid4(), config={'target_col': 'y'}, **fields)
+    db.add(task)
+    db.commit()
+    return task.id
+
+
+def test_claim_task_is_exclusive_until_heartbeat_goes_stale():
+    db = _session()
+    task_id = _add_task(db)
+
+    assert claim_task(db, task_id, "worker-a")
+    assert not claim_task(db, task_id, "worker-b")
+    assert find_stale_tasks(db) == []
+
+    later = datetime.utcnow() + timedelta(minutes=settings.STALE_TASK_TIMEOUT_MINUTES + 1)
+    assert [t.id for t in find_stale_tasks(db, now=later)] == [task_id]
+    assert claim_task(db, task_id, "worker-b", now=later)
+    # 原执行者的心跳失效，应停止训练
+    assert not touch_heartbeat(db, task_id, "worker-a")
+    assert touch_heartbeat(db, task_id, "worker-b")
+
+
+def test_find_stale_tasks_includes_pending_only_on_request():
+    db = _session()
+    pending_id = _add_task(db)
+    _add_task(db, status="completed")
+
+    assert find_stale_tasks(db) == []
+    assert [t.id for t in find_stale_tasks(db, include_pending=True)] == [pending_id]
+
+
+def test_interrupted_studies_are_claimable_after_heartbeat_timeout():
+    db = _session()
+    study = HyperparameterStudy(user_id=uuid.uuid4(), data_id=uuid.uuid4(), config={'target_col': 'y'},
+                                search_space={}, settings={})
+    db.add(study)
+    db.commit()
+
+    assert claim_task(db, study.id, "worker-a", model=HyperparameterStudy)
+    assert find_stale_tasks(db, include_pending=True, model=HyperparameterStudy) == []
+    later = datetime.utcnow() + timedelta(minutes=settings.STALE_TASK_TIMEOUT_MINUTES + 1)
+    assert [s.id for s in find_stale_tasks(db, now=later, model=HyperparameterStudy)] == [study.id]
+    assert claim_task(db, study.id, "worker-b", now=later, model=HyperparameterStudy)